@@ -1,6 +1,7 @@
 '''
 K230红色物体跟踪系统 - 带PID控制和下位机通信
 功能: 识别红色物体 → 控制云台舵机 → 发送坐标给下位机
+阈值/PID/死区从 config_store 加载；debug_tool 保存后主循环自动热更新，无需重启摄像头
 '''
 
 import time
@@ -180,12 +181,34 @@ DEAD_ZONE_Y = 30
 MIN_BLOB_PIXELS = 200  # 最小色块像素数
 LOST_TARGET_FRAMES = 100  # 未检测到目标的帧数阈值 (50ms/帧 × 100帧 = 5秒)
 
+# ==================== 参数热更新 ====================
+from config import get_store
+store = get_store()
+
+def apply_tuning(changed):
+    """参数存储变化时更新运行中的阈值/PID/死区"""
+    global RED_THRESHOLD, DEAD_ZONE_X, DEAD_ZONE_Y
+    if 'RED_THRESHOLD' in changed:
+        RED_THRESHOLD = tuple(changed['RED_THRESHOLD'])
+    for key, pid in (('PID_H', pid_h), ('PID_V', pid_v)):
+        if key in changed:
+            g = changed[key]
+            pid.kp, pid.ki, pid.kd = g['kp'], g['ki'], g['kd']
+    if 'DEAD_ZONE_X' in changed:
+        DEAD_ZONE_X = changed['DEAD_ZONE_X']
+    if 'DEAD_ZONE_Y' in changed:
+        DEAD_ZONE_Y = changed['DEAD_ZONE_Y']
+    print("参数已更新:", sorted(changed.keys()))
+
+store.on_change(('RED_THRESHOLD', 'PID_H', 'PID_V', 'DEAD_ZONE_X', 'DEAD_ZONE_Y'), apply_tuning)
+
 # ==================== 主控制循环 ====================
 lost_target_count = 0
 frame_count = 0
 
 while True:
     frame_count += 1
+    store.poll()    # 每秒检查一次参数文件
     img = sensor.snapshot()
 
     # 红色物体检测
@@ -245,24 +245,27 @@ BlueLaserFlag = True
 DisplayFlag = True
 right_top = None
 
-# 加载保存的坐标
+# 加载保存的坐标 (统一参数存储的 LASER_CROSS 键；旧版 JSON 文件作为回退)
+from config import get_store
+LEGACY_COORD_FILE = "/sdcard/calibration_coordinates.json"
+coord_store = get_store()
+
 def load_coordinates():
-    """从JSON文件加载激光坐标（返回整数）"""
+    """从参数存储加载激光坐标（返回整数）"""
+    cross = coord_store.get("LASER_CROSS")
+    if cross is not None:
+        return (int(cross[0]), int(cross[1]))
     try:
-        with open("/sdcard/calibration_coordinates.json", "r") as f:
+        with open(LEGACY_COORD_FILE, "r") as f:
             data = json.load(f)
             return (int(data["laser"]["x"]), int(data["laser"]["y"]))
     except:
         return (200, 120)  # 默认坐标
 
 def save_coordinates(laser_coord):
-    """保存激光坐标到JSON文件"""
-    coordinates = {
-        "laser": {"x": int(laser_coord[0]), "y": int(laser_coord[1])}
-    }
+    """保存激光坐标到参数存储"""
     try:
-        with open("/sdcard/calibration_coordinates.json", "w") as f:
-            json.dump(coordinates, f)
+        coord_store.set({"LASER_CROSS": [int(laser_coord[0]), int(laser_coord[1])]})
         return True
     except:
         return False
@@ -1,12 +1,22 @@
 '''
 K230 颜色校准工具 - 帮助获取最佳的红色阈值
 显示实时LAB值，方便调整RED_THRESHOLD
+LUT 校准: 目标放在中心框内，多帧采样编译颜色查找表，输出最紧的一组 LAB 阈值盒
+自动校准: 框选 ROI 内多帧 LAB 直方图取百分位，直接写入参数存储 (运行中的跟踪程序热更新)
 '''
 
 import time
 from media.sensor import *
 from media.display import *
 from media.media import *
+from color_lut import ColorLUT
+from lab_calibrate import calibrate
+from config import get_store
+
+LUT_FRAMES = 60            # 采样帧数
+LUT_ROI_SIZE = 40          # 中心采样框边长
+LUT_RING = 40              # 采样框外背景环宽度 (负样本)
+LUT_FILE = '/sdcard/color_lut.json'
 
 class ColorCalibrator:
     """颜色校准工具"""
@@ -41,29 +51,80 @@ class ColorCalibrator:
         print("S: 保存当前阈值")
         print("Q: 退出")
     
-    def get_lab_at_center(self, img):
-        """获取图像中心点的LAB值"""
-        cx = self.W // 2
-        cy = self.H // 2
+    def center_roi(self, size=LUT_ROI_SIZE):
+        return ((self.W - size) // 2, (self.H - size) // 2, size, size)
+    
+    def get_lab_at_center(self, img, size=8):
+        """获取图像中心小区域的平均LAB值 (L, A, B)"""
+        s = img.get_statistics(roi=self.center_roi(size))
+        return (s.l_mean(), s.a_mean(), s.b_mean())
+    
+    def auto_calibrate(self, roi=None, frames=30):
+        """
+        框选区域内多帧直方图百分位自动求阈值，更新当前阈值并保存到参数存储
+        roi 默认为中心框；返回阈值元组
+        """
+        if roi is None:
+            roi = self.center_roi()
         
-        # 获取中心点像素的LAB值
-        # 注意: 这里需要使用cv_lite或image处理库来获取LAB值
-        # 由于OpenMV有find_blobs方法，我们先尝试通过色块检测获取信息
+        def progress(img, i):
+            img.draw_rectangle(roi, color=(0, 255, 0), thickness=2)
+            img.draw_string_advanced(10, 10, 24, f"AUTO LAB {i + 1}/{frames}", color=(255, 255, 0))
+            Display.show_image(img)
         
-        # 简化方案：显示中心点周围的色块
-        return None
+        threshold = calibrate(self.sensor.snapshot, roi, frames, progress)
+        if threshold is None:
+            print("自动校准失败：ROI 内没有数据")
+            return None
+        (self.l_min, self.l_max, self.a_min, self.a_max, self.b_min, self.b_max) = threshold
+        self.print_current_threshold()
+        try:
+            store = get_store()
+            store.set({'RED_THRESHOLD': threshold})
+            print("已写入:", store.path, "版本", store.version)
+        except OSError as e:
+            print("写入配置失败:", e)
+        return threshold
     
-    def run(self):
-        """运行校准器"""
+    def calibrate_lut(self, frames=LUT_FRAMES, roi_size=LUT_ROI_SIZE, path=LUT_FILE):
+        """
+        多帧采样中心框 (目标) 与外圈 (背景)，编译颜色查找表并保存
+        返回 LAB 阈值盒列表
+        """
+        lut = ColorLUT()
+        roi = self.center_roi(roi_size)
+        for i in range(frames):
+            img = self.sensor.snapshot()
+            lut.sample_roi(img, roi)
+            lut.sample_ring(img, roi, LUT_RING, self.W, self.H)
+            img.draw_rectangle(roi, color=(0, 255, 0), thickness=2)
+            img.draw_string_advanced(10, 10, 24, f"LUT SAMPLING {i + 1}/{frames}", color=(255, 255, 0))
+            Display.show_image(img)
+        n = lut.compile()
+        boxes = lut.cover_boxes()
+        print(f"颜色查找表: {lut.samples} 个样本, {n} 种颜色入表")
+        for box in boxes:
+            print("  LAB 阈值盒:", box)
+        try:
+            lut.save(path, boxes)
+            print("已保存:", path)
+        except OSError as e:
+            print("保存失败:", e)
+        return boxes
+    
+    def run(self, thresholds=None):
+        """运行校准器 (thresholds 为阈值列表，默认使用当前单个阈值)"""
         threshold = (self.l_min, self.l_max, 
                     self.a_min, self.a_max, 
                     self.b_min, self.b_max)
+        if not thresholds:
+            thresholds = [threshold]
         
         while True:
             img = self.sensor.snapshot()
             
             # 寻找符合阈值的色块
-            blobs = img.find_blobs([threshold], pixels_threshold=10)
+            blobs = img.find_blobs(thresholds, pixels_threshold=10)
             
             # 绘制中心十字
             cx = self.W // 2
@@ -71,7 +132,10 @@ class ColorCalibrator:
             img.draw_cross(cx, cy, color=(0, 255, 0), size=20, thickness=2)
             
             # 显示当前阈值
-            threshold_text = f"L:({self.l_min},{self.l_max}) A:({self.a_min},{self.a_max}) B:({self.b_min},{self.b_max})"
+            if len(thresholds) > 1:
+                threshold_text = f"LUT BOXES: {len(thresholds)}"
+            else:
+                threshold_text = f"L:({self.l_min},{self.l_max}) A:({self.a_min},{self.a_max}) B:({self.b_min},{self.b_max})"
             img.draw_string_advanced(10, 10, 20, threshold_text, color=(255, 255, 0))
             
             # 显示检测到的色块数
@@ -108,7 +172,11 @@ def interactive_calibrator():
     calibrator.print_current_threshold()
     
     try:
-        calibrator.run()
+        print("\n=== 自动校准：保持目标在中心绿框内 ===")
+        calibrator.auto_calibrate()
+        print("\n=== LUT 采样：保持目标在中心绿框内 ===")
+        boxes = calibrator.calibrate_lut()
+        calibrator.run(boxes)
     except KeyboardInterrupt:
         print("\n校准已停止")
         print("推荐的阈值:")
@@ -0,0 +1,209 @@
+'''
+颜色查找表 (LUT) 校准
+多帧采样目标像素 (正样本) 与周围背景像素 (负样本)，编译成 RGB565 位图:
+- 每个 RGB565 值占 1 bit，共 8 KB；命中次数 ≥ min_count 且背景占比不高的颜色才入表
+- cover_boxes 把表中颜色换算到 LAB，按最宽轴中位数递归切分成至多 max_boxes 个最紧外包盒，
+  直接作为 find_blobs 的阈值列表 (比单个大盒包含更少的非目标颜色)
+- purity 在色块外接框内网格抽样 (至多 PURITY_SAMPLES 个像素) 查表，按色块像素密度折算成
+  目标色占比，用于剔除误检色块；空心目标 (圆环/方框) 框内的背景不计入
+
+K230 与主机通用 (纯 Python)；save/load 使用 JSON + 十六进制位图
+'''
+
+import json
+import math
+
+LUT_SIZE = 65536
+MIN_COUNT = 2          # 颜色至少出现的次数 (滤掉噪点)
+MAX_BG_RATIO = 0.5     # 负样本次数 / 正样本次数 超过该值的颜色不入表
+MAX_BOXES = 4
+MIN_SPLIT_GAIN = 0.25  # 切分后总体积至少减少该比例才继续切分
+PURITY_SAMPLES = 64    # purity 每个色块最多取的像素数
+
+
+def rgb_to_rgb565(r, g, b):
+    return ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+
+
+def rgb565_to_rgb(v):
+    """RGB565 → 8bit RGB (低位补高位，与传感器解码一致)"""
+    r = (v >> 11) & 0x1F
+    g = (v >> 5) & 0x3F
+    b = v & 0x1F
+    return (r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)
+
+
+def _linear(c):
+    c = c / 255.0
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+
+def _f(t):
+    return t ** (1.0 / 3.0) if t > 0.008856 else 7.787 * t + 16.0 / 116.0
+
+
+def rgb_to_lab(r, g, b):
+    """sRGB (D65) → LAB，取整后与 find_blobs 阈值同一量纲 (L 0~100, A/B -128~127)"""
+    rl, gl, bl = _linear(r), _linear(g), _linear(b)
+    x = (rl * 0.4124 + gl * 0.3576 + bl * 0.1805) / 0.95047
+    y = rl * 0.2126 + gl * 0.7152 + bl * 0.0722
+    z = (rl * 0.0193 + gl * 0.1192 + bl * 0.9505) / 1.08883
+    fx, fy, fz = _f(x), _f(y), _f(z)
+    return (int(round(116.0 * fy - 16.0)),
+            int(round(500.0 * (fx - fy))),
+            int(round(200.0 * (fy - fz))))
+
+
+def _bounds(points):
+    lo = [min(p[i] for p in points) for i in range(3)]
+    hi = [max(p[i] for p in points) for i in range(3)]
+    return lo, hi
+
+
+def _volume(lo, hi):
+    return (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) * (hi[2] - lo[2] + 1)
+
+
+class ColorLUT:
+    def __init__(self):
+        self.bits = bytearray(LUT_SIZE // 8)
+        self.pos = {}           # RGB565 → 正样本次数
+        self.neg = {}           # RGB565 → 负样本次数
+        self.samples = 0
+
+    # ---------------- 采样 ----------------
+    def add(self, r, g, b, target=True):
+        v = rgb_to_rgb565(r, g, b)
+        hist = self.pos if target else self.neg
+        hist[v] = hist.get(v, 0) + 1
+        if target:
+            self.samples += 1
+
+    def sample_roi(self, img, roi, step=2, target=True):
+        """在 ROI 内按步长采样像素 (img.get_pixel 返回 (r, g, b))"""
+        x0, y0, w, h = roi
+        for y in range(y0, y0 + h, step):
+            for x in range(x0, x0 + w, step):
+                p = img.get_pixel(x, y)
+                if p is not None:
+                    self.add(p[0], p[1], p[2], target)
+
+    def sample_ring(self, img, roi, margin, width, height, step=4):
+        """ROI 外扩 margin 的一圈作为背景负样本"""
+        x0, y0, w, h = roi
+        ox0 = max(0, x0 - margin)
+        oy0 = max(0, y0 - margin)
+        ox1 = min(width, x0 + w + margin)
+        oy1 = min(height, y0 + h + margin)
+        for y in range(oy0, oy1, step):
+            for x in range(ox0, ox1, step):
+                if x0 <= x < x0 + w and y0 <= y < y0 + h:
+                    continue
+                p = img.get_pixel(x, y)
+                if p is not None:
+                    self.add(p[0], p[1], p[2], False)
+
+    # ---------------- 编译 ----------------
+    def compile(self, min_count=MIN_COUNT, max_bg_ratio=MAX_BG_RATIO):
+        """由采样直方图生成位图，返回入表颜色数"""
+        self.bits = bytearray(LUT_SIZE // 8)
+        n = 0
+        for v, c in self.pos.items():
+            if c < min_count or self.neg.get(v, 0) > c * max_bg_ratio:
+                continue
+            self.bits[v >> 3] |= 1 << (v & 7)
+            n += 1
+        return n
+
+    def contains(self, v):
+        return (self.bits[v >> 3] >> (v & 7)) & 1
+
+    def contains_rgb(self, r, g, b):
+        return self.contains(rgb_to_rgb565(r, g, b))
+
+    def members(self):
+        out = []
+        for i in range(len(self.bits)):
+            byte = self.bits[i]
+            if not byte:
+                continue
+            for j in range(8):
+                if byte & (1 << j):
+                    out.append((i << 3) | j)
+        return out
+
+    def cover_boxes(self, max_boxes=MAX_BOXES, min_gain=MIN_SPLIT_GAIN):
+        """
+        表中颜色的 LAB 最紧外包盒集合 [(Lmin, Lmax, Amin, Amax, Bmin, Bmax), ...]
+        每次切分体积最大的盒子 (沿最宽轴取中位数)，总体积下降不足 min_gain 时停止
+        """
+        points = list(set(rgb_to_lab(*rgb565_to_rgb(v)) for v in self.members()))
+        if not points:
+            return []
+        boxes = [(points,) + tuple(_bounds(points))]
+        while len(boxes) < max_boxes:
+            boxes.sort(key=lambda b: _volume(b[1], b[2]), reverse=True)
+            pts, lo, hi = boxes[0]
+            if len(pts) < 2:
+                break
+            axis = max(range(3), key=lambda i: hi[i] - lo[i])
+            pts = sorted(pts, key=lambda p: p[axis])
+            mid = len(pts) // 2
+            left, right = pts[:mid], pts[mid:]
+            l_lo, l_hi = _bounds(left)
+            r_lo, r_hi = _bounds(right)
+            before = _volume(lo, hi)
+            after = _volume(l_lo, l_hi) + _volume(r_lo, r_hi)
+            if after > before * (1.0 - min_gain):
+                break
+            boxes[0:1] = [(left, l_lo, l_hi), (right, r_lo, r_hi)]
+        return [(lo[0], hi[0], lo[1], hi[1], lo[2], hi[2]) for _, lo, hi in boxes]
+
+    # ---------------- 在线使用 ----------------
+    def purity(self, img, blob, max_samples=PURITY_SAMPLES):
+        """
+        色块中目标色的占比估计 (0~1)
+        外接框内取至多 max_samples 个网格点 (含首末行列，细边框不会落在网格缝里) 查表，
+        命中率再除以色块像素密度 (blob.pixels() / 框面积)：空心目标框内的背景不拉低结果
+        """
+        x0, y0, w, h = blob.rect()
+        if w <= 0 or h <= 0:
+            return 0.0
+        nx = max(1, min(w, max_samples, int(round(math.sqrt(max_samples * w / h)))))
+        ny = max(1, min(h, max_samples // nx))
+        hit = 0
+        total = 0
+        for j in range(ny):
+            y = y0 + (j * (h - 1) // (ny - 1) if ny > 1 else h // 2)
+            for i in range(nx):
+                x = x0 + (i * (w - 1) // (nx - 1) if nx > 1 else w // 2)
+                p = img.get_pixel(x, y)
+                if p is None:
+                    continue
+                total += 1
+                hit += self.contains_rgb(p[0], p[1], p[2])
+        density = blob.pixels() / (w * h)
+        if not total or density <= 0:
+            return 0.0
+        return min(1.0, hit / (total * density))
+
+    # ---------------- 存取 ----------------
+    def save(self, path, boxes=None):
+        data = {
+            'bits': ''.join('%02x' % b for b in self.bits),
+            'boxes': [list(b) for b in (boxes if boxes is not None else self.cover_boxes())],
+            'samples': self.samples,
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        """返回 (ColorLUT, LAB 盒列表)"""
+        with open(path) as f:
+            data = json.load(f)
+        lut = cls()
+        hexbits = data['bits']
+        lut.bits = bytearray(int(hexbits[i:i + 2], 16) for i in range(0, len(hexbits), 2))
+        lut.samples = data.get('samples', 0)
+        return lut, [tuple(b) for b in data.get('boxes', [])]
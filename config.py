@@ -1,6 +1,8 @@
 '''
 K230 红色物体跟踪系统 - 全局配置文件
 所有可调参数都在这里集中管理
+可在线调整的参数 (阈值/PID/死区) 以这里的值为默认值，
+调参结果保存在 config_store 的 JSON 文件中，运行时通过 get_store() 读取并可热更新
 '''
 
 # ==================== 摄像头配置 ====================
@@ -100,10 +102,32 @@ PID_I_LIMIT = 100
 FRAME_BUFFER_SIZE = 3
 
 
+# ==================== 参数存储 ====================
+# 存储中的键与默认值 (debug_tool / color_calibrator 写入，change1 等热更新)
+STORE_DEFAULTS = {
+    'RED_THRESHOLD': RED_THRESHOLD,
+    'PID_H': {'kp': PID_H_KP, 'ki': PID_H_KI, 'kd': PID_H_KD},
+    'PID_V': {'kp': PID_V_KP, 'ki': PID_V_KI, 'kd': PID_V_KD},
+    'DEAD_ZONE_X': DEAD_ZONE_X,
+    'DEAD_ZONE_Y': DEAD_ZONE_Y,
+}
+
+_store = None
+
+
+def get_store():
+    """共享的 ConfigStore (首次调用时加载 config_store.CONFIG_FILE)"""
+    global _store
+    if _store is None:
+        from config_store import ConfigStore
+        _store = ConfigStore(defaults=STORE_DEFAULTS)
+    return _store
+
+
 # ==================== 函数: 加载配置 ====================
 def get_red_threshold():
-    """获取红色阈值"""
-    return RED_THRESHOLD
+    """获取红色阈值 (优先使用已保存的调参结果)"""
+    return tuple(get_store().get('RED_THRESHOLD'))
 
 def get_servo_config():
     """获取舵机配置"""
@@ -117,11 +141,13 @@ def get_servo_config():
     }
 
 def get_pid_config():
-    """获取PID参数"""
-    return {
-        'h': {'kp': PID_H_KP, 'ki': PID_H_KI, 'kd': PID_H_KD, 'max_out': PID_H_MAX_OUT},
-        'v': {'kp': PID_V_KP, 'ki': PID_V_KI, 'kd': PID_V_KD, 'max_out': PID_V_MAX_OUT},
-    }
+    """获取PID参数 (优先使用已保存的调参结果)"""
+    store = get_store()
+    h = dict(store.get('PID_H'))
+    v = dict(store.get('PID_V'))
+    h['max_out'] = PID_H_MAX_OUT
+    v['max_out'] = PID_V_MAX_OUT
+    return {'h': h, 'v': v}
 
 def get_uart_config():
     """获取UART配置"""
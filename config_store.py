@@ -0,0 +1,180 @@
+'''
+统一参数存储 (JSON，带版本号)
+所有调参结果 (阈值、PID 增益、死区、标定坐标等) 存在同一个文件:
+    {"schema": 1, "version": 12, "values": {"RED_THRESHOLD": [20, 80, 30, 100, 0, 60], ...}}
+- 读取: 文件中的值覆盖调用方给出的默认值；文件缺失/损坏时只用默认值
+- 写入: set() 先合并文件中其他进程/工具写入的新值，再版本号 +1，先写临时文件再重命名，
+  掉电不会留下半个文件，也不会用旧内容覆盖别人刚保存的键
+- 热更新: 主循环每帧调用 poll()，每 poll_ms 读一次文件 (只有几百字节)，
+  版本号不低于当前版本时合并，只把变化的键通知给注册的监听者
+  (不按大小/修改时间判断: FAT 修改时间精度 2s，同长度的两次保存 stat 完全相同)
+  (手工编辑文件时请同时增大 version；版本更低的文件视为旧备份，忽略)
+- 元组存为 JSON 列表，使用方按需 tuple() 转换
+'''
+
+import json
+import os
+import time
+
+try:
+    _ticks_ms = time.ticks_ms
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+CONFIG_FILE = '/sdcard/k230_config.json'
+POLL_MS = 1000
+SCHEMA = 1
+
+
+def atomic_write(path, text):
+    """先写 path.tmp 再重命名替换 (FAT 上 rename 不能覆盖时先删旧文件)"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+        f.flush()
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        os.rename(tmp, path)
+
+
+def _plain(v):
+    """元组统一为列表，保证与 JSON 读回的值可直接比较"""
+    if isinstance(v, (list, tuple)):
+        return [_plain(x) for x in v]
+    if isinstance(v, dict):
+        return {k: _plain(x) for k, x in v.items()}
+    return v
+
+
+class ConfigStore:
+    def __init__(self, path=None, defaults=None, poll_ms=POLL_MS):
+        self.path = path or CONFIG_FILE     # 运行时取模块常量，便于整体改路径
+        self.poll_ms = poll_ms
+        self.values = {k: _plain(v) for k, v in (defaults or {}).items()}
+        self.version = 0
+        self.listeners = []         # [(键集合或 None, 回调), ...]
+        self.last_poll = None
+        self.reloads = 0
+        self.errors = 0
+        self.load()
+
+    # ---------------- 读取 ----------------
+    def _read(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get('values'), dict):
+            raise ValueError('配置文件格式错误')
+        return data
+
+    def load(self):
+        """读取文件并合并到当前值；成功返回 True"""
+        try:
+            data = self._read()
+        except (OSError, ValueError) as e:
+            if not isinstance(e, OSError):
+                print("配置文件读取失败，使用默认值:", e)
+                self.errors += 1
+            return False
+        self._apply(data['values'], data.get('version', 0))
+        return True
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    # ---------------- 写入 ----------------
+    def set(self, updates, save=True):
+        """更新若干键，版本号 +1 并通知监听者；无变化返回 False"""
+        if save:
+            self._reload()
+        changed = {}
+        for k, v in updates.items():
+            v = _plain(v)
+            if self.values.get(k) != v:
+                changed[k] = v
+        if not changed:
+            return False
+        self.values.update(changed)
+        self.version += 1
+        if save:
+            self.save()
+        self._notify(changed)
+        return True
+
+    def save(self):
+        data = {'schema': SCHEMA, 'version': self.version, 'values': self.values}
+        atomic_write(self.path, json.dumps(data))
+
+    # ---------------- 监听 / 热更新 ----------------
+    def on_change(self, keys, callback, fire=True):
+        """
+        注册监听: callback({键: 新值}) 只收到 keys 中变化的键 (keys=None 表示全部)
+        fire=True 时立即用当前值回调一次，使用方据此完成初始化
+        """
+        keys = None if keys is None else set(keys)
+        self.listeners.append((keys, callback))
+        if fire:
+            current = {k: v for k, v in self.values.items() if keys is None or k in keys}
+            if current:
+                callback(current)
+
+    def _notify(self, changed):
+        for keys, callback in self.listeners:
+            sub = {k: v for k, v in changed.items() if keys is None or k in keys}
+            if not sub:
+                continue
+            try:
+                callback(sub)
+            except Exception as e:
+                print("配置监听回调出错:", e)
+                self.errors += 1
+
+    def _apply(self, values, version):
+        changed = {}
+        for k, v in values.items():
+            if self.values.get(k) != v:
+                changed[k] = v
+        self.values.update(changed)
+        self.version = version
+        if changed:
+            self._notify(changed)
+        return changed
+
+    def poll(self, now=None):
+        """主循环每帧调用；文件有更新时重新加载，返回是否发生了重载"""
+        if now is None:
+            now = _ticks_ms()
+        if self.last_poll is not None and _ticks_diff(now, self.last_poll) < self.poll_ms:
+            return False
+        self.last_poll = now
+        return self._reload()
+
+    def _reload(self):
+        """重新读取文件，版本号不低于当前版本且有键变化时合并，返回是否发生了重载"""
+        try:
+            data = self._read()
+        except OSError:
+            return False
+        except ValueError as e:
+            print("配置热更新失败:", e)
+            self.errors += 1
+            return False
+        version = data.get('version', 0)
+        if version < self.version:
+            return False
+        if not self._apply(data['values'], version):
+            return False
+        self.reloads += 1
+        return True
@@ -1,22 +1,32 @@
 '''
 K230 参数实时调试工具
 在REPL中交互式调整PID参数、颜色阈值等
+颜色阈值可手动输入，也可在框选 ROI 内多帧直方图自动校准
+参数从 config_store 读取、保存回 config_store，运行中的 change1 每秒检查一次并热更新
+菜单 8 写入 gimbal_track 使用的 GIMBAL_* 键 (步进云台增益单位与 change1 舵机不同，单独保存)
 '''
 
+from lab_calibrate import calibrate
+from config import get_store
+
 class ParameterDebugger:
     """实时参数调试工具"""
     
     def __init__(self):
+        self.store = get_store()
+        st = self.store
+        pid_h = st.get('PID_H')
+        pid_v = st.get('PID_V')
         self.current_config = {
-            'red_threshold': (20, 80, 30, 100, 0, 60),
-            'pid_h_kp': 0.5,
-            'pid_h_ki': 0.05,
-            'pid_h_kd': 0.2,
-            'pid_v_kp': 0.5,
-            'pid_v_ki': 0.05,
-            'pid_v_kd': 0.2,
-            'dead_zone_x': 30,
-            'dead_zone_y': 30,
+            'red_threshold': tuple(st.get('RED_THRESHOLD')),
+            'pid_h_kp': pid_h['kp'],
+            'pid_h_ki': pid_h['ki'],
+            'pid_h_kd': pid_h['kd'],
+            'pid_v_kp': pid_v['kp'],
+            'pid_v_ki': pid_v['ki'],
+            'pid_v_kd': pid_v['kd'],
+            'dead_zone_x': st.get('DEAD_ZONE_X'),
+            'dead_zone_y': st.get('DEAD_ZONE_Y'),
         }
     
     def show_menu(self):
@@ -30,7 +40,9 @@ class ParameterDebugger:
         print("4. 调整死区")
         print("5. 显示当前参数")
         print("6. 保存参数到文件")
-        print("7. 退出")
+        print("7. 自动校准红色阈值 (摄像头)")
+        print("8. 调整云台参数 (gimbal_track)")
+        print("9. 退出")
         print("="*50)
     
     def adjust_red_threshold(self):
@@ -58,6 +70,87 @@ class ParameterDebugger:
         except ValueError:
             print("✗ 输入错误，请输入数字")
     
+    def auto_calibrate_threshold(self, snapshot=None, roi=None, frames=30, key='RED_THRESHOLD'):
+        """
+        ROI 内多帧 LAB 直方图取百分位作为红色阈值，并保存到参数存储
+        snapshot 为取帧函数，默认临时打开摄像头
+        key='GIMBAL_THRESHOLD' 时作为云台追踪阈值 (阈值列表) 保存
+        """
+        sensor = None
+        if snapshot is None:
+            from media.sensor import Sensor
+            from media.media import MediaManager
+            sensor = Sensor(width=480, height=800)
+            sensor.reset()
+            sensor.set_framesize(width=480, height=800)
+            sensor.set_pixformat(Sensor.RGB565)
+            MediaManager.init()
+            sensor.run()
+            snapshot = sensor.snapshot
+        if roi is None:
+            try:
+                text = input("ROI x,y,w,h [220,380,40,40]: ").strip() or "220,380,40,40"
+                roi = tuple(int(v) for v in text.split(','))
+            except ValueError:
+                print("✗ ROI 格式错误")
+                return None
+        
+        print(f"采样 {frames} 帧，保持目标在 ROI {roi} 内...")
+        try:
+            threshold = calibrate(snapshot, roi, frames)
+        finally:
+            if sensor is not None:
+                sensor.stop()
+        if threshold is None:
+            print("✗ 自动校准失败")
+            return None
+        print(f"✓ 已更新: {threshold}")
+        if key == 'RED_THRESHOLD':
+            self.current_config['red_threshold'] = threshold
+            self.save_to_file()
+        else:
+            self.store.set({key: [threshold]})
+            print(f"✓ 已保存 {key} (版本 {self.store.version})")
+        return threshold
+
+    def adjust_gimbal(self):
+        """调整 gimbal_track 步进云台的 PD 增益与死区，保存后运行中的云台热更新"""
+        st = self.store
+        pan = st.get('GIMBAL_PID_PAN') or {}
+        tilt = st.get('GIMBAL_PID_TILT') or {}
+        dz = st.get('GIMBAL_DEADZONE')
+        print("\n调整云台参数 (留空保持当前值；未保存过的项使用 gimbal_track 常量)")
+        print(f"当前: 水平 {pan or '未设置'}, 垂直 {tilt or '未设置'}, 死区 {dz or '未设置'}")
+        
+        def ask(prompt, current, conv):
+            text = input(f"{prompt} [{current if current is not None else '-'}]: ").strip()
+            return conv(text) if text else current
+        
+        try:
+            updates = {}
+            kp = ask("水平 Kp", pan.get('kp'), float)
+            kd = ask("水平 Kd", pan.get('kd'), float)
+            if kp is not None and kd is not None:
+                updates['GIMBAL_PID_PAN'] = {'kp': kp, 'kd': kd}
+            kp = ask("垂直 Kp", tilt.get('kp'), float)
+            kd = ask("垂直 Kd", tilt.get('kd'), float)
+            if kp is not None and kd is not None:
+                updates['GIMBAL_PID_TILT'] = {'kp': kp, 'kd': kd}
+            dz_x = ask("死区X", dz[0] if dz else None, int)
+            dz_y = ask("死区Y", dz[1] if dz else None, int)
+            if dz_x is not None and dz_y is not None:
+                updates['GIMBAL_DEADZONE'] = [dz_x, dz_y]
+        except ValueError:
+            print("✗ 输入错误")
+            return
+        
+        if updates and st.set(updates):
+            print(f"✓ 已保存到 {st.path} (版本 {st.version})，运行中的云台将自动加载")
+        else:
+            print("参数未变化")
+        if input("自动校准云台追踪阈值? (y/N): ").strip().lower() == 'y':
+            self.auto_calibrate_threshold(key='GIMBAL_THRESHOLD')
+    
     def adjust_pid_h(self):
         """调整水平PID参数"""
         print("\n调整水平舵机 PID 参数")
@@ -138,17 +231,22 @@ class ParameterDebugger:
         print("-" * 50)
     
     def save_to_file(self):
-        """保存参数到文件"""
+        """保存参数到存储文件 (版本号 +1，运行中的程序会自动加载)"""
+        cfg = self.current_config
         try:
-            with open('debug_config.py', 'w') as f:
-                f.write("# K230 调试参数配置\n\n")
-                f.write(f"RED_THRESHOLD = {self.current_config['red_threshold']}\n")
-                f.write(f"PID_H = {{'kp': {self.current_config['pid_h_kp']}, 'ki': {self.current_config['pid_h_ki']}, 'kd': {self.current_config['pid_h_kd']}}}\n")
-                f.write(f"PID_V = {{'kp': {self.current_config['pid_v_kp']}, 'ki': {self.current_config['pid_v_ki']}, 'kd': {self.current_config['pid_v_kd']}}}\n")
-                f.write(f"DEAD_ZONE_X = {self.current_config['dead_zone_x']}\n")
-                f.write(f"DEAD_ZONE_Y = {self.current_config['dead_zone_y']}\n")
+            # 先写临时文件再替换，写入中断不会损坏原配置
+            changed = self.store.set({
+                'RED_THRESHOLD': tuple(cfg['red_threshold']),
+                'PID_H': {'kp': cfg['pid_h_kp'], 'ki': cfg['pid_h_ki'], 'kd': cfg['pid_h_kd']},
+                'PID_V': {'kp': cfg['pid_v_kp'], 'ki': cfg['pid_v_ki'], 'kd': cfg['pid_v_kd']},
+                'DEAD_ZONE_X': cfg['dead_zone_x'],
+                'DEAD_ZONE_Y': cfg['dead_zone_y'],
+            })
             
-            print("✓ 已保存到 debug_config.py")
+            if changed:
+                print(f"✓ 已保存到 {self.store.path} (版本 {self.store.version})")
+            else:
+                print("参数未变化")
             
         except Exception as e:
             print(f"✗ 保存失败: {e}")
@@ -157,7 +255,7 @@ class ParameterDebugger:
         """运行调试工具"""
         while True:
             self.show_menu()
-            choice = input("请选择 (1-7): ")
+            choice = input("请选择 (1-9): ")
             
             if choice == '1':
                 self.adjust_red_threshold()
@@ -172,6 +270,10 @@ class ParameterDebugger:
             elif choice == '6':
                 self.save_to_file()
             elif choice == '7':
+                self.auto_calibrate_threshold()
+            elif choice == '8':
+                self.adjust_gimbal()
+            elif choice == '9':
                 print("退出")
                 break
             else:
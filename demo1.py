@@ -9,6 +9,8 @@ from media.display import *
 from media.media import *
 from machine import Pin, UART
 import ustruct
+from target_motion import TargetRateEstimator
+from threshold_adapt import AdaptiveThreshold
 
 # ========== 基本参数 ==========
 W, H = 800, 480
@@ -21,6 +23,11 @@ MOTOR_ADDR_V = 2  # 垂直电机地址
 # 红色阈值
 RED_TH = (20, 80, 30, 100, 0, 60)
 
+# 阈值自适应：锁定目标后按色块 LAB 统计缓慢收放阈值 (限制在 RED_TH 外扩的安全范围内)，
+# 色块数暴涨时回滚
+ADAPT_TH = True
+MAX_BLOBS = 4          # 超过该色块数视为阈值失控
+
 # ===== 稳定性控制参数 =====
 DEADZONE = 10          # 死区(像素) - 在此范围内不动
 SMOOTH = 0.4          # 平滑系数(0~1, 越小越稳)
@@ -28,6 +35,13 @@ PAN_SCALE = 0.5        # 水平灵敏度（电机速度缩放）
 TILT_SCALE = 0.5       # 垂直灵敏度（电机速度缩放）
 MIN_MOVE = 30         # 最小移动量
 
+# ===== 速度前馈 =====
+FF_PX_PER_REV = 2400   # 电机转一圈画面移动的像素(按镜头视场标定)
+FF_GAIN = 0.9          # 前馈比例(<1 给比例修正留余量)
+
+# 双轴同步：两轴速度指令带同步标志暂存，每帧一次广播触发同时生效
+SYNC_AXES = True
+
 # 距离参数
 DIST_REF = 5000        # 参考像素数
 
@@ -35,6 +49,10 @@ DIST_REF = 5000        # 参考像素数
 smooth_x, smooth_y = 0.0, 0.0
 pixel_avg = DIST_REF
 uart1 = None
+rate_h = TargetRateEstimator(FF_PX_PER_REV)
+rate_v = TargetRateEstimator(FF_PX_PER_REV)
+red_th = AdaptiveThreshold(RED_TH, max_blobs=MAX_BLOBS)
+last_spd_h, last_spd_v = 0, 0   # 上一次下发的转速(本帧曝光期间生效)
 
 # ========== 电机控制函数 ==========
 def Emm_V5_En_Control(addr, state, snF):
@@ -86,29 +104,44 @@ def Emm_V5_Stop_Now(addr, snF):
     cmd[4] = 0x6B
     uart1.write(cmd)
 
+def Emm_V5_Synchronous_motion(addr):
+    """多机同步运动触发 (addr 为 0 时广播)"""
+    cmd = bytearray(4)
+    cmd[0] = addr
+    cmd[1] = 0xFF
+    cmd[2] = 0x66
+    cmd[3] = 0x6B
+    uart1.write(cmd)
+
 def motor_control_horizontal(speed):
     """水平方向电机控制
     speed > 0: 右转
     speed < 0: 左转
+    返回实际下发的带符号转速
     """
     if abs(speed) < 10:
-        Emm_V5_Stop_Now(MOTOR_ADDR_H, False)
+        Emm_V5_Stop_Now(MOTOR_ADDR_H, SYNC_AXES)
     else:
         direction = 0 if speed > 0 else 1
         rpm = min(abs(int(speed)), 1000)  # 限制最大速度
-        Emm_V5_Vel_Control(MOTOR_ADDR_H, direction, rpm, 50, False)
+        Emm_V5_Vel_Control(MOTOR_ADDR_H, direction, rpm, 50, SYNC_AXES)
+        return rpm if speed > 0 else -rpm
+    return 0
 
 def motor_control_vertical(speed):
     """垂直方向电机控制
     speed > 0: 上升
     speed < 0: 下降
+    返回实际下发的带符号转速
     """
     if abs(speed) < 10:
-        Emm_V5_Stop_Now(MOTOR_ADDR_V, False)
+        Emm_V5_Stop_Now(MOTOR_ADDR_V, SYNC_AXES)
     else:
         direction = 0 if speed > 0 else 1
         rpm = min(abs(int(speed)), 1000)  # 限制最大速度
-        Emm_V5_Vel_Control(MOTOR_ADDR_V, direction, rpm, 50, False)
+        Emm_V5_Vel_Control(MOTOR_ADDR_V, direction, rpm, 50, SYNC_AXES)
+        return rpm if speed > 0 else -rpm
+    return 0
 
 def init_hw():
     global uart1
@@ -143,7 +176,7 @@ def init_hw():
     return s
 
 def main():
-    global smooth_x, smooth_y, pixel_avg
+    global smooth_x, smooth_y, pixel_avg, last_spd_h, last_spd_v
 
     print("电机追踪模式启动")
     cam = init_hw()
@@ -152,10 +185,13 @@ def main():
         while True:
             img = cam.snapshot()
 
-            blobs = img.find_blobs([RED_TH], pixels_threshold=200, merge=True)
+            th = red_th.threshold() if ADAPT_TH else RED_TH
+            blobs = img.find_blobs([th], pixels_threshold=200, merge=True)
 
             if blobs:
                 b = max(blobs, key=lambda x: x.pixels())
+                if ADAPT_TH:
+                    red_th.update(img, b, len(blobs))
                 x, y, px = b.cx(), b.cy(), b.pixels()
 
                 # 原始误差
@@ -169,27 +205,38 @@ def main():
                 # 像素数平滑(距离)
                 pixel_avg = pixel_avg * 0.9 + px * 0.1
 
+                # 目标自身角速度前馈：误差变化率 + 云台当前转速
+                # (水平轴正转使误差减小的方向与 raw_x 相反，故取负)
+                now = time.ticks_ms()
+                ff_h = FF_GAIN * rate_h.update(-raw_x, last_spd_h, now)
+                ff_v = FF_GAIN * rate_v.update(raw_y, last_spd_v, now)
+
                 # === 水平控制 ===
                 if abs(smooth_x) > DEADZONE:
-                    spd = -smooth_x * PAN_SCALE
+                    spd = -smooth_x * PAN_SCALE + ff_h
                     if spd > 0:
                         spd = max(spd, MIN_MOVE)
                     else:
                         spd = min(spd, -MIN_MOVE)
-                    motor_control_horizontal(spd)
+                    last_spd_h = motor_control_horizontal(spd)
                 else:
-                    motor_control_horizontal(0)
+                    # 死区内只保留前馈跟随
+                    last_spd_h = motor_control_horizontal(ff_h)
 
                 # === 垂直控制 ===
                 if abs(smooth_y) > DEADZONE:
-                    spd = smooth_y * TILT_SCALE
+                    spd = smooth_y * TILT_SCALE + ff_v
                     if spd > 0:
                         spd = max(spd, MIN_MOVE)
                     else:
                         spd = min(spd, -MIN_MOVE)
-                    motor_control_vertical(spd)
+                    last_spd_v = motor_control_vertical(spd)
                 else:
-                    motor_control_vertical(0)
+                    last_spd_v = motor_control_vertical(ff_v)
+
+                # 两轴指令已暂存，广播触发同时执行
+                if SYNC_AXES:
+                    Emm_V5_Synchronous_motion(0)
 
                 # 绘制
                 img.draw_rectangle(b.rect(), color=(255,0,0), thickness=2)
@@ -211,7 +258,14 @@ def main():
             else:
                 motor_control_horizontal(0)
                 motor_control_vertical(0)
+                if SYNC_AXES:
+                    Emm_V5_Synchronous_motion(0)
                 smooth_x, smooth_y = 0, 0
+                last_spd_h, last_spd_v = 0, 0
+                rate_h.reset()
+                rate_v.reset()
+                if ADAPT_TH:
+                    red_th.update(img, None, 0)
                 img.draw_string_advanced(20, 40, 32, "搜索中", color=(255,150,150))
 
             # 中心准星
@@ -0,0 +1,174 @@
+'''
+K230 级联检测器 - 廉价阶段先给出候选区域，昂贵阶段只在候选区域内运行
+阶段1 (propose): find_blobs 色块 + 上一次命中位置 → 候选 ROI
+阶段2 (rect/circle 等): cv_lite 矩形/霍夫圆只在 ROI 内运行
+每隔 full_period 帧做一次全图搜索，防止目标不带颜色或偏离候选区时永远找不到
+每个阶段统计调用次数、命中次数与耗时，用于调整各阶段参数
+ROI 边长按 ROI_ALIGN 向上取整，尺寸种类少，调用方可按尺寸复用预分配的灰度缓冲
+'''
+
+import time
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+# ==================== 默认参数 ====================
+ROI_MARGIN = 40        # 候选框外扩像素
+MAX_ROIS = 2           # 每帧最多送入昂贵阶段的候选区域数
+MIN_ROI_SIZE = 48      # 候选区域最小边长 (过小的区域 Canny/霍夫无意义)
+FULL_PERIOD = 15       # 全图搜索帧间隔，其余帧只搜候选区 (<= 1 即每帧全图，相当于关闭级联)
+HOLD_FRAMES = 5        # 上一次命中位置作为候选保留的帧数
+ROI_ALIGN = 32         # ROI 宽高取整粒度
+
+
+class _Stage:
+    __slots__ = ('name', 'calls', 'hits', 'time_us', 't0')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.hits = 0
+        self.time_us = 0
+        self.t0 = 0
+
+    def hit_rate(self):
+        return self.hits / self.calls if self.calls else 0.0
+
+    def avg_ms(self):
+        return self.time_us / self.calls / 1000 if self.calls else 0.0
+
+
+class DetectCascade:
+    """级联检测调度与统计"""
+
+    def __init__(self, width, height, margin=ROI_MARGIN, max_rois=MAX_ROIS,
+                 full_period=FULL_PERIOD, hold_frames=HOLD_FRAMES):
+        self.W = width
+        self.H = height
+        self.margin = margin
+        self.max_rois = max_rois
+        self.full_period = full_period
+        self.hold_frames = hold_frames
+
+        self.stages = {}
+        self.last_hit = None       # 上一次命中的外接框 (x, y, w, h)
+        self.hit_age = 0
+        self.frames_since_full = 0
+
+    # ---------- 统计 ----------
+    def begin(self, name):
+        """阶段计时开始"""
+        st = self.stages.get(name)
+        if st is None:
+            st = _Stage(name)
+            self.stages[name] = st
+        st.t0 = _ticks_us()
+
+    def end(self, name, hit):
+        """阶段计时结束，hit 为该阶段是否产出有效结果"""
+        st = self.stages[name]
+        st.time_us += _ticks_diff(_ticks_us(), st.t0)
+        st.calls += 1
+        if hit:
+            st.hits += 1
+
+    def hit_rates(self):
+        """{阶段名: (命中率, 平均耗时ms, 调用次数)}"""
+        return {n: (st.hit_rate(), st.avg_ms(), st.calls) for n, st in self.stages.items()}
+
+    # ---------- ROI ----------
+    def expand(self, rect):
+        """外扩并裁剪到画面内，保证最小边长"""
+        x, y, w, h = rect
+        m = self.margin
+        x0 = max(0, x - m)
+        y0 = max(0, y - m)
+        x1 = min(self.W, x + w + m)
+        y1 = min(self.H, y + h + m)
+        if x1 - x0 < MIN_ROI_SIZE:
+            x0 = max(0, min(x0, self.W - MIN_ROI_SIZE))
+            x1 = min(self.W, x0 + MIN_ROI_SIZE)
+        if y1 - y0 < MIN_ROI_SIZE:
+            y0 = max(0, min(y0, self.H - MIN_ROI_SIZE))
+            y1 = min(self.H, y0 + MIN_ROI_SIZE)
+        x0, x1 = _align(x0, x1, self.W)
+        y0, y1 = _align(y0, y1, self.H)
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def area_ratio(self, ratio, roi):
+        """
+        全图面积比例换算到 ROI 内: 保持最小矩形的像素面积与全图检测一致
+        (ROI 越小比例越大，上限 1)
+        """
+        return min(1.0, ratio * self.W * self.H / (roi[2] * roi[3]))
+
+    def propose(self, blobs):
+        """
+        根据色块与上一次命中位置生成候选 ROI
+        blobs: find_blobs 结果 (按像素数取最大的 max_rois 个)
+        返回: (rois, full)  full=True 表示本帧应做全图搜索；rois 为空表示本帧跳过昂贵阶段
+        """
+        self.begin('propose')
+        rois = []
+        if self.last_hit is not None and self.hit_age < self.hold_frames:
+            rois.append(self.expand(self.last_hit))
+
+        if blobs:
+            ranked = sorted(blobs, key=lambda b: -b.pixels())
+            for b in ranked:
+                if len(rois) >= self.max_rois:
+                    break
+                roi = self.expand(b.rect())
+                if not any(_contains(r, roi) for r in rois):
+                    rois.append(roi)
+
+        self.end('propose', bool(rois))
+
+        self.frames_since_full += 1
+        if self.frames_since_full >= self.full_period:
+            self.frames_since_full = 0
+            return [(0, 0, self.W, self.H)], True
+        return rois, False
+
+    def report(self, rect):
+        """
+        上报本帧最终命中 (全图坐标外接框)，None 表示未命中
+        """
+        if rect is None:
+            self.hit_age += 1
+        else:
+            self.last_hit = rect
+            self.hit_age = 0
+
+
+def _align(lo, hi, limit):
+    """区间长度向上取整到 ROI_ALIGN，越界时向内平移 (超过画面则取整个画面)"""
+    n = -(-(hi - lo) // ROI_ALIGN) * ROI_ALIGN
+    if n >= limit:
+        return 0, limit
+    lo = max(0, min(lo, limit - n))
+    return lo, lo + n
+
+
+def _contains(outer, inner):
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def offset_rect(rect, dx, dy):
+    """cv_lite 矩形结果 [x, y, w, h, x0, y0, ... x3, y3] 由 ROI 坐标平移回全图坐标"""
+    out = list(rect)
+    out[0] += dx
+    out[1] += dy
+    for i in range(4, 12, 2):
+        out[i] += dx
+        out[i + 1] += dy
+    return out
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pty 虚拟总线设备 (主机端，Linux)
+打开一个伪终端，模拟同一总线上的 ZP25S 舵机与 Emm_V5/X42S 步进驱动器，
+主机脚本把 /dev/pts/N 当作真实串口使用:
+- ZP25S ASCII: #IDPxxxxTyyyy! 运动、{...} 组指令 (收到 '}' 后同时启动)、
+  RAD 读角度 (#001P1500!)、PID 查询 (#001P!)、DST 停止
+- ZP25S 二进制: FF FF ID 长度 03 位置(2B) 时间(2B) 异或校验 FE (servo_uart7.py)，
+  binary_ack=True 时回一帧 FF FF ID 01 03 校验 FE (模拟约定，便于测延迟)
+- Emm/X42S: F1 / FC / FD / F6 / FE / 00 FF 66 同步触发，35 / 36 / 3A 读取；
+  控制指令应答 addr code 02 6B (广播地址不应答)，电机运动用 gimbal_sim.StepperAxis
+- X42S C6 限流速度模式 (redtest.motor_speed): addr C6 方向 加速度(2B, RPM/s)
+  速度(2B, 0.1RPM) 同步 电流(2B, mA) CRC16，CRC16 为 Modbus 低字节在前，
+  应答 addr C6 02 CRC16；CRC 错误的帧丢弃并计入 bad
+- 字节时序: 按波特率计每字节线上时间，帧最后一个字节收完才处理，
+  应答在转向时间后排队发出，应答字节同样按线上时间到达；
+  空闲超过 FRAME_GAP 后残余的半帧字节被丢弃
+
+用法:
+    python3 fake_bus_device.py                      # 打印端口后常驻，Ctrl-C 退出
+    python3 orangepi-test1.py /dev/pts/N            # 另一个终端
+    python3 fake_bus_device.py --bench              # 主机驱动吞吐/延迟测试，超限返回 1
+    python3 fake_bus_device.py --servos 1,2 --motors 1,2 --baud 115200 --turnaround 1
+"""
+
+import heapq
+import os
+import select
+import sys
+import threading
+import time
+import tty
+
+import gimbal_sim
+from zp25s_bus import xor_checksum, wire_time, BINARY_MOVE
+
+PULSE_PER_REV = 3200
+FRAME_GAP = 0.005       # 总线空闲超过该时间，丢弃未成帧的残余字节 (帧间隔重同步)
+
+# Emm 指令长度 (含地址与 6B 校验)
+EMM_LEN = {
+    0xF1: 8,        # addr F1 速度(2B) 加速度 01 00 6B
+    0xFC: 7,        # addr FC 位置(4B) 6B
+    0xFD: 13,       # addr FD 方向 速度(2B) 加速度 脉冲(4B) 绝对 同步 6B
+    0xF6: 8,        # addr F6 方向 速度(2B) 加速度 同步 6B
+    0xFE: 5,        # addr FE 98 同步 6B
+    0xFF: 4,        # 00 FF 66 6B
+    0x35: 3,
+    0x36: 3,
+    0x3A: 3,
+}
+
+# X42S CRC16 校验帧长度 (含地址与 2 字节 CRC)
+X42S_LEN = {
+    0xC6: 12,       # addr C6 方向 加速度(2B) 速度(2B) 同步 电流(2B) CRC16
+}
+
+
+def crc16(data):
+    """Modbus CRC16 (与 redtest.crc16 相同)"""
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def with_crc16(data):
+    crc = crc16(data)
+    return bytes(data) + bytes((crc & 0xFF, crc >> 8))
+
+
+class FakeServo:
+    """ZP25S 舵机：在指定时间内从当前位置线性运动到目标 PWM"""
+
+    def __init__(self, pwm=1500):
+        self.start_pwm = pwm
+        self.target = pwm
+        self.t0 = 0.0
+        self.dur = 0.0
+
+    def position(self, now):
+        if self.dur <= 0 or now >= self.t0 + self.dur:
+            return self.target
+        k = (now - self.t0) / self.dur
+        return self.start_pwm + (self.target - self.start_pwm) * k
+
+    def move(self, pwm, dur, now):
+        self.start_pwm = self.position(now)
+        self.target = pwm
+        self.t0 = now
+        self.dur = dur
+
+    def stop(self, now):
+        self.start_pwm = self.target = self.position(now)
+        self.dur = 0.0
+
+
+class FakeBusDevice:
+    def __init__(self, servo_ids=(1, 2, 3), motor_addrs=(1, 2), baudrate=115200, turnaround_ms=1.0,
+                 timing=True, emm_ack=True, binary_ack=False, pulse_per_rev=PULSE_PER_REV,
+                 debug=False):
+        self.servos = {sid: FakeServo() for sid in servo_ids}
+        self.motors = {addr: gimbal_sim.StepperAxis(0, speed_unit=pulse_per_rev / 60.0)
+                       for addr in motor_addrs}
+        self.baudrate = baudrate
+        self.turnaround = turnaround_ms / 1000.0
+        self.byte_time = 10.0 / baudrate if timing else 0.0
+        self.emm_ack = emm_ack
+        self.binary_ack = binary_ack
+        self.pulse_per_rev = pulse_per_rev
+        self.debug = debug
+
+        self.master = None
+        self.slave = None
+        self.port = None
+        self.thread = None
+        self.running = False
+
+        self.buf = bytearray()
+        self.buf_t = []             # 每个字节收完的时刻
+        self.rx_clock = 0.0         # 主机→设备线路空闲时刻
+        self.tx_clock = 0.0         # 设备→主机线路空闲时刻
+        self.events = []            # 堆: (时刻, 序号, 函数, 参数)
+        self.seq = 0
+        self.group = None           # 组指令内暂存的运动
+        self.staged = []            # Emm 同步标志暂存的动作
+        self.sim_t = None           # 电机模型已推进到的时刻
+
+        self.frames = 0
+        self.replies = 0
+        self.bad = 0
+
+    # ---------------- 生命周期 ----------------
+    def start(self):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='fake-bus', daemon=True)
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(0.5)
+            self.thread = None
+        for fd in (self.master, self.slave):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        return {'frames': self.frames, 'replies': self.replies, 'bad': self.bad}
+
+    # ---------------- 事件循环 ----------------
+    def _schedule(self, t, fn, arg):
+        self.seq += 1
+        heapq.heappush(self.events, (t, self.seq, fn, arg))
+
+    def _run(self):
+        while self.running:
+            now = time.monotonic()
+            while self.events and self.events[0][0] <= now:
+                t, _, fn, arg = heapq.heappop(self.events)
+                fn(arg, t)
+            timeout = 0.05
+            if self.events:
+                timeout = max(0.0, min(timeout, self.events[0][0] - time.monotonic()))
+            try:
+                r, _, _ = select.select([self.master], [], [], timeout)
+                if r:
+                    self._receive(os.read(self.master, 4096), time.monotonic())
+            except OSError:
+                return
+
+    def _receive(self, data, t):
+        if self.buf and t - self.rx_clock > FRAME_GAP:
+            self.bad += 1
+            del self.buf[:]
+            del self.buf_t[:]
+        self.rx_clock = max(self.rx_clock, t)
+        for b in data:
+            self.rx_clock += self.byte_time
+            self.buf.append(b)
+            self.buf_t.append(self.rx_clock)
+        self._split()
+
+    def _take(self, n):
+        t = self.buf_t[n - 1]
+        frame = bytes(self.buf[:n])
+        del self.buf[:n]
+        del self.buf_t[:n]
+        return frame, t
+
+    def _drop(self):
+        del self.buf[:1]
+        del self.buf_t[:1]
+        self.bad += 1
+
+    def _split(self):
+        """把接收缓冲切成完整帧，按最后一个字节的到达时刻排入事件队列"""
+        buf = self.buf
+        while buf:
+            b = buf[0]
+            if b == 0x23:                                       # '#'
+                end = buf.find(b'!')
+                if end < 0:
+                    if len(buf) > 64:
+                        self._drop()
+                        continue
+                    return
+                frame, t = self._take(end + 1)
+                self._schedule(t, self._handle_ascii, frame)
+            elif b in (0x7B, 0x7D):                             # '{' '}'
+                frame, t = self._take(1)
+                self._schedule(t, self._handle_group, frame)
+            elif b == 0xFF:
+                if len(buf) < 4:
+                    return
+                if buf[1] != 0xFF:
+                    self._drop()
+                    continue
+                total = 6 + buf[3]
+                if len(buf) < total:
+                    return
+                if buf[total - 1] != 0xFE or xor_checksum(buf[2:total - 2]) != buf[total - 2]:
+                    self._drop()
+                    continue
+                frame, t = self._take(total)
+                self._schedule(t, self._handle_binary, frame)
+            elif b == 0x00 or b in self.motors:
+                if len(buf) < 2:
+                    return
+                n = X42S_LEN.get(buf[1])
+                if n is not None:
+                    if len(buf) < n:
+                        return
+                    if crc16(buf[:n - 2]) != buf[n - 2] | (buf[n - 1] << 8):
+                        self._drop()
+                        continue
+                    frame, t = self._take(n)
+                    self._schedule(t, self._handle_x42s, frame)
+                    continue
+                n = EMM_LEN.get(buf[1])
+                if n is None:
+                    self._drop()
+                    continue
+                if len(buf) < n:
+                    return
+                if buf[n - 1] != 0x6B:
+                    self._drop()
+                    continue
+                frame, t = self._take(n)
+                self._schedule(t, self._handle_emm, frame)
+            else:
+                self._drop()
+
+    def _reply(self, data, t):
+        """转向时间后开始发送，字节按线上时间到达主机"""
+        start = max(t + self.turnaround, self.tx_clock)
+        self.tx_clock = start + len(data) * self.byte_time
+        self._schedule(self.tx_clock, self._write, data)
+
+    def _write(self, data, t):
+        if self.debug:
+            print("[设备→主机]", data)
+        try:
+            os.write(self.master, data)
+            self.replies += 1
+        except OSError:
+            pass
+
+    # ---------------- ZP25S ----------------
+    def _handle_group(self, frame, t):
+        if frame == b'{':
+            self.group = []
+            return
+        moves, self.group = self.group or [], None
+        for servo, pwm, dur in moves:
+            servo.move(pwm, dur, t)
+
+    def _handle_ascii(self, frame, t):
+        if self.debug:
+            print("[主机→设备]", frame)
+        text = frame[1:-1].decode('ascii', 'replace')
+        if len(text) < 3 or not text[:3].isdigit():
+            self.bad += 1
+            return
+        sid = int(text[:3])
+        servo = self.servos.get(sid)
+        if servo is None:
+            return
+        self.frames += 1
+        cmd = text[3:]
+        if cmd.startswith('P') and 'T' in cmd and cmd[1:5].isdigit():
+            pwm = max(500, min(2500, int(cmd[1:5])))
+            dur = int(cmd[cmd.index('T') + 1:] or 0) / 1000.0
+            if self.group is not None:
+                self.group.append((servo, pwm, dur))
+            else:
+                servo.move(pwm, dur, t)
+        elif cmd == 'RAD':
+            self._reply(b'#%03dP%04d!' % (sid, int(round(servo.position(t)))), t)
+        elif cmd == 'PID':
+            self._reply(b'#%03dP!' % sid, t)
+        elif cmd == 'DST':
+            servo.stop(t)
+
+    def _handle_binary(self, frame, t):
+        sid, cmd, params = frame[2], frame[4], frame[5:-2]
+        servo = self.servos.get(sid)
+        if servo is None:
+            return
+        self.frames += 1
+        if cmd == BINARY_MOVE and len(params) >= 4:
+            pos = (params[0] << 8) | params[1]
+            dur = ((params[2] << 8) | params[3]) / 1000.0
+            pwm = 500 + pos * 2000.0 / 1024          # 0-1023 → 0-240° → PWM
+            servo.move(max(500, min(2500, pwm)), dur, t)
+        if self.binary_ack:
+            data = bytes((sid, 1, cmd))
+            self._reply(b'\xff\xff' + data + bytes((xor_checksum(data), 0xFE)), t)
+
+    # ---------------- Emm/X42S ----------------
+    def _advance(self, t):
+        """电机模型以 1 ms 步长推进到 t"""
+        if self.sim_t is None:
+            self.sim_t = t
+        while self.sim_t + 0.001 <= t:
+            for m in self.motors.values():
+                m.step(0.001)
+            self.sim_t += 0.001
+
+    def _handle_emm(self, frame, t):
+        self._advance(t)
+        addr, code = frame[0], frame[1]
+        if addr == 0x00:
+            motors = list(self.motors.values())
+        else:
+            motors = [self.motors[addr]]
+        self.frames += 1
+        f = frame
+        if code == 0xF1:
+            for m in motors:
+                m.set_speed((f[2] << 8) | f[3], gimbal_sim.emm_acc_to_pps2(f[4], self.pulse_per_rev))
+        elif code == 0xFC:
+            pos = int.from_bytes(f[2:6], 'big', signed=True)
+            for m in motors:
+                m.move_abs(pos)
+        elif code == 0xFD:
+            rpm = (f[3] << 8) | f[4]
+            acc = gimbal_sim.emm_acc_to_pps2(f[5], self.pulse_per_rev)
+            pulses = int.from_bytes(f[6:10], 'big')
+            if f[2]:
+                pulses = -pulses
+            for m in motors:
+                target = pulses if f[10] else m.target + pulses
+                self._run_or_stage(f[11], self._move_action(m, rpm, acc, target))
+        elif code == 0xF6:
+            rpm = (f[3] << 8) | f[4]
+            acc = gimbal_sim.emm_acc_to_pps2(f[5], self.pulse_per_rev)
+            far = -1e12 if f[2] else 1e12
+            for m in motors:
+                self._run_or_stage(f[6], self._move_action(m, rpm, acc, far))
+        elif code == 0xFE:
+            for m in motors:
+                self._run_or_stage(f[3], self._stop_action(m))
+        elif code == 0xFF:
+            if f[2] == 0x66:
+                staged, self.staged = self.staged, []
+                for action in staged:
+                    action()
+            return
+        else:
+            if addr != 0x00:
+                self._reply(self._status(addr, code, motors[0]), t)
+            return
+        if self.emm_ack and addr != 0x00:
+            self._reply(bytes((addr, code, 0x02, 0x6B)), t)
+
+    def _handle_x42s(self, frame, t):
+        self._advance(t)
+        addr, f = frame[0], frame
+        motors = list(self.motors.values()) if addr == 0x00 else [self.motors[addr]]
+        self.frames += 1
+        # C6: 加速度 RPM/s → pulse/s²，速度单位 0.1 RPM；电流限幅不建模
+        acc = ((f[3] << 8) | f[4]) * self.pulse_per_rev / 60.0
+        rpm = ((f[5] << 8) | f[6]) / 10.0
+        far = -1e12 if f[2] else 1e12
+        for m in motors:
+            self._run_or_stage(f[7], self._move_action(m, rpm, acc, far))
+        if self.emm_ack and addr != 0x00:
+            self._reply(with_crc16(bytes((addr, 0xC6, 0x02))), t)
+
+    @staticmethod
+    def _move_action(m, rpm, acc, target):
+        def action():
+            m.set_speed(rpm, acc)
+            m.move_abs(target)
+        return action
+
+    @staticmethod
+    def _stop_action(m):
+        def action():
+            m.velocity = 0.0
+            m.move_abs(m.position)
+        return action
+
+    def _run_or_stage(self, sync, action):
+        if sync:
+            self.staged.append(action)
+        else:
+            action()
+
+    def _status(self, addr, code, m):
+        """按 Emm 读取应答格式编码电机状态 (与 gimbal_loop_sim 一致)"""
+        if code == 0x36:
+            raw = int(round(m.position * 65536 / self.pulse_per_rev))
+            return bytes((addr, code, 1 if raw < 0 else 0)) + abs(raw).to_bytes(4, 'big') + b'\x6b'
+        if code == 0x35:
+            rpm = int(round(m.velocity / m.speed_unit))
+            return bytes((addr, code, 1 if rpm < 0 else 0)) + abs(rpm).to_bytes(2, 'big') + b'\x6b'
+        in_pos = 0x02 if abs(m.target - m.position) < 1 else 0
+        return bytes((addr, code, 0x01 | in_pos, 0x6B))
+
+
+# ---------------- 主机驱动测试 ----------------
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _check(name, value, limit, upper=True):
+    """打印一项指标并与界限比较"""
+    ok = value <= limit if upper else value >= limit
+    print("  %s: %.2f (%s %.2f) %s" % (name, value, '≤' if upper else '≥', limit,
+                                      'OK' if ok else '超限'))
+    return ok
+
+
+def x42s_speed_frame(addr, rpm, acc=1000, current=2000, sync=0):
+    """按 redtest.motor_speed 编码 C6 限流速度帧"""
+    direction = 0x01 if rpm < 0 else 0x00
+    speed = int(min(abs(rpm), 3000) * 10)
+    return with_crc16(bytes((addr, 0xC6, direction, acc >> 8, acc & 0xFF, speed >> 8, speed & 0xFF,
+                             sync, current >> 8, current & 0xFF)))
+
+
+def bench(rounds=50, baudrate=115200, turnaround_ms=1.0, slack_ms=5.0, max_miss=0.05):
+    """ZP25SBus 批量读角度、Emm 位置读取、X42S C6 速度帧的延迟/吞吐
+
+    界限由线上时间推出：理想延迟 = 请求字节 + 转向时间 + 全部应答字节，
+    p95 不得超过 1.5 倍理想值加 slack_ms (主机调度抖动)，吞吐不得低于理想值一半；
+    ZP25SBus 超时按设计返回 None，主机偶发卡顿会让一轮读取整体缺失，
+    有缺失的轮次占比不得超过 max_miss。
+    任一项超限或应答错误返回 False。
+    """
+    import serial
+    from zp25s_bus import ZP25SBus, ascii_cmd
+
+    dev = FakeBusDevice(servo_ids=(1, 2, 3, 4), motor_addrs=(1, 2), baudrate=baudrate,
+                        turnaround_ms=turnaround_ms)
+    port = dev.start()
+    turn = turnaround_ms / 1000.0
+    ok = True
+    try:
+        bus = ZP25SBus(port, baudrate)
+        bus.open()
+        bus.set_angles({1: 30, 2: 90, 3: 150, 4: 210}, 1)
+        time.sleep(0.01)
+        ids = [1, 2, 3, 4]
+        lat = []
+        miss = 0
+        t_all = time.monotonic()
+        for _ in range(rounds):
+            t0 = time.monotonic()
+            angles = bus.read_angles(ids)
+            lat.append((time.monotonic() - t0) * 1000)
+            miss += None in angles.values()
+        total = time.monotonic() - t_all
+        ideal = (wire_time(len(ascii_cmd(1, "RAD")), baudrate) + turn +
+                 wire_time(len(ids) * len(b'#001P1500!'), baudrate)) * 1000
+        print("ZP25S 读 4 舵机: 平均 %.2f ms, 理想 %.2f ms" % (sum(lat) / len(lat), ideal))
+        ok &= _check("p95 延迟 ms", _percentile(lat, 0.95), ideal * 1.5 + slack_ms)
+        ok &= _check("读取/秒", rounds * len(ids) / total, len(ids) / ideal * 1000 * 0.5, upper=False)
+        ok &= _check("缺失轮次 %", 100.0 * miss / rounds, 100.0 * max_miss)
+        bus.close()
+
+        # 丢弃上一阶段超时后迟到的应答，避免后续读取错位
+        time.sleep(0.02)
+        ser = serial.Serial(port, baudrate, timeout=0.1)
+        ser.reset_input_buffer()
+        ser.write(bytes((0x01, 0xFD, 0x00, 0x01, 0x2C, 0x00, 0x00, 0x00, 0x0C, 0x80, 0x01, 0x00, 0x6B)))
+        ok &= _check("FD 应答错误", ser.read(4) != b'\x01\xfd\x02\x6b', 0)
+        lat = []
+        bad = 0
+        t_all = time.monotonic()
+        for _ in range(rounds):
+            t0 = time.monotonic()
+            ser.write(b'\x01\x36\x6b')
+            reply = ser.read(8)
+            lat.append((time.monotonic() - t0) * 1000)
+            bad += not (len(reply) == 8 and reply[:2] == b'\x01\x36')
+        total = time.monotonic() - t_all
+        ideal = (wire_time(3, baudrate) + turn + wire_time(8, baudrate)) * 1000
+        print("Emm 读位置: 平均 %.2f ms, 理想 %.2f ms, 末次位置 %d/65536 圈"
+              % (sum(lat) / len(lat), ideal, int.from_bytes(reply[3:7], 'big')))
+        ok &= _check("p95 延迟 ms", _percentile(lat, 0.95), ideal * 1.5 + slack_ms)
+        ok &= _check("读取/秒", rounds / total, 1000 / ideal * 0.5, upper=False)
+        ok &= _check("错误应答", bad, 0)
+
+        # X42S C6: 逐帧应答延迟，坏 CRC 帧丢弃不应答，最后读回速度
+        ack = with_crc16(b'\x02\xc6\x02')
+        lat = []
+        bad = 0
+        for i in range(rounds):
+            t0 = time.monotonic()
+            ser.write(x42s_speed_frame(2, -300 if i == rounds - 1 else 100 + i))
+            bad += ser.read(len(ack)) != ack
+            lat.append((time.monotonic() - t0) * 1000)
+        ideal = (wire_time(12, baudrate) + turn + wire_time(len(ack), baudrate)) * 1000
+        print("X42S C6 速度帧: 平均 %.2f ms, 理想 %.2f ms" % (sum(lat) / len(lat), ideal))
+        ok &= _check("p95 延迟 ms", _percentile(lat, 0.95), ideal * 1.5 + slack_ms)
+        ok &= _check("错误应答", bad, 0)
+        dropped = dev.bad
+        frame = bytearray(x42s_speed_frame(2, 500))
+        frame[-1] ^= 0xFF
+        ser.write(bytes(frame))
+        ok &= _check("坏 CRC 帧被应答", ser.read(len(ack)) != b'' or dev.bad == dropped, 0)
+        time.sleep(0.4)             # 1000 RPM/s 加速到 300 RPM 需 0.3 s
+        ser.write(b'\x02\x35\x6b')
+        reply = ser.read(6)
+        rpm = int.from_bytes(reply[3:5], 'big') * (-1 if reply[2] else 1) if len(reply) == 6 else None
+        print("X42S 读速度: %s RPM (期望 -300)" % rpm)
+        ok &= rpm == -300
+        ser.close()
+    finally:
+        dev.stop()
+    print("设备统计:", dev.stats())
+    print("测试", "通过" if ok else "失败")
+    return ok
+
+
+def _arg(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+if __name__ == '__main__':
+    baud = int(_arg('--baud', 115200))
+    if '--bench' in sys.argv:
+        sys.exit(0 if bench(int(_arg('--rounds', 50)), baud) else 1)
+    servos = [int(x) for x in _arg('--servos', '1,2,3').split(',') if x]
+    motors = [int(x) for x in _arg('--motors', '1,2').split(',') if x]
+    device = FakeBusDevice(servos, motors, baud, float(_arg('--turnaround', 1.0)),
+                           debug='--debug' in sys.argv)
+    print("虚拟总线设备:", device.start())
+    print("舵机 ID:", servos, " 电机地址:", motors, " 波特率:", baud)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+        print("设备统计:", device.stats())
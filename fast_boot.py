@@ -0,0 +1,156 @@
+'''
+快速启动编排
+- Wi-Fi: wlan.connect() 只发起关联，不在启动路径上等待；主循环中 WifiLink.poll() 非阻塞查询，
+  关联过程与摄像头/显示初始化并行进行
+- 摄像头: reset / 镜像 / 分辨率 / 像素格式各配置一次，Display、MediaManager 初始化后立即 run，
+  失败时按 20ms 起倍增的短间隔重试 (替代固定 300ms 等待)
+- 启动时间线: BootTimeline 记录各阶段相对上电的毫秒数，
+  主循环中 once('first_frame') / once('first_track') 标记首帧与首次锁定目标，用于测量与压缩启动耗时
+'''
+
+import time
+from media.sensor import *
+from media.display import *
+from media.media import *
+
+try:
+    _ticks_ms = time.ticks_ms
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+RUN_RETRIES = 5
+RUN_RETRY_MS = 20          # 首次重试间隔，之后每次翻倍
+WIFI_TIMEOUT_MS = 60000
+
+
+class BootTimeline:
+    def __init__(self):
+        self.t0 = _ticks_ms()
+        self.marks = []             # [(阶段名, 相对 t0 的毫秒数), ...]
+        self.names = set()
+
+    def mark(self, name):
+        ms = _ticks_diff(_ticks_ms(), self.t0)
+        self.marks.append((name, ms))
+        self.names.add(name)
+        return ms
+
+    def once(self, name):
+        """只记录第一次；首次记录返回 True"""
+        if name in self.names:
+            return False
+        self.mark(name)
+        return True
+
+    def get(self, name):
+        for n, ms in self.marks:
+            if n == name:
+                return ms
+        return None
+
+    def report(self):
+        print("启动时间线 (ms):")
+        last = 0
+        for name, ms in self.marks:
+            print("  %6d  +%5d  %s" % (ms, ms - last, name))
+            last = ms
+
+
+class WifiLink:
+    """非阻塞 Wi-Fi 关联：start() 立即返回，poll() 查询结果"""
+
+    def __init__(self, ssid, password, timeline=None, timeout_ms=WIFI_TIMEOUT_MS):
+        self.ssid = ssid
+        self.password = password
+        self.timeline = timeline
+        self.timeout_ms = timeout_ms
+        self.wlan = None
+        self.ip = None
+        self.failed = False
+        self.started_at = None
+
+    def start(self):
+        import network
+        self.wlan = network.WLAN(network.STA_IF)
+        if not self.wlan.active():
+            self.wlan.active(True)
+        self.started_at = _ticks_ms()
+        if not self.wlan.isconnected():
+            try:
+                self.wlan.connect(self.ssid, self.password)
+            except Exception as err:
+                print("Wi-Fi 连接失败:", err)
+                self.failed = True
+        if self.timeline:
+            self.timeline.mark('wifi_start')
+        return self.poll()
+
+    def poll(self):
+        """已连接返回 IP，否则返回 None (超时后置 failed，不再查询)"""
+        if self.ip is not None or self.failed or self.wlan is None:
+            return self.ip
+        if self.wlan.isconnected():
+            self.ip = self.wlan.ifconfig()[0]
+            if self.timeline:
+                self.timeline.mark('wifi_up')
+        elif _ticks_diff(_ticks_ms(), self.started_at) > self.timeout_ms:
+            print("Wi-Fi 连接超时")
+            self.failed = True
+        return self.ip
+
+    def wait(self, timeout_ms):
+        """最多阻塞 timeout_ms 等待连接 (需要 IP 才能继续时使用)"""
+        start = _ticks_ms()
+        while self.poll() is None and not self.failed:
+            if _ticks_diff(_ticks_ms(), start) >= timeout_ms:
+                break
+            time.sleep_ms(50)
+        return self.ip
+
+
+def init_sensor(width, height, pixformat=None, hmirror=False, vflip=False,
+                display=None, to_ide=False, timeline=None, **sensor_kw):
+    """
+    一次性配置并启动摄像头；display 为 Display.ST7701 等面板类型 (None 不初始化显示)
+    返回已 run 的 Sensor
+    """
+    if pixformat is None:
+        pixformat = Sensor.RGB565
+    sensor = Sensor(width=width, height=height, **sensor_kw)
+    sensor.reset()
+    if hmirror:
+        sensor.set_hmirror(True)
+    if vflip:
+        sensor.set_vflip(True)
+    sensor.set_framesize(width=width, height=height)
+    sensor.set_pixformat(pixformat)
+    if timeline:
+        timeline.mark('sensor_config')
+
+    if display is not None:
+        Display.init(display, width=width, height=height, to_ide=to_ide)
+        if timeline:
+            timeline.mark('display_init')
+    MediaManager.init()
+    if timeline:
+        timeline.mark('media_init')
+
+    delay = RUN_RETRY_MS
+    for i in range(RUN_RETRIES):
+        try:
+            sensor.run()
+            break
+        except Exception as err:
+            if i == RUN_RETRIES - 1:
+                raise
+            print("sensor.run 重试:", err)
+            time.sleep_ms(delay)
+            delay *= 2
+    if timeline:
+        timeline.mark('sensor_run')
+    return sensor
@@ -0,0 +1,134 @@
+'''
+K230 帧预算调度器 - 超时时跳过/抽帧非必要任务
+每帧按优先级协作调度: 检测 > 控制 > 遥测 > 叠加绘制 > 显示
+检测与控制每帧必跑 (begin_task / done 计时)，低优先级任务用 should_run 判断，
+在本帧剩余时间不足时跳过，但连续跳过不超过 max_skip 帧，保证画面与遥测不会完全停止；
+被跳过的任务耗时估计逐帧衰减，偶发的一次慢运行不会让任务永远被跳过
+'''
+
+import time
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    # 主机端(CPython)仿真/调参时使用
+    def _ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+# ==================== 任务优先级 ====================
+# 数值越小越重要；<= ESSENTIAL 的任务永不跳过
+PRIO_DETECT = 0
+PRIO_CONTROL = 1
+PRIO_TELEMETRY = 2
+PRIO_OVERLAY = 3
+PRIO_DISPLAY = 4
+
+ESSENTIAL = PRIO_CONTROL
+
+# 任务耗时估计的平滑系数 (EMA)
+COST_ALPHA = 0.2
+# 每跳过一帧，耗时估计按该比例衰减 (估计过大时最终会再运行一次并重新实测)
+SKIP_DECAY = 0.1
+
+
+class _Task:
+    __slots__ = ('name', 'priority', 'max_skip', 'cost_us', 'skipped',
+                 'runs', 'skips', 'started')
+
+    def __init__(self, name, priority, cost_ms, max_skip):
+        self.name = name
+        self.priority = priority
+        self.max_skip = max_skip
+        self.cost_us = int(cost_ms * 1000)
+        self.skipped = 0       # 当前连续跳过帧数
+        self.runs = 0
+        self.skips = 0
+        self.started = 0
+
+
+class FrameBudget:
+    """每帧时间预算调度器"""
+
+    def __init__(self, budget_ms):
+        """
+        budget_ms: 每帧时间预算 (毫秒)，一般取 1000 / 传感器帧率
+        """
+        self.budget_us = int(budget_ms * 1000)
+        self.tasks = {}
+        self.frame_start = _ticks_us()
+        self.frames = 0
+        self.overruns = 0
+        self.last_frame_us = 0
+
+    def add_task(self, name, priority, cost_ms=1, max_skip=0):
+        """
+        注册任务
+        cost_ms: 初始耗时估计，运行后由实测值自动修正
+        max_skip: 最多连续跳过的帧数 (0 = 不强制运行，只在估计耗时衰减到放得下时运行)
+        """
+        self.tasks[name] = _Task(name, priority, cost_ms, max_skip)
+
+    def begin_frame(self):
+        """帧开始 (snapshot 之前调用)"""
+        self.frame_start = _ticks_us()
+
+    def elapsed_us(self):
+        return _ticks_diff(_ticks_us(), self.frame_start)
+
+    def remaining_us(self):
+        return self.budget_us - self.elapsed_us()
+
+    def begin_task(self, name):
+        """
+        开始执行必跑任务 (检测/控制等)：不做跳过判断，只开始计时，结束后调用 done(name)
+        """
+        t = self.tasks[name]
+        t.started = _ticks_us()
+        t.skipped = 0
+
+    def should_run(self, name):
+        """
+        判断本帧是否执行该任务，返回 True 时需在任务结束后调用 done(name)
+        必跑任务 (优先级 <= ESSENTIAL) 总是返回 True，直接用 begin_task 更清楚
+        """
+        t = self.tasks[name]
+        now = _ticks_us()
+        run = (t.priority <= ESSENTIAL or
+               t.cost_us <= self.budget_us - _ticks_diff(now, self.frame_start) or
+               (t.max_skip and t.skipped >= t.max_skip))
+        if run:
+            t.started = now
+            t.skipped = 0
+        else:
+            t.skipped += 1
+            t.skips += 1
+            t.cost_us -= int(t.cost_us * SKIP_DECAY)
+        return run
+
+    def done(self, name):
+        """任务完成，更新耗时估计"""
+        t = self.tasks[name]
+        cost = _ticks_diff(_ticks_us(), t.started)
+        t.cost_us += int((cost - t.cost_us) * COST_ALPHA)
+        t.runs += 1
+
+    def end_frame(self):
+        """帧结束，统计超时"""
+        self.last_frame_us = self.elapsed_us()
+        self.frames += 1
+        if self.last_frame_us > self.budget_us:
+            self.overruns += 1
+
+    def stats(self):
+        """获取调度统计"""
+        return {
+            'frames': self.frames,
+            'overruns': self.overruns,
+            'last_frame_ms': self.last_frame_us / 1000,
+            'tasks': {n: (t.runs, t.skips, t.cost_us / 1000)
+                      for n, t in self.tasks.items()},
+        }
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+云台闭环回归仿真 (主机端)
+直接运行 gimbal_track.run_gimbal_tracking，把 K230 固件模块换成仿真实现:
+- 传感器: 按脚本轨迹渲染合成目标 (矩形靶 + 色块)，带相机延迟
+- cv_lite: 在合成帧上返回目标矩形四角
+- UART: 解析 0xF1/0xFC 等电机指令驱动 gimbal_sim.StepperAxis，执行 0xFD 同步暂存与广播触发，应答 0x35/0x36/0x3A 读取，统计串口字节数
+- time: 虚拟时钟，sleep/snapshot 推进仿真时间，结果完全确定
+输出跟踪误差 RMS、调节时间、各串口字节速率，用于在上板前检查控制逻辑改动
+
+用法:
+    python3 gimbal_loop_sim.py --trajectory step --duration 6000
+    python3 gimbal_loop_sim.py --trajectory sine --delay 80
+"""
+
+import argparse
+import importlib
+import math
+import _thread as _real_thread
+import os as _real_os
+import sys
+import types
+from collections import deque
+
+import gimbal_sim
+
+# ==================== 仿真参数 ====================
+WIDTH = 800
+HEIGHT = 480
+SENSOR_FPS = 30
+CAMERA_DELAY_MS = gimbal_sim.CAMERA_DELAY_MS
+PIXELS_PER_PULSE = gimbal_sim.PIXELS_PER_PULSE
+TARGET_W = 120             # 合成矩形靶尺寸 (像素)
+TARGET_H = 96
+SETTLE_BAND_PX = 20        # 调节时间判据
+
+# 导入时绑定 time 函数的模块都要在仿真环境下重新导入
+TRACK_MODULES = ('gimbal_track', 'frame_budget', 'detect_cascade', 'motion_profile',
+                 'motor_status', 'motor_sync', 'motor_bus', 'uart_tx', 'config_store', 'config')
+
+
+# ==================== 目标轨迹 (脉冲坐标, 相对开机零点) ====================
+def trajectory_step(t_ms):
+    """1s 时水平/垂直各跳变一次"""
+    if t_ms < 1000:
+        return 0.0, 800.0
+    return -120.0, 880.0
+
+
+def trajectory_ramp(t_ms):
+    """匀速水平扫过"""
+    return -0.06 * t_ms, 800.0
+
+
+def trajectory_sine(t_ms):
+    """水平正弦摆动 + 垂直慢速起伏"""
+    return (150.0 * math.sin(2 * math.pi * t_ms / 4000.0),
+            800.0 + 60.0 * math.sin(2 * math.pi * t_ms / 7000.0))
+
+
+TRAJECTORIES = {
+    'step': trajectory_step,
+    'ramp': trajectory_ramp,
+    'sine': trajectory_sine,
+}
+
+
+# ==================== 虚拟时钟 ====================
+class SimClock:
+    def __init__(self, world):
+        self.now_us = 0
+        self.world = world
+
+    def advance_ms(self, ms):
+        end = self.now_us + int(ms * 1000)
+        while self.now_us < end:
+            self.now_us += gimbal_sim.SIM_DT_MS * 1000
+            self.world.step(gimbal_sim.SIM_DT_MS)
+
+
+class _FpsClock:
+    def __init__(self, clock):
+        self.clock = clock
+        self.last = 0
+        self.fps_value = 0.0
+
+    def tick(self):
+        now = self.clock.now_us
+        if now > self.last:
+            self.fps_value = 1000000.0 / (now - self.last)
+        self.last = now
+
+    def fps(self):
+        return self.fps_value
+
+
+def make_time_module(clock):
+    m = types.ModuleType('time')
+    m.ticks_us = lambda: clock.now_us
+    m.ticks_ms = lambda: clock.now_us // 1000
+    m.ticks_diff = lambda a, b: a - b
+    m.ticks_add = lambda a, b: a + b
+    m.sleep_ms = clock.advance_ms
+    m.sleep_us = lambda us: clock.advance_ms(us / 1000.0)
+    m.sleep = lambda s: clock.advance_ms(s * 1000)
+    m.clock = lambda: _FpsClock(clock)
+    m.time = lambda: clock.now_us / 1000000.0
+    m.perf_counter = m.time
+    m.monotonic = m.time
+    return m
+
+
+# ==================== 电机与串口 ====================
+class SimUart:
+    """解析 Emm/X42S 指令帧，驱动对应地址的电机模型"""
+
+    UART1 = 1
+    UART2 = 2
+    UART3 = 3
+    UART4 = 4
+
+    def __init__(self, world, port, baudrate=115200, **kw):
+        self.world = world
+        self.port = port
+        self.baudrate = baudrate
+        self.rx = bytearray()
+        self.tx_bytes = 0
+        self.frames = 0
+        world.uarts[port] = self
+
+    def write(self, data):
+        data = bytes(data)
+        self.tx_bytes += len(data)
+        self.world.dispatch(self, data)
+        return len(data)
+
+    def any(self):
+        return len(self.rx)
+
+    def read(self, n=None):
+        if n is None or n >= len(self.rx):
+            out, self.rx = bytes(self.rx), bytearray()
+        else:
+            out, self.rx = bytes(self.rx[:n]), self.rx[n:]
+        return out or None
+
+    def readinto(self, buf):
+        data = self.read(len(buf))
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+
+class SimWorld:
+    """电机、目标与相机延迟的共享状态"""
+
+    def __init__(self, trajectory, delay_ms=CAMERA_DELAY_MS, px_per_pulse=PIXELS_PER_PULSE):
+        consts = gimbal_sim.load_track_constants()
+        self.consts = consts
+        self.trajectory = trajectory
+        self.px_per_pulse = px_per_pulse
+        # 地址 → 电机；方向与 gimbal_track 的 PAN_DIR/TILT_DIR 保持一致
+        self.motors = {
+            consts['HORIZONTAL_ADDR']: gimbal_sim.StepperAxis(0),
+            consts['VERTICAL_ADDR']: gimbal_sim.StepperAxis(0),
+        }
+        self.pan = self.motors[consts['HORIZONTAL_ADDR']]
+        self.tilt = self.motors[consts['VERTICAL_ADDR']]
+        self.uarts = {}
+        self.staged = []            # 带同步标志、等待广播触发的动作
+        self.t_ms = 0
+        self.history = deque([(0.0, 0.0)] * (int(delay_ms) + 1), maxlen=int(delay_ms) + 1)
+        self.errors = []            # (t_ms, ex, ey) 真实像素误差
+        self.tracking_start_ms = None
+
+    def step(self, dt_ms):
+        dt = dt_ms / 1000.0
+        for m in self.motors.values():
+            m.step(dt)
+        self.t_ms += dt_ms
+        self.history.append((self.pan.position, self.tilt.position))
+        if self.tracking_start_ms is not None:
+            ex, ey = self.pixel_error(self.pan.position, self.tilt.position)
+            self.errors.append((self.t_ms - self.tracking_start_ms, ex, ey))
+
+    def target_world(self):
+        t = 0 if self.tracking_start_ms is None else self.t_ms - self.tracking_start_ms
+        return self.trajectory(t)
+
+    def pixel_error(self, pan_pos, tilt_pos):
+        """目标在画面中相对中心的像素偏移"""
+        tp, tt = self.target_world()
+        c = self.consts
+        ex = (tp - pan_pos) * c['PAN_DIR'] * self.px_per_pulse
+        ey = (tt - tilt_pos) * c['TILT_DIR'] * self.px_per_pulse
+        return ex, ey
+
+    def seen_target(self):
+        """相机延迟后看到的目标中心像素坐标"""
+        pan_pos, tilt_pos = self.history[0]
+        ex, ey = self.pixel_error(pan_pos, tilt_pos)
+        return WIDTH / 2 + ex, HEIGHT / 2 + ey
+
+    def dispatch(self, uart, data):
+        i = 0
+        while i + 2 < len(data):
+            addr, code = data[i], data[i + 1]
+            if addr == 0x00:
+                motors = list(self.motors.values())   # 广播地址
+            else:
+                motors = [self.motors[addr]] if addr in self.motors else []
+            n = self.handle(uart, motors, code, data, i)
+            uart.frames += 1
+            i += n if n else len(data)
+
+    def handle(self, uart, motors, code, data, i):
+        """执行一帧指令，返回帧长度 (0 表示无法识别，丢弃剩余字节)"""
+        if code == 0xF1 and i + 8 <= len(data):
+            speed = (data[i + 2] << 8) | data[i + 3]
+            acc = gimbal_sim.emm_acc_to_pps2(data[i + 4])
+            for m in motors:
+                m.set_speed(speed, acc)
+            return 8
+        if code == 0xFC and i + 7 <= len(data):
+            pos = (data[i + 2] << 24) | (data[i + 3] << 16) | (data[i + 4] << 8) | data[i + 5]
+            if pos & 0x80000000:
+                pos -= 1 << 32
+            for m in motors:
+                m.move_abs(pos)
+            return 7
+        if code == 0xFD and i + 13 <= len(data):
+            # 位置模式: 方向 速度(2B) 加速度 脉冲(4B) 相对/绝对 同步
+            f = data[i:i + 13]
+            rpm = (f[3] << 8) | f[4]
+            acc = gimbal_sim.emm_acc_to_pps2(f[5])
+            pulses = (f[6] << 24) | (f[7] << 16) | (f[8] << 8) | f[9]
+            if f[2]:
+                pulses = -pulses
+            for m in motors:
+                target = pulses if f[10] else m.target + pulses
+                self.run_or_stage(f[11], self.pos_action(m, rpm, acc, target))
+            return 13
+        if code == 0xFF and i + 4 <= len(data) and data[i + 2] == 0x66:
+            # 同步触发：执行全部暂存动作
+            staged, self.staged = self.staged, []
+            for action in staged:
+                action()
+            return 4
+        if code in (0x35, 0x36, 0x3A) and i + 3 <= len(data):
+            # 读取指令：广播地址不应答
+            if len(motors) == 1:
+                uart.rx.extend(self.reply(data[i], code, motors[0]))
+            return 3
+        return 0
+
+    @staticmethod
+    def pos_action(m, rpm, acc, target):
+        def action():
+            m.set_speed(rpm, acc)
+            m.move_abs(target)
+        return action
+
+    def run_or_stage(self, sync, action):
+        if sync:
+            self.staged.append(action)
+        else:
+            action()
+
+    def reply(self, addr, code, m):
+        """按 Emm 读取应答格式编码电机状态"""
+        if code == 0x36:
+            raw = int(round(m.position * 65536 / self.consts['PULSE_PER_REV']))
+            return bytes((addr, code, 1 if raw < 0 else 0)) + abs(raw).to_bytes(4, 'big') + b'\x6b'
+        if code == 0x35:
+            rpm = int(round(m.velocity / gimbal_sim.SPEED_UNIT_PPS))
+            return bytes((addr, code, 1 if rpm < 0 else 0)) + abs(rpm).to_bytes(2, 'big') + b'\x6b'
+        in_pos = 0x02 if abs(m.target - m.position) < 1 else 0
+        return bytes((addr, code, 0x01 | in_pos, 0x6B))
+
+
+# ==================== 合成图像 ====================
+class SimBlob:
+    def __init__(self, x, y, w, h):
+        self._rect = (int(x), int(y), int(w), int(h))
+
+    def __getitem__(self, idx):
+        return self._rect[idx]
+
+    def rect(self):
+        return self._rect
+
+    def cx(self):
+        return self._rect[0] + self._rect[2] // 2
+
+    def cy(self):
+        return self._rect[1] + self._rect[3] // 2
+
+    def pixels(self):
+        return self._rect[2] * self._rect[3]
+
+
+class SimImage:
+    """只记录目标位置的"图像"，绘图调用全部为空操作"""
+
+    def __init__(self, target, w=WIDTH, h=HEIGHT, ox=0, oy=0):
+        self.target = target          # 全图坐标的目标中心，None 表示画面中无目标
+        self.w = w
+        self.h = h
+        self.ox = ox
+        self.oy = oy
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def target_rect(self):
+        """目标矩形 (本图坐标)，不完整在图内时返回 None"""
+        if self.target is None:
+            return None
+        x = self.target[0] - TARGET_W / 2 - self.ox
+        y = self.target[1] - TARGET_H / 2 - self.oy
+        if x < 0 or y < 0 or x + TARGET_W > self.w or y + TARGET_H > self.h:
+            return None
+        return x, y, TARGET_W, TARGET_H
+
+    def find_blobs(self, thresholds, **kw):
+        r = self.target_rect()
+        if r is None:
+            return []
+        # 靶心色块
+        return [SimBlob(r[0] + r[2] / 2 - 10, r[1] + r[3] / 2 - 10, 20, 20)]
+
+    def to_grayscale(self, *a, **kw):
+        return self
+
+    def to_numpy_ref(self):
+        return self
+
+    def copy(self, roi=None, **kw):
+        if roi is None:
+            return SimImage(self.target, self.w, self.h, self.ox, self.oy)
+        x, y, w, h = roi
+        return SimImage(self.target, w, h, self.ox + x, self.oy + y)
+
+    def _noop(self, *a, **kw):
+        return self
+
+    draw_rectangle = draw_cross = draw_line = draw_circle = _noop
+    draw_string = draw_string_advanced = draw_image = _noop
+
+
+class SimGrayBuffer(SimImage):
+    """image.Image 预分配灰度缓冲：draw_image 把源图 ROI 的目标位置拷入"""
+
+    def __init__(self, w, h, fmt=None):
+        SimImage.__init__(self, None, w, h)
+
+    def draw_image(self, src, x, y, roi=None, **kw):
+        rx, ry = (roi[0], roi[1]) if roi else (0, 0)
+        self.target = src.target
+        self.ox = src.ox + rx - x
+        self.oy = src.oy + ry - y
+        return self
+
+
+def make_cv_lite():
+    m = types.ModuleType('cv_lite')
+
+    def grayscale_find_rectangles_with_corners(shape, img, *args):
+        r = img.target_rect()
+        if r is None:
+            return []
+        x, y, w, h = [int(round(v)) for v in r]
+        return [[x, y, w, h, x, y, x + w, y, x + w, y + h, x, y + h]]
+
+    m.grayscale_find_rectangles_with_corners = grayscale_find_rectangles_with_corners
+    m.rgb888_find_circles = lambda *a, **kw: []
+    return m
+
+
+# ==================== 传感器/显示/按键 ====================
+class SimSensor:
+    def __init__(self, world, clock, fps=SENSOR_FPS):
+        self.world = world
+        self.clock = clock
+        self.frame_ms = 1000.0 / fps
+        self.next_frame_us = 0
+
+    def snapshot(self, chn=0):
+        # 等到下一帧曝光完成
+        wait_us = self.next_frame_us - self.clock.now_us
+        if wait_us > 0:
+            self.clock.advance_ms(wait_us / 1000.0)
+        self.next_frame_us = self.clock.now_us + int(self.frame_ms * 1000)
+        x, y = self.world.seen_target()
+        return SimImage((x, y))
+
+    def width(self):
+        return WIDTH
+
+    def height(self):
+        return HEIGHT
+
+
+class SimTouch:
+    def read(self, n=1):
+        return []
+
+
+class SimExitKey:
+    """仿真时长到达后模拟按下退出键"""
+
+    def __init__(self, world, duration_ms):
+        self.world = world
+        self.duration_ms = duration_ms
+
+    def is_pressed(self):
+        if self.world.tracking_start_ms is None:
+            # 第一次检查时开始计时 (归零与抬升阶段不计入)
+            self.world.tracking_start_ms = self.world.t_ms
+        return self.world.t_ms - self.world.tracking_start_ms >= self.duration_ms
+
+
+def make_fake_modules(world, clock):
+    """构造替换固件模块的仿真模块表"""
+    machine = types.ModuleType('machine')
+
+    class FPIOA:
+        def __getattr__(self, name):
+            return name
+
+        def set_function(self, *a, **kw):
+            pass
+
+    for name in ('UART1_TXD', 'UART1_RXD', 'UART2_TXD', 'UART2_RXD',
+                 'UART3_TXD', 'UART3_RXD', 'UART4_TXD', 'UART4_RXD'):
+        setattr(FPIOA, name, name)
+
+    def UART(port, baudrate=115200, **kw):
+        return SimUart(world, port, baudrate, **kw)
+
+    UART.UART1, UART.UART2, UART.UART3, UART.UART4 = 1, 2, 3, 4
+    machine.UART = UART
+    machine.FPIOA = FPIOA
+
+    sensor_mod = types.ModuleType('media.sensor')
+    sensor_mod.CAM_CHN_ID_0 = 0
+    sensor_mod.__all__ = ['CAM_CHN_ID_0']
+    display_mod = types.ModuleType('media.display')
+
+    class Display:
+        ST7701 = 'ST7701'
+
+        @staticmethod
+        def show_image(*a, **kw):
+            pass
+
+        @staticmethod
+        def init(*a, **kw):
+            pass
+
+    display_mod.Display = Display
+    display_mod.__all__ = ['Display']
+    media_mod = types.ModuleType('media.media')
+    media_mod.__all__ = []
+    media = types.ModuleType('media')
+
+    ulab = types.ModuleType('ulab')
+    ulab.numpy = types.ModuleType('ulab.numpy')
+
+    # 仿真时间是虚拟的，不启动真实线程：异步发送层退化为同步写，结果可复现
+    thread_mod = types.ModuleType('_thread')
+    thread_mod.allocate_lock = _real_thread.allocate_lock
+
+    def start_new_thread(func, args):
+        raise OSError("仿真环境不启动线程")
+
+    thread_mod.start_new_thread = start_new_thread
+
+    image_mod = types.ModuleType('image')
+    image_mod.GRAYSCALE = 1
+    image_mod.Image = SimGrayBuffer
+
+    os_mod = types.ModuleType('os')
+    os_mod.__dict__.update(_real_os.__dict__)
+    os_mod.exitpoint = lambda *a: None
+
+    return {
+        'time': make_time_module(clock),
+        'os': os_mod,
+        '_thread': thread_mod,
+        'machine': machine,
+        'cv_lite': make_cv_lite(),
+        'image': image_mod,
+        'ulab': ulab,
+        'ulab.numpy': ulab.numpy,
+        'media': media,
+        'media.sensor': sensor_mod,
+        'media.display': display_mod,
+        'media.media': media_mod,
+    }
+
+
+def load_track_module(fakes):
+    """在仿真模块环境下导入 gimbal_track (及其依赖)，返回模块对象"""
+    saved = {name: sys.modules.get(name) for name in fakes}
+    for name in TRACK_MODULES:
+        sys.modules.pop(name, None)
+    sys.modules.update(fakes)
+    try:
+        return importlib.import_module('gimbal_track')
+    finally:
+        for name, mod in saved.items():
+            if mod is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = mod
+        # 仿真版本不留在缓存中，避免污染同进程的其他导入
+        for name in TRACK_MODULES:
+            sys.modules.pop(name, None)
+
+
+# ==================== 运行与统计 ====================
+def settling_time(errors, start_ms, band):
+    """start_ms 之后误差最后一次进入并保持在 band 内的时间 (相对 start_ms)"""
+    settled = None
+    for t, ex, ey in errors:
+        if t < start_ms:
+            continue
+        if abs(ex) <= band and abs(ey) <= band:
+            if settled is None:
+                settled = t - start_ms
+        else:
+            settled = None
+    return settled
+
+
+def run(trajectory='step', duration_ms=6000, delay_ms=CAMERA_DELAY_MS,
+        px_per_pulse=PIXELS_PER_PULSE, fps=SENSOR_FPS, step_at_ms=1000):
+    """运行一次闭环仿真，返回指标字典"""
+    traj = TRAJECTORIES[trajectory] if isinstance(trajectory, str) else trajectory
+    world = SimWorld(traj, delay_ms, px_per_pulse)
+    clock = SimClock(world)
+    track = load_track_module(make_fake_modules(world, clock))
+    sensor = SimSensor(world, clock, fps)
+    key = SimExitKey(world, duration_ms)
+    thresholds = [(0, 100, 0, 127, -128, 127)]
+
+    # 统计只计跟踪阶段的串口字节
+    boot_bytes = {}
+    orig_is_pressed = key.is_pressed
+
+    def is_pressed():
+        if world.tracking_start_ms is None:
+            for port, u in world.uarts.items():
+                boot_bytes[port] = u.tx_bytes
+        return orig_is_pressed()
+
+    key.is_pressed = is_pressed
+    track.run_gimbal_tracking(sensor, SimTouch(), key, thresholds, WIDTH, HEIGHT)
+
+    errs = [e for e in world.errors if e[0] <= duration_ms]
+    if not errs or errs[-1][0] < duration_ms - 1:
+        # run_gimbal_tracking 内部捕获异常后直接返回，这里据此判断循环是否提前退出
+        raise RuntimeError("跟踪循环提前退出 (仿真 {}ms / 期望 {}ms)，请查看上方错误输出".format(
+            errs[-1][0] if errs else 0, duration_ms))
+    n = max(1, len(errs))
+    rms_x = math.sqrt(sum(e[1] * e[1] for e in errs) / n)
+    rms_y = math.sqrt(sum(e[2] * e[2] for e in errs) / n)
+    seconds = duration_ms / 1000.0
+    uart_bps = {port: (u.tx_bytes - boot_bytes.get(port, 0)) / seconds
+                for port, u in sorted(world.uarts.items())}
+    start = step_at_ms if trajectory == 'step' else 0
+    settled = settling_time(errs, start, SETTLE_BAND_PX)
+    return {
+        'trajectory': trajectory if isinstance(trajectory, str) else traj.__name__,
+        'rms_px': (rms_x, rms_y),
+        'rms_total_px': math.sqrt(rms_x * rms_x + rms_y * rms_y),
+        'settling_ms': settled,
+        'uart_bytes_per_s': uart_bps,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='云台闭环回归仿真')
+    ap.add_argument('--trajectory', choices=sorted(TRAJECTORIES), default='step')
+    ap.add_argument('--duration', type=int, default=6000, help='跟踪阶段时长 ms')
+    ap.add_argument('--delay', type=int, default=CAMERA_DELAY_MS, help='相机延迟 ms')
+    ap.add_argument('--ppp', type=float, default=PIXELS_PER_PULSE, help='像素/脉冲')
+    ap.add_argument('--fps', type=int, default=SENSOR_FPS)
+    args = ap.parse_args(argv)
+
+    r = run(args.trajectory, args.duration, args.delay, args.ppp, args.fps)
+    print("轨迹: {}".format(r['trajectory']))
+    print("跟踪误差 RMS: X={:.1f}px Y={:.1f}px 合计={:.1f}px".format(
+        r['rms_px'][0], r['rms_px'][1], r['rms_total_px']))
+    if r['settling_ms'] is None:
+        print("调节时间: 未稳定 (±{}px)".format(SETTLE_BAND_PX))
+    else:
+        print("调节时间: {}ms (±{}px)".format(r['settling_ms'], SETTLE_BAND_PX))
+    for port, bps in r['uart_bytes_per_s'].items():
+        print("UART{} 发送: {:.0f} 字节/秒".format(port, bps))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+云台单轴闭环仿真 (主机端)
+- 步进电机模型: 复现 0xF1 限速/加速度 + 0xFC 绝对位置指令的梯形运动；
+  gimbal_track 启用 MOTION_PROFILE 时改为与实机一致的规划设定点 (每帧检查) + 段速度跟随
+- 舵机模型: 一阶惯性 + 速率限制
+- 控制律与 gimbal_track.py 一致: 误差 EMA 平滑 → 死区 → PD → 最小脉冲过滤 → 限位
+- 相机延迟: 控制器看到的是 delay 之前的云台位置
+参数默认从 gimbal_track.py 源码中解析 (不导入，避免依赖 K230 固件模块)
+"""
+
+import ast
+import math
+import os
+from collections import deque
+
+from pid import PIDAxis
+from motion_profile import ProfiledAxis
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TRACK_SOURCE = os.path.join(HERE, 'gimbal_track.py')
+
+# ==================== 仿真默认参数 ====================
+SIM_DT_MS = 1              # 物理步长
+FRAME_MS = 33              # 相机帧间隔
+CAMERA_DELAY_MS = 50       # 曝光到出结果的延迟
+PIXELS_PER_PULSE = 1.5     # 画面像素 / 电机脉冲 (与镜头视场和细分有关)
+PULSE_PER_REV = 3200       # 16 细分
+SPEED_UNIT_PPS = PULSE_PER_REV / 60.0   # 速度字段单位 RPM → 脉冲/秒
+ACC_LEVEL = 5              # gimbal_track fast_mode_init 默认加速度档位
+SERVO_TAU_MS = 80          # 舵机一阶时间常数
+SERVO_RATE = 600.0         # 舵机最大转速 (单位/秒)
+MIN_PULSE = 4              # gimbal_track 中过滤的最小位置增量
+
+
+def emm_acc_to_pps2(acc, pulse_per_rev=PULSE_PER_REV):
+    """
+    Emm 加速度档位 → 脉冲/秒²
+    档位 acc (1~255) 表示每 (256 - acc) * 50us 速度增加 1 RPM；0 表示不加减速
+    """
+    if acc <= 0:
+        return 1e9
+    rpm_per_s = 1.0 / ((256 - acc) * 50e-6)
+    return rpm_per_s * pulse_per_rev / 60.0
+
+
+ACC_PPS2 = emm_acc_to_pps2(ACC_LEVEL)
+
+
+def load_track_constants(path=TRACK_SOURCE):
+    """解析 gimbal_track.py 顶层的常量赋值 (仅字面量与简单算式)"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    consts = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+            continue
+        target = node.targets[0]
+        if not isinstance(target, ast.Name) or not target.id.isupper():
+            continue
+        try:
+            value = eval(compile(ast.Expression(node.value), path, 'eval'),
+                         {'__builtins__': {}}, dict(consts))
+        except Exception:
+            continue
+        if isinstance(value, (int, float, str)):
+            consts[target.id] = value
+    return consts
+
+
+def _rpm_to_pps(rpm):
+    return rpm * SPEED_UNIT_PPS
+
+
+def axis_params(axis, consts=None):
+    """由 gimbal_track 常量组装单轴仿真参数 (axis: 'pan' / 'tilt')"""
+    c = consts if consts is not None else load_track_constants()
+    p = _axis_params(axis, c)
+    if c.get('MOTION_PROFILE'):
+        # 规划模式: 速度/加速度上限来自规划参数，垂直轴的速度环改为修改规划最高速
+        p['profile'] = c['MOTION_PROFILE']
+        p['profile_period'] = c['PROFILE_PERIOD']
+        p['profile_min_step'] = c.get('PROFILE_MIN_STEP', 1)
+        p['profile_rpm_tol'] = c.get('PROFILE_RPM_TOL', 0.0)
+        if axis == 'pan':
+            p['profile_v'] = _rpm_to_pps(c['PAN_PROFILE_SPEED'])
+            p['profile_acc'] = _rpm_to_pps(c['PAN_PROFILE_ACC'])
+        else:
+            p['profile_v'] = _rpm_to_pps(c['V_MIN_TILT'])
+            p['profile_acc'] = _rpm_to_pps(c['TILT_PROFILE_ACC'])
+    return p
+
+
+def _axis_params(axis, c):
+    if axis == 'pan':
+        return {
+            'plant': 'stepper',
+            'kp': c['KP_PAN'], 'ki': 0.0, 'kd': c['KD_PAN'],
+            'deadzone': c['DEADZONE_X'], 'smooth': c['SMOOTH_X'],
+            'period_ms': c['PAN_CONTROL_PERIOD'],
+            'limit_min': c['PAN_LIMIT_MIN'], 'limit_max': c['PAN_LIMIT_MAX'],
+            'direction': c['PAN_DIR'], 'start': 0,
+            'speed': 180, 'acc': ACC_PPS2,
+        }
+    if axis == 'tilt':
+        return {
+            'plant': 'stepper',
+            'kp': c['KP_TILT'], 'ki': 0.0, 'kd': c['KD_TILT'],
+            'deadzone': c['DEADZONE_Y'], 'smooth': c['SMOOTH_Y'],
+            'period_ms': c['TILT_CONTROL_PERIOD'],
+            'limit_min': c['TILT_LIMIT_MIN'], 'limit_max': c['TILT_LIMIT_MAX'],
+            'direction': c['TILT_DIR'], 'start': c['PULSE_PER_REV'] // 4,
+            'speed': 350, 'acc': ACC_PPS2,
+            # 垂直轴按误差动态下发 0xF1 速度
+            'v_min': c['V_MIN_TILT'], 'v_max': c['V_MAX_TILT'], 'kv': c['KV_TILT'],
+        }
+    raise ValueError("未知轴: {}".format(axis))
+
+
+# ==================== 被控对象模型 ====================
+class StepperAxis:
+    """
+    Emm/X42S 步进电机位置模式模型 (单位: 脉冲)
+    set_speed 对应 0xF1，move_abs 对应 0xFC；0xFD 相当于 set_speed + move_abs
+    """
+
+    def __init__(self, position=0, speed=350, acc=ACC_PPS2, speed_unit=SPEED_UNIT_PPS):
+        self.position = float(position)
+        self.velocity = 0.0
+        self.target = float(position)
+        self.speed_unit = speed_unit
+        self.v_max = speed * speed_unit
+        self.acc = acc
+
+    def set_speed(self, speed, acc=None):
+        self.v_max = speed * self.speed_unit
+        if acc is not None:
+            self.acc = acc
+
+    def move_abs(self, target):
+        self.target = float(target)
+
+    def step(self, dt):
+        """梯形速度规划推进 dt 秒"""
+        dist = self.target - self.position
+        # 以当前速度刹停所需距离
+        v = self.velocity
+        stop_dist = v * v / (2 * self.acc) if self.acc > 0 else 0.0
+        if abs(dist) < 1e-6 and abs(v) < self.acc * dt:
+            self.position = self.target
+            self.velocity = 0.0
+            return
+        direction = 1.0 if dist > 0 else -1.0
+        if v * direction > 0 and stop_dist >= abs(dist):
+            v -= direction * self.acc * dt            # 减速段
+        else:
+            v += direction * self.acc * dt            # 加速/匀速段
+        if v > self.v_max:
+            v = self.v_max
+        elif v < -self.v_max:
+            v = -self.v_max
+        new_pos = self.position + v * dt
+        # 越过目标点则停在目标点 (步进电机按脉冲计数定位)
+        if (self.target - new_pos) * direction < 0:
+            new_pos = self.target
+            v = 0.0
+        self.position = new_pos
+        self.velocity = v
+
+
+class ServoAxis:
+    """舵机模型: 一阶惯性 + 最大转速限制"""
+
+    def __init__(self, position=0, tau_ms=SERVO_TAU_MS, rate=SERVO_RATE):
+        self.position = float(position)
+        self.target = float(position)
+        self.tau = tau_ms / 1000.0
+        self.rate = rate
+
+    def set_speed(self, speed, acc=None):
+        pass
+
+    def move_abs(self, target):
+        self.target = float(target)
+
+    def step(self, dt):
+        dv = (self.target - self.position) * min(1.0, dt / self.tau)
+        limit = self.rate * dt
+        if dv > limit:
+            dv = limit
+        elif dv < -limit:
+            dv = -limit
+        self.position += dv
+
+
+def make_plant(p):
+    if p.get('plant') == 'servo':
+        return ServoAxis(p.get('start', 0), p.get('tau_ms', SERVO_TAU_MS), p.get('rate', SERVO_RATE))
+    return StepperAxis(p.get('start', 0), p.get('speed', 350), p.get('acc', ACC_PPS2),
+                       p.get('speed_unit', SPEED_UNIT_PPS))
+
+
+# ==================== 闭环仿真 ====================
+def simulate_step(p, step_px=120.0, duration_ms=4000, frame_ms=FRAME_MS,
+                  delay_ms=CAMERA_DELAY_MS, px_per_pulse=PIXELS_PER_PULSE,
+                  settle_band=None):
+    """
+    目标在 t=0 时出现在偏离画面中心 step_px 像素处 (世界坐标静止)，返回阶跃响应指标:
+      settling_ms: 误差最后一次进入并保持在 settle_band 内的时刻 (未稳定为 duration_ms)
+      overshoot_px: 反向最大误差
+      rms_px: 全程误差均方根
+      commands: 下发的位置指令数
+    """
+    plant = make_plant(p)
+    pid = PIDAxis(p['kp'], p.get('ki', 0.0), p['kd'])
+    profiled = None
+    if p.get('profile') and p.get('plant') != 'servo':
+        profiled = ProfiledAxis(p['profile_v'], p['profile_acc'], p['limit_min'], p['limit_max'],
+                                plant.position, p['profile'], p['profile_period'],
+                                p.get('profile_min_step', 1))
+    direction = p['direction']
+    start = plant.position
+    band = settle_band if settle_band is not None else p['deadzone'] + 2.0
+
+    # 目标世界位置 (脉冲)：使初始像素误差为 step_px
+    target_world = start + direction * step_px / px_per_pulse
+
+    delay_steps = max(0, int(delay_ms // SIM_DT_MS))
+    history = deque([start] * (delay_steps + 1), maxlen=delay_steps + 1)
+
+    target_cmd = plant.position
+    smooth = 0.0
+    last_frame = -frame_ms
+    last_control = -p['period_ms']
+    last_speed = p.get('speed', 350)
+    last_rpm = 0
+    frame_due = False
+
+    settled_at = None
+    overshoot = 0.0
+    sq_sum = 0.0
+    samples = 0
+    commands = 0
+    dt = SIM_DT_MS / 1000.0
+
+    for t in range(0, duration_ms, SIM_DT_MS):
+        if profiled is not None and frame_due:
+            # 与实机一致: 每个视觉帧在控制计算之后检查一次设定点；
+            # 段速度 (向上取整 RPM) 超出容差时 0xF1 改限速 (加速度档位 0)，再以 0xFC 下发位置
+            frame_due = False
+            pos = profiled.update(t)
+            if pos is not None:
+                rpm = max(1, math.ceil(profiled.seg_speed / plant.speed_unit))
+                if abs(rpm - last_rpm) > last_rpm * p.get('profile_rpm_tol', 0.0):
+                    plant.set_speed(rpm, emm_acc_to_pps2(0))
+                    last_rpm = rpm
+                    commands += 1
+                plant.move_abs(pos)
+                commands += 1
+        plant.step(dt)
+        history.append(plant.position)
+
+        true_err = (target_world - plant.position) * direction * px_per_pulse
+        sq_sum += true_err * true_err
+        samples += 1
+        if true_err * step_px < 0:
+            overshoot = max(overshoot, abs(true_err))
+        if abs(true_err) <= band:
+            if settled_at is None:
+                settled_at = t
+        else:
+            settled_at = None
+
+        if t - last_frame < frame_ms:
+            continue
+        last_frame = t
+        frame_due = True
+
+        # 控制器看到的是 delay 前的位置
+        seen_err = (target_world - history[0]) * direction * px_per_pulse
+        smooth = smooth * (1 - p['smooth']) + seen_err * p['smooth']
+
+        if t - last_control < p['period_ms']:
+            continue
+        last_control = t
+
+        delta = int(pid.update_error(smooth))
+        if abs(smooth) <= p['deadzone']:
+            continue
+        if 'kv' in p:
+            v = int(p['v_min'] + p['kv'] * abs(smooth))
+            v = max(p['v_min'], min(p['v_max'], v))
+            if profiled is not None:
+                profiled.set_speed_limit(_rpm_to_pps(v))
+            elif abs(v - last_speed) >= 20:
+                plant.set_speed(v)
+                last_speed = v
+                commands += 1
+        if abs(delta) < MIN_PULSE:
+            continue
+        target_cmd += direction * delta
+        target_cmd = max(p['limit_min'], min(p['limit_max'], target_cmd))
+        if profiled is not None:
+            profiled.set_goal(target_cmd, t)
+            continue
+        plant.move_abs(target_cmd)
+        commands += 1
+
+    return {
+        'settling_ms': settled_at if settled_at is not None else duration_ms,
+        'overshoot_px': overshoot,
+        'rms_px': math.sqrt(sq_sum / max(1, samples)),
+        'commands': commands,
+    }
@@ -2,25 +2,55 @@
 import time, os, sys
 import math
 import cv_lite  
+import image
 import ulab.numpy as np  
 from media.sensor import *
 from media.display import *
 from media.media import *
 from machine import UART, FPIOA
+from pid import PIDAxis
+from motion_profile import ProfiledAxis
+from motor_status import StatusPoller, PositionTracker
+from motor_sync import SyncMotion
+from motor_bus import MotorBus
+from uart_tx import AsyncUartTx
+from detect_cascade import DetectCascade, offset_rect
+from color_lut import ColorLUT
+from config import get_store
+from frame_budget import FrameBudget, PRIO_DETECT, PRIO_CONTROL, PRIO_TELEMETRY, PRIO_OVERLAY, PRIO_DISPLAY
 
 # --------------------------- 1. 串口与引脚底层映射 ---------------------------
+# 总线模式：两台驱动器 RX 并联在 UART1 上按地址区分，UART2 及其引脚让给 MCU 遥测链路
+MOTOR_BUS = False
+BUS_GAP_US = 500              # 帧间隔 (在线上传输时间之外额外空闲)
+BUS_MIN_INTERVAL_MS = 5       # 同一地址两帧最小间隔
+
+# 异步发送：指令帧进有界队列，由 _thread 后台线程合批写串口，视觉循环不等串口
+# (总线模式由 MotorBus 自行控制帧间隔，不叠加异步层)
+UART_TX_THREAD = True
+TX_QUEUE_DEPTH = 32
+TX_BATCH = 64                 # 单次 write 最大字节数
+
 fpioa = FPIOA()
 
-# UART1（垂直/俯仰轴）
+# UART1（垂直/俯仰轴；总线模式下两轴共用）
 fpioa.set_function(3, FPIOA.UART1_TXD)
 fpioa.set_function(4, FPIOA.UART1_RXD)
 
-# UART2（水平/偏航轴）
-fpioa.set_function(5, FPIOA.UART2_TXD)
-fpioa.set_function(6, FPIOA.UART2_RXD)
+if MOTOR_BUS:
+    motor_bus = MotorBus(UART(UART.UART1, baudrate=115200), 115200,
+                         BUS_GAP_US, BUS_MIN_INTERVAL_MS)
+    uart_ud = motor_bus
+    uart_lr = motor_bus
+else:
+    # UART2（水平/偏航轴）
+    fpioa.set_function(5, FPIOA.UART2_TXD)
+    fpioa.set_function(6, FPIOA.UART2_RXD)
 
-uart_ud = UART(UART.UART1, baudrate=115200)
-uart_lr = UART(UART.UART2, baudrate=115200)
+    motor_bus = None
+    # 异步发送层在 run_gimbal_tracking 内创建，退出时停止后台线程并换回原始串口
+    uart_ud = UART(UART.UART1, baudrate=115200)
+    uart_lr = UART(UART.UART2, baudrate=115200)
 
 VERTICAL_ADDR = 0x01
 HORIZONTAL_ADDR = 0x02
@@ -49,6 +79,23 @@ POINTS_PER_CIRCLE = 50
 RECT_WIDTH = 250              
 RECT_HEIGHT = 200             
 
+# 级联检测：色块/上一次命中位置给出候选区，cv_lite 矩形只在候选区内运行
+CASCADE_ROI_MARGIN = 40       # 候选区外扩像素
+CASCADE_MAX_ROIS = 2          # 每帧最多搜索的候选区数
+CASCADE_FULL_PERIOD = 15      # 全图矩形搜索间隔帧数 (1 = 每帧全图，关闭级联)
+CASCADE_REPORT_PERIOD = 300   # 打印各阶段命中率的帧间隔 (0 = 不打印)
+ROI_BUF_MAX = 6               # ROI 灰度缓冲最多缓存的尺寸种类 (超出时清空重建)
+
+# 颜色查找表：color_calibrator 采样编译的 RGB565 位图 + LAB 外包盒
+# 启用后用多个紧凑 LAB 盒替代调参界面的单个阈值，并按外接框内表内像素占比剔除误检色块
+COLOR_LUT = False
+COLOR_LUT_FILE = '/sdcard/color_lut.json'
+LUT_MIN_PURITY = 0.4          # 色块内目标色占比下限
+
+# 参数存储热更新 (debug_tool 菜单 8 写入)：GIMBAL_PID_PAN/TILT ({kp, kd})、GIMBAL_DEADZONE ([x, y])
+# 启动时加载并在运行中热更新；GIMBAL_THRESHOLD (阈值列表) 只在运行中文件被修改时生效，启动时以调参界面阈值为准
+CONFIG_STORE = True
+
 # --------------------------- 3. 电机硬限位与安全保护 ---------------------------
 PAN_LIMIT_MIN = -3500         
 PAN_LIMIT_MAX = 3500          
@@ -64,7 +111,7 @@ DEADZONE_Y = 8
 SMOOTH_X = 0.05               
 SMOOTH_Y = 0.10
 
-# 位置环 (PD 控制器)
+# 位置环 (PD 控制器，每个控制周期调用一次，KD 按"每周期误差变化"计)
 KP_PAN   = 0.25               # 降低水平比例，配合静音低速，实现丝滑无惯性振荡
 KD_PAN   = 0.18               
 
@@ -80,6 +127,35 @@ KV_TILT    = 2.2
 PAN_CONTROL_PERIOD = 80       
 TILT_CONTROL_PERIOD = 40      
 
+# 运动规划：PD 输出的目标位置先经梯形/S 曲线规划，再按周期下发中间设定点
+# (None = 关闭规划，直接下发目标位置并由驱动器自身加减速)
+MOTION_PROFILE = 'scurve'     # 'trapezoid' / 'scurve' / None
+PROFILE_PERIOD = 20           # 设定点检查周期下限 ms (实际按调用间隔，即帧间隔检查)
+PROFILE_RPM_TOL = 0.25        # 段速度与当前限速相差不超过该比例时沿用，不重发 0xF1
+PROFILE_MIN_STEP = 4          # 预测的电机位置与规划偏差小于该脉冲数时不下发新设定点
+PAN_PROFILE_SPEED = 180       # 水平最高速 (RPM)，与原固定限速一致
+PAN_PROFILE_ACC = 600         # 水平最大加速度 (RPM/s)
+TILT_PROFILE_ACC = 1500       # 垂直最大加速度 (RPM/s)，最高速仍由速度环动态给出
+
+# 状态回读：低占空比查询 0x36 实际位置，丢步/堵转后把跟踪目标对齐到真实位置
+STATUS_POLL = True
+STATUS_PERIOD = 200           # 每个串口一轮查询的周期 ms
+STATUS_TIMEOUT = 30           # 应答超时 ms
+RESYNC_TOLERANCE = 40         # 停稳后实际位置与指令位置的允许偏差 (脉冲)
+RESYNC_SETTLE = 400           # 最后一次指令后等待到位的时间 ms
+
+# 双轴同步：归零/复位等两轴大行程用带同步标志的 0xFD 暂存，再广播触发同时启动
+HOME_SPEED_PAN = 180          # 归零速度 (RPM)
+HOME_SPEED_TILT = 350
+RESET_SPEED = 180             # 退出复位时行程较长轴的速度 (RPM)，另一轴按比例降速同时到达
+RESET_ACC = 5
+
+# 帧预算调度：超时时优先跳过绘制/显示，保证检测与控制按传感器帧率运行
+SENSOR_FPS = 30
+FRAME_BUDGET_MS = 1000 // SENSOR_FPS
+OVERLAY_MAX_SKIP = 3          # 叠加绘制最多连续跳过帧数
+DISPLAY_MAX_SKIP = 2          # 屏幕刷新最多连续跳过帧数
+
 # --------------------------- 5. 电机串口底层通讯函数 ---------------------------
 def send(uart, cmd):
     uart.write(bytes(cmd))
@@ -103,6 +179,14 @@ def set_speed_ud(speed, last_speed):
         return speed
     return last_speed
 
+def flush_bus():
+    # 总线模式下指令先进发送队列，阻塞等待前需要先发完
+    if motor_bus:
+        motor_bus.flush()
+
+def rpm_to_pps(rpm):
+    return rpm * PULSE_PER_REV / 60
+
 def move_motor(uart, addr, target):
     if target < 0:
         target = (1 << 32) + target
@@ -117,7 +201,32 @@ def move_motor(uart, addr, target):
     ]
     send(uart, cmd)
 
+def move_motor_at(uart, addr, target, pps, last_rpm):
+    """
+    规划模式下发设定点: 段速度 (RPM 向上取整) 有变化时先用 0xF1 改限速 (加速度档位 0，
+    加减速由规划给出)，再以 0xFC 下发位置；速度不变的连续设定点只发 7 字节的 0xFC
+    返回当前生效的 RPM
+    """
+    rpm = max(1, int(math.ceil(pps * 60 / PULSE_PER_REV)))
+    if abs(rpm - last_rpm) > last_rpm * PROFILE_RPM_TOL:
+        fast_mode_init(uart, addr, rpm, 0)
+        last_rpm = rpm
+    move_motor(uart, addr, target)
+    return last_rpm
+
 # --------------------------- 6. 全局辅助数学与拟合函数 ---------------------------
+def roi_gray(img, roi, bufs):
+    """ROI 转灰度写入按尺寸复用的预分配缓冲，返回 numpy 引用 (不再每帧 copy + to_grayscale)"""
+    rx, ry, rw, rh = roi
+    buf = bufs.get((rw, rh))
+    if buf is None:
+        if len(bufs) >= ROI_BUF_MAX:
+            bufs.clear()
+        buf = image.Image(rw, rh, image.GRAYSCALE)
+        bufs[(rw, rh)] = buf
+    buf.draw_image(img, 0, 0, roi=roi)
+    return buf.to_numpy_ref()
+
 def calculate_distance(p1, p2):
     return math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
 
@@ -129,25 +238,33 @@ def calculate_center(points):
     return (sum_x / len(points), sum_y / len(points))
 
 def is_valid_rect(corners):
-    edges = [calculate_distance(corners[i], corners[(i+1)%4]) for i in range(4)]
-    ratio1 = edges[0] / max(edges[2], 0.1)
-    ratio2 = edges[1] / max(edges[3], 0.1)
-    valid_ratio = 0.5 < ratio1 < 1.5 and 0.5 < ratio2 < 1.5
-
-    area = 0
-    for i in range(4):
-        x1, y1 = corners[i]
-        x2, y2 = corners[(i+1) % 4]
-        area += (x1 * y2 - x2 * y1)
-    area = abs(area) / 2
-    valid_area = MIN_AREA < area < MAX_AREA
-
-    width = max(p[0] for p in corners) - min(p[0] for p in corners)
-    height = max(p[1] for p in corners) - min(p[1] for p in corners)
-    aspect_ratio = width / max(height, 0.1)
-    valid_aspect = MIN_ASPECT_RATIO < aspect_ratio < MAX_ASPECT_RATIO
-
-    return valid_ratio and valid_area and valid_aspect
+    # 由便宜到昂贵逐级排除，全程无 sqrt / 除法，大多数 cv_lite 候选在前两步即被拒绝
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = corners
+
+    # (1) 外接框宽高比: MIN < w/h < MAX 改写为乘法比较
+    width = max(x0, x1, x2, x3) - min(x0, x1, x2, x3)
+    height = max(max(y0, y1, y2, y3) - min(y0, y1, y2, y3), 0.1)
+    if not (MIN_ASPECT_RATIO * height < width < MAX_ASPECT_RATIO * height):
+        return False
+
+    # (2) 外接框面积是多边形面积的上界，过小直接拒绝
+    if width * height <= MIN_AREA:
+        return False
+
+    # (3) 对边长度比 0.5 < a/b < 1.5 改写为平方比较 0.25 < a²/b² < 2.25
+    e0 = (x1 - x0) * (x1 - x0) + (y1 - y0) * (y1 - y0)
+    e2 = (x3 - x2) * (x3 - x2) + (y3 - y2) * (y3 - y2)
+    if not (0.25 * e2 < e0 < 2.25 * e2):
+        return False
+    e1 = (x2 - x1) * (x2 - x1) + (y2 - y1) * (y2 - y1)
+    e3 = (x0 - x3) * (x0 - x3) + (y0 - y3) * (y0 - y3)
+    if not (0.25 * e3 < e1 < 2.25 * e3):
+        return False
+
+    # (4) 鞋带公式面积 (两倍面积，避免除法)
+    area2 = abs(x0 * y1 - x1 * y0 + x1 * y2 - x2 * y1 +
+                x2 * y3 - x3 * y2 + x3 * y0 - x0 * y3)
+    return 2 * MIN_AREA < area2 < 2 * MAX_AREA
 
 def get_perspective_matrix(src_pts, dst_pts):
     A = []
@@ -199,24 +316,56 @@ def transform_points(points, matrix):
             transformed.append((x_hom / w_hom, y_hom / w_hom))
     return transformed
 
+def _angle_before(ax, ay, bx, by):
+    # 等价于 atan2(ay, ax) < atan2(by, bx)：先比较半平面 (极角 (-π,0] 在前)，同半平面内用叉积判断
+    ha = ay > 0 or (ay == 0 and ax < 0)
+    hb = by > 0 or (by == 0 and bx < 0)
+    if ha != hb:
+        return hb
+    return ax * by - ay * bx > 0
+
 def sort_corners(corners):
-    center = calculate_center(corners)
-    sorted_corners = sorted(corners, key=lambda p: math.atan2(p[1]-center[1], p[0]-center[0]))
-    if len(sorted_corners) == 4:
-        left_top = min(sorted_corners, key=lambda p: p[0]+p[1])
-        index = sorted_corners.index(left_top)
+    # 以重心为原点按极角排序，坐标整体乘 n 保持整数运算，不调用 atan2
+    n = len(corners)
+    if n == 0:
+        return []
+    sx = 0
+    sy = 0
+    for p in corners:
+        sx += p[0]
+        sy += p[1]
+
+    # 插入排序，4 个点最多 6 次比较
+    sorted_corners = []
+    keys = []
+    for p in corners:
+        dx = p[0] * n - sx
+        dy = p[1] * n - sy
+        i = len(keys)
+        while i > 0 and _angle_before(dx, dy, keys[i - 1][0], keys[i - 1][1]):
+            i -= 1
+        keys.insert(i, (dx, dy))
+        sorted_corners.insert(i, p)
+
+    if n == 4:
+        index = 0
+        for i in range(1, 4):
+            if sorted_corners[i][0] + sorted_corners[i][1] < sorted_corners[index][0] + sorted_corners[index][1]:
+                index = i
         sorted_corners = sorted_corners[index:] + sorted_corners[:index]
     return sorted_corners
 
 # --------------------------- 7. 模块化追踪入口主函数 ---------------------------
 def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
+    global uart_ud, uart_lr
     
     # 🎯 核心修复：重新绑定物理引脚，防止在 main.py 中被其他串口复用覆盖
     fpioa = FPIOA()
     fpioa.set_function(3, FPIOA.UART1_TXD) 
     fpioa.set_function(4, FPIOA.UART1_RXD)
-    fpioa.set_function(5, FPIOA.UART2_TXD) 
-    fpioa.set_function(6, FPIOA.UART2_RXD)
+    if not MOTOR_BUS:
+        fpioa.set_function(5, FPIOA.UART2_TXD) 
+        fpioa.set_function(6, FPIOA.UART2_RXD)
 
     # 消除“粘滞/重叠触摸”引起的瞬间闪退退出
     print("正在等待触摸释放...")
@@ -235,12 +384,50 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
     # 动态载入调参界面中实时保存的第一组 LAB 阈值
     PURPLE_THRESHOLD = tuple(thresholds[0])
     print("加载实时 LAB 追踪阈值:", PURPLE_THRESHOLD)
+    blob_thresholds = [PURPLE_THRESHOLD]
+    color_lut = None
+    if COLOR_LUT:
+        try:
+            color_lut, lut_boxes = ColorLUT.load(COLOR_LUT_FILE)
+            if lut_boxes:
+                blob_thresholds = lut_boxes
+            print("加载颜色查找表:", blob_thresholds)
+        except (OSError, ValueError, KeyError) as e:
+            print("颜色查找表加载失败，使用调参阈值:", e)
 
     # --------------------------- 8. 初始化状态变量 ---------------------------
     smooth_x = 0.0
     smooth_y = 0.0
-    last_smooth_x = 0.0
-    last_smooth_y = 0.0
+
+    pan_pid = PIDAxis(KP_PAN, 0.0, KD_PAN)
+    tilt_pid = PIDAxis(KP_TILT, 0.0, KD_TILT)
+    deadzone_x = DEADZONE_X
+    deadzone_y = DEADZONE_Y
+
+    store = None
+    if CONFIG_STORE:
+        # 共享参数存储 (debug_tool 菜单 8 写入)；文件中没有的键沿用本文件常量
+        store = get_store()
+
+        def apply_tuning(changed):
+            nonlocal deadzone_x, deadzone_y
+            if 'GIMBAL_PID_PAN' in changed:
+                g = changed['GIMBAL_PID_PAN']
+                pan_pid.set_gains(g['kp'], g.get('ki', 0.0), g['kd'])
+            if 'GIMBAL_PID_TILT' in changed:
+                g = changed['GIMBAL_PID_TILT']
+                tilt_pid.set_gains(g['kp'], g.get('ki', 0.0), g['kd'])
+            if 'GIMBAL_DEADZONE' in changed:
+                deadzone_x, deadzone_y = changed['GIMBAL_DEADZONE']
+            print("云台参数已更新:", sorted(changed.keys()))
+
+        def apply_threshold(changed):
+            # 阈值列表原地替换，find_blobs 下一帧即生效
+            blob_thresholds[:] = [tuple(t) for t in changed['GIMBAL_THRESHOLD']]
+            print("追踪阈值已更新:", blob_thresholds)
+
+        store.on_change(('GIMBAL_PID_PAN', 'GIMBAL_PID_TILT', 'GIMBAL_DEADZONE'), apply_tuning)
+        store.on_change(('GIMBAL_THRESHOLD',), apply_threshold, fire=False)
 
     last_pan_control = 0
     last_tilt_control = 0
@@ -251,6 +438,15 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
     # 垂直下发速度缓存（水平轴不再动态下发）
     last_sent_speed_ud = 350      
 
+    pan_axis = None
+    tilt_axis = None
+
+    pan_status = None
+    tilt_status = None
+    pan_sync = PositionTracker(RESYNC_TOLERANCE, RESYNC_SETTLE)
+    tilt_sync = PositionTracker(RESYNC_TOLERANCE, RESYNC_SETTLE)
+    sync = SyncMotion(PULSE_PER_REV)
+
     # ------------------ 9. 云台通电归零与就位 ------------------
     print("正在加载绝对位置驱动配置...")
     
@@ -259,34 +455,101 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
     fast_mode_init(uart_lr, HORIZONTAL_ADDR, 180) 
     
     fast_mode_init(uart_ud, VERTICAL_ADDR, 350)
+    flush_bus()
     time.sleep_ms(200)
 
-    # 俯仰回归零点
+    # 俯仰回归零点 (两轴同步启动)
     print("云台双轴归零...")
-    move_motor(uart_ud, VERTICAL_ADDR, 0)
-    move_motor(uart_lr, HORIZONTAL_ADDR, 0)
+    sync.move_abs(uart_ud, VERTICAL_ADDR, 0, HOME_SPEED_TILT, 5)
+    sync.move_abs(uart_lr, HORIZONTAL_ADDR, 0, HOME_SPEED_PAN, 5)
+    sync.trigger()
+    flush_bus()
     time.sleep(1.5)
 
     # 俯仰抬升到初始工作角
     print("俯仰抬升到初始工作高度...")
     tilt_target = INIT_TILT
     move_motor(uart_ud, VERTICAL_ADDR, tilt_target)
+    flush_bus()
     time.sleep(1.5)
+
+    if MOTION_PROFILE:
+        # 规划模式下限速由规划器逐段给出 (段速度变化时 0xF1 更新，加速度档位 0)
+        pan_rpm = 0
+        tilt_rpm = 0
+        pan_axis = ProfiledAxis(rpm_to_pps(PAN_PROFILE_SPEED), rpm_to_pps(PAN_PROFILE_ACC),
+                                PAN_LIMIT_MIN, PAN_LIMIT_MAX, 0, MOTION_PROFILE, PROFILE_PERIOD,
+                                PROFILE_MIN_STEP)
+        tilt_axis = ProfiledAxis(rpm_to_pps(V_MIN_TILT), rpm_to_pps(TILT_PROFILE_ACC),
+                                 TILT_LIMIT_MIN, TILT_LIMIT_MAX, tilt_target, MOTION_PROFILE, PROFILE_PERIOD,
+                                 PROFILE_MIN_STEP)
+
+    now = time.ticks_ms()
+    pan_sync.commanded_to(0, now)
+    tilt_sync.commanded_to(tilt_target, now)
+
     print("安全校准完成，视觉闭环就绪...")
 
     clock = time.clock()
+
+    sched = FrameBudget(FRAME_BUDGET_MS)
+    sched.add_task('detect', PRIO_DETECT)
+    sched.add_task('control', PRIO_CONTROL)
+    sched.add_task('telemetry', PRIO_TELEMETRY, cost_ms=2)
+    sched.add_task('overlay', PRIO_OVERLAY, cost_ms=3, max_skip=OVERLAY_MAX_SKIP)
+    sched.add_task('display', PRIO_DISPLAY, cost_ms=5, max_skip=DISPLAY_MAX_SKIP)
     
     # 先安全截取一帧图像获取分辨率，规避部分固件下直接读取 sensor.width() 的异常
     first_img = sensor.snapshot(chn=CAM_CHN_ID_0)
     image_shape = [first_img.height(), first_img.width()]
     print(f"当前输入图像解析分辨率: {image_shape[1]}x{image_shape[0]}")
 
+    cascade = DetectCascade(image_shape[1], image_shape[0], margin=CASCADE_ROI_MARGIN,
+                            max_rois=CASCADE_MAX_ROIS, full_period=CASCADE_FULL_PERIOD)
+    gray_bufs = {}          # ROI 灰度缓冲 {(宽, 高): image.Image}
+    frame_count = 0
+
+    # 虚拟靶面与圆周采样点只依赖常量，循环外一次性生成
+    virtual_rect = [(0, 0), (RECT_WIDTH, 0), (RECT_WIDTH, RECT_HEIGHT), (0, RECT_HEIGHT)]
+    virtual_center = (RECT_WIDTH / 2, RECT_HEIGHT / 2)
+    virtual_circle_points = []
+    for i in range(POINTS_PER_CIRCLE):
+        angle_rad = 2 * math.pi * i / POINTS_PER_CIRCLE
+        virtual_circle_points.append((virtual_center[0] + BASE_RADIUS * math.cos(angle_rad),
+                                      virtual_center[1] + BASE_RADIUS * math.sin(angle_rad)))
+
+    # 异步发送线程只在跟踪期间存在 (finally 中停止)，状态轮询须经同一发送层写串口
+    tx_workers = []
+    if not MOTOR_BUS and UART_TX_THREAD:
+        uart_ud = AsyncUartTx(uart_ud, TX_QUEUE_DEPTH, TX_BATCH)
+        uart_lr = AsyncUartTx(uart_lr, TX_QUEUE_DEPTH, TX_BATCH)
+        tx_workers = [uart_ud, uart_lr]
+
+    if STATUS_POLL:
+        # 两轴各占一个串口，分别轮询；丢弃归零过程中积压的应答
+        for u in (uart_lr, uart_ud):
+            if u.any():
+                u.read()
+        if MOTOR_BUS:
+            # 同一总线上一问一答，两个地址轮流查询
+            pan_status = StatusPoller(motor_bus, (HORIZONTAL_ADDR, VERTICAL_ADDR), period_ms=STATUS_PERIOD,
+                                      timeout_ms=STATUS_TIMEOUT, pulse_per_rev=PULSE_PER_REV)
+            tilt_status = pan_status
+        else:
+            pan_status = StatusPoller(uart_lr, (HORIZONTAL_ADDR,), period_ms=STATUS_PERIOD,
+                                      timeout_ms=STATUS_TIMEOUT, pulse_per_rev=PULSE_PER_REV)
+            tilt_status = StatusPoller(uart_ud, (VERTICAL_ADDR,), period_ms=STATUS_PERIOD,
+                                       timeout_ms=STATUS_TIMEOUT, pulse_per_rev=PULSE_PER_REV)
+
     # --------------------------- 10. 闭环控制核心循环 ---------------------------
     try:
         while True:
             # 捕获 IDE 的停止信号
             os.exitpoint()
             clock.tick()
+            sched.begin_frame()
+            if store is not None:
+                store.poll()
             
             # 指定通道获取图像，保证主线程与子模块通道完全一致
             img = sensor.snapshot(chn=CAM_CHN_ID_0)
@@ -294,9 +557,18 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
             # 虚拟按键退出检测：如果按下右上角区域，安全复位云台并返回主菜单
             if key_esc.is_pressed():
                 print("收到退出信号，云台复位返回...")
+                if MOTION_PROFILE:
+                    # 恢复驱动器自身的限速与加减速
+                    fast_mode_init(uart_lr, HORIZONTAL_ADDR, 180)
+                    fast_mode_init(uart_ud, VERTICAL_ADDR, 350)
+                flush_bus()
                 time.sleep_ms(100)
-                move_motor(uart_lr, HORIZONTAL_ADDR, 0)
-                move_motor(uart_ud, VERTICAL_ADDR, INIT_TILT)
+                # 从最后下发的位置斜线回到初始位姿，两轴同时启动、同时到达
+                sync.move_linear([(uart_lr, HORIZONTAL_ADDR, pan_sync.commanded, 0),
+                                  (uart_ud, VERTICAL_ADDR, tilt_sync.commanded, INIT_TILT)],
+                                 RESET_SPEED, RESET_ACC)
+                sync.trigger()
+                flush_bus()
                 time.sleep_ms(200)
                 return
 
@@ -305,24 +577,43 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
             target_type = "None"
 
             # (1) 调参颜色色块检测（动态读取自适应阈值）
+            sched.begin_task('detect')
             purple_blobs = img.find_blobs(
-                [PURPLE_THRESHOLD],
+                blob_thresholds,
                 pixels_threshold=100,
                 area_threshold=100,
                 merge=True
             )
-            for blob in purple_blobs:
-                img.draw_rectangle(blob[0:4], color=(255, 0, 255), thickness=1)
-                img.draw_cross(blob.cx(), blob.cy(), color=(255, 0, 255), thickness=1)
-
-            # (2) 使用 cv_lite 引擎进行矩形检测
-            gray_img = img.to_grayscale()
-            img_np = gray_img.to_numpy_ref()
-
-            rects = cv_lite.grayscale_find_rectangles_with_corners(
-                image_shape, img_np, canny_thresh1, canny_thresh2,
-                approx_epsilon, area_min_ratio, max_angle_cos, gaussian_blur_size
-            )
+            if color_lut is not None and purple_blobs:
+                # 只按像素数从大到小校验级联会用到的前 max_rois 个色块
+                checked = []
+                for b in sorted(purple_blobs, key=lambda b: -b.pixels()):
+                    if len(checked) >= cascade.max_rois:
+                        break
+                    if color_lut.purity(img, b) >= LUT_MIN_PURITY:
+                        checked.append(b)
+                purple_blobs = checked
+
+            # (2) 级联：色块/上次命中位置给出候选区，cv_lite 矩形检测只在候选区内运行
+            rois, full = cascade.propose(purple_blobs)
+            rects = []
+            cascade.begin('full' if full else 'rect')
+            if full:
+                gray_img = img.to_grayscale()
+                img_np = gray_img.to_numpy_ref()
+                rects = cv_lite.grayscale_find_rectangles_with_corners(
+                    image_shape, img_np, canny_thresh1, canny_thresh2,
+                    approx_epsilon, area_min_ratio, max_angle_cos, gaussian_blur_size
+                )
+            else:
+                for roi in rois:
+                    rx, ry, rw, rh = roi
+                    roi_np = roi_gray(img, roi, gray_bufs)
+                    for rect in cv_lite.grayscale_find_rectangles_with_corners(
+                            [rh, rw], roi_np, canny_thresh1, canny_thresh2,
+                            approx_epsilon, cascade.area_ratio(area_min_ratio, roi),
+                            max_angle_cos, gaussian_blur_size):
+                        rects.append(offset_rect(rect, rx, ry))
 
             min_area = float('inf')
             smallest_rect = None
@@ -342,47 +633,24 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
                         min_area = area
                         smallest_rect = (x_r, y_r, w_r, h_r)
                         smallest_rect_corners = corners
+            if rois:
+                cascade.end('full' if full else 'rect', smallest_rect is not None)
+            cascade.report(smallest_rect)
 
             # (3) 目标优先级决策
+            sorted_corners = None
+            matrix = None
             if smallest_rect and smallest_rect_corners:
                 x_r, y_r, w_r, h_r = smallest_rect
                 corners = smallest_rect_corners
                 sorted_corners = sort_corners(corners)
 
-                # 绘制外框与顶点
-                for i in range(4):
-                    x1, y1 = sorted_corners[i]
-                    x2, y2 = sorted_corners[(i+1) % 4]
-                    img.draw_line(x1, y1, x2, y2, color=(255, 0, 0), thickness=2)
-                for p in sorted_corners:
-                    img.draw_circle(p[0], p[1], 5, color=(0, 255, 0), thickness=2)
-
-                # 投影矩阵计算
-                virtual_rect = [(0, 0), (RECT_WIDTH, 0), (RECT_WIDTH, RECT_HEIGHT), (0, RECT_HEIGHT)]
-                radius_x = BASE_RADIUS
-                radius_y = BASE_RADIUS
-                virtual_center = (RECT_WIDTH / 2, RECT_HEIGHT / 2)
-
-                virtual_circle_points = []
-                for i in range(POINTS_PER_CIRCLE):
-                    angle_rad = 2 * math.pi * i / POINTS_PER_CIRCLE
-                    x_virt = virtual_center[0] + radius_x * math.cos(angle_rad)
-                    y_virt = virtual_center[1] + radius_y * math.sin(angle_rad)
-                    virtual_circle_points.append((x_virt, y_virt))
-
+                # 投影矩阵计算（圆周映射点仅用于绘制，移至叠加任务中按需计算）
                 matrix = get_perspective_matrix(virtual_rect, sorted_corners)
                 if matrix:
-                    mapped_points = transform_points(virtual_circle_points, matrix)
-                    int_points = [(int(round(px)), int(round(py))) for px, py in mapped_points]
-
-                    for (px, py) in int_points:
-                        img.draw_circle(px, py, 2, color=(255, 0, 255), thickness=2)
-
                     mapped_center = transform_points([virtual_center], matrix)
                     if mapped_center:
                         cx, cy = map(int, map(round, mapped_center[0]))
-                        img.draw_circle(cx, cy, 3, color=(0, 0, 255), thickness=1)
-
                         target_x = cx
                         target_y = cy
                         target_type = "Rectangle"
@@ -392,8 +660,10 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
                 target_x = largest_purple.cx()
                 target_y = largest_purple.cy()
                 target_type = "Purple Blob"
+            sched.done('detect')
 
             # (4) 闭环速位结合跟踪控制
+            sched.begin_task('control')
             if target_x is not None and target_y is not None:
                 raw_x = target_x - CX
                 raw_y = target_y - CY
@@ -409,11 +679,9 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
                 if time.ticks_diff(now, last_pan_control) >= PAN_CONTROL_PERIOD:
                     last_pan_control = now
 
-                    if abs(smooth_x) > DEADZONE_X:
-                        err_diff_x = smooth_x - last_smooth_x
-                        pos_delta = int(KP_PAN * smooth_x + KD_PAN * err_diff_x)
-                        last_smooth_x = smooth_x
-
+                    # 死区内也要更新 PID，保持微分状态连续
+                    pos_delta = int(pan_pid.update_error(smooth_x))
+                    if abs(smooth_x) > deadzone_x:
                         # 过滤低于 4 脉冲的微调误差
                         if abs(pos_delta) < 4:
                             pos_delta = 0
@@ -423,9 +691,11 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
                             # 仅保留纯位置 0xFC 指令下发，靠开机已经固化好的安全低速（180）保障云台稳定、不抽动。
                             pan_target += PAN_DIR * pos_delta
                             pan_target = max(PAN_LIMIT_MIN, min(PAN_LIMIT_MAX, pan_target))
-                            move_motor(uart_lr, HORIZONTAL_ADDR, pan_target)
-                    else:
-                        last_smooth_x = smooth_x
+                            if pan_axis:
+                                pan_axis.set_goal(pan_target, now)
+                            else:
+                                move_motor(uart_lr, HORIZONTAL_ADDR, pan_target)
+                                pan_sync.commanded_to(pan_target, now)
 
                 # ==========================================
                 # 垂直轴 (Tilt) 控制
@@ -433,44 +703,128 @@ def run_gimbal_tracking(sensor, tp, key_esc, thresholds, width=800, height=480):
                 if time.ticks_diff(now, last_tilt_control) >= TILT_CONTROL_PERIOD:
                     last_tilt_control = now
 
-                    if abs(smooth_y) > DEADZONE_Y:
-                        err_diff_y = smooth_y - last_smooth_y
-                        pos_delta_y = int(KP_TILT * smooth_y + KD_TILT * err_diff_y)
-                        last_smooth_y = smooth_y
-
+                    pos_delta_y = int(tilt_pid.update_error(smooth_y))
+                    if abs(smooth_y) > deadzone_y:
                         v_tilt = int(V_MIN_TILT + KV_TILT * abs(smooth_y))
                         v_tilt = max(V_MIN_TILT, min(V_MAX_TILT, v_tilt))
 
-                        # 实时更新垂直速度环
-                        last_sent_speed_ud = set_speed_ud(v_tilt, last_sent_speed_ud)
-
                         tilt_target += TILT_DIR * pos_delta_y
                         tilt_target = max(TILT_LIMIT_MIN, min(TILT_LIMIT_MAX, tilt_target))
 
-                        move_motor(uart_ud, VERTICAL_ADDR, tilt_target)
-                    else:
-                        last_smooth_y = smooth_y
-
-                img.draw_cross(target_x, target_y, color=(0, 255, 0), size=15, thickness=2)
-                img.draw_line(target_x, target_y, CX, CY, color=(255, 200, 0), thickness=2)
-                img.draw_string_advanced(20, 40, 32, f"Tracking: {target_type}", color=(0, 255, 255))
+                        if tilt_axis:
+                            # 速度环改为修改规划最高速，不再下发 0xF1
+                            tilt_axis.set_speed_limit(rpm_to_pps(v_tilt))
+                            tilt_axis.set_goal(tilt_target, now)
+                        else:
+                            # 实时更新垂直速度环
+                            last_sent_speed_ud = set_speed_ud(v_tilt, last_sent_speed_ud)
+                            move_motor(uart_ud, VERTICAL_ADDR, tilt_target)
+                            tilt_sync.commanded_to(tilt_target, now)
             else:
                 smooth_x, smooth_y = 0.0, 0.0
-                last_smooth_x, last_smooth_y = 0.0, 0.0
-                img.draw_string_advanced(20, 40, 32, "Searching...", color=(255, 150, 150))
+                pan_pid.reset()
+                tilt_pid.reset()
+
+            # 规划设定点按周期下发，目标丢失后仍走完剩余轨迹平滑停下
+            now = time.ticks_ms()
+            if pan_axis:
+                pos = pan_axis.update(now)
+                if pos is not None:
+                    pan_rpm = move_motor_at(uart_lr, HORIZONTAL_ADDR, pos, pan_axis.seg_speed, pan_rpm)
+                    pan_sync.commanded_to(pos, now)
+                pos = tilt_axis.update(now)
+                if pos is not None:
+                    tilt_rpm = move_motor_at(uart_ud, VERTICAL_ADDR, pos, tilt_axis.seg_speed, tilt_rpm)
+                    tilt_sync.commanded_to(pos, now)
+
+            # 状态回读：非阻塞收发，停稳后实际位置持续偏离指令则以实际位置为准
+            if pan_status:
+                pan_status.poll(now)
+                if tilt_status is not pan_status:
+                    tilt_status.poll(now)
+                real = pan_sync.check(pan_status.status[HORIZONTAL_ADDR], now)
+                if real is not None:
+                    print("水平轴位置偏差，对齐实际位置:", pan_target, "->", real)
+                    pan_target = max(PAN_LIMIT_MIN, min(PAN_LIMIT_MAX, real))
+                    if pan_axis:
+                        pan_axis.reset(pan_target)
+                    pan_pid.reset()
+                real = tilt_sync.check(tilt_status.status[VERTICAL_ADDR], now)
+                if real is not None:
+                    print("垂直轴位置偏差，对齐实际位置:", tilt_target, "->", real)
+                    tilt_target = max(TILT_LIMIT_MIN, min(TILT_LIMIT_MAX, real))
+                    if tilt_axis:
+                        tilt_axis.reset(tilt_target)
+                    tilt_pid.reset()
+
+            # 总线模式：本帧排队的指令按帧间隔/地址限速发出
+            if motor_bus:
+                motor_bus.pump()
+            sched.done('control')
+
+            # (5) 叠加绘制（超预算时抽帧）
+            if sched.should_run('overlay'):
+                for blob in purple_blobs:
+                    img.draw_rectangle(blob[0:4], color=(255, 0, 255), thickness=1)
+                    img.draw_cross(blob.cx(), blob.cy(), color=(255, 0, 255), thickness=1)
+
+                if sorted_corners:
+                    # 绘制外框与顶点
+                    for i in range(4):
+                        x1, y1 = sorted_corners[i]
+                        x2, y2 = sorted_corners[(i+1) % 4]
+                        img.draw_line(x1, y1, x2, y2, color=(255, 0, 0), thickness=2)
+                    for p in sorted_corners:
+                        img.draw_circle(p[0], p[1], 5, color=(0, 255, 0), thickness=2)
+
+                if matrix:
+                    mapped_points = transform_points(virtual_circle_points, matrix)
+                    for px, py in mapped_points:
+                        img.draw_circle(int(round(px)), int(round(py)), 2, color=(255, 0, 255), thickness=2)
+                    if target_type == "Rectangle":
+                        img.draw_circle(target_x, target_y, 3, color=(0, 0, 255), thickness=1)
+
+                if target_x is not None and target_y is not None:
+                    img.draw_cross(target_x, target_y, color=(0, 255, 0), size=15, thickness=2)
+                    img.draw_line(target_x, target_y, CX, CY, color=(255, 200, 0), thickness=2)
 
-            img.draw_cross(CX, CY, color=(0, 255, 0), size=25, thickness=3)
-            img.draw_circle(CX, CY, 40, color=(0, 255, 0), thickness=2)
+                img.draw_cross(CX, CY, color=(0, 255, 0), size=25, thickness=3)
+                img.draw_circle(CX, CY, 40, color=(0, 255, 0), thickness=2)
+                sched.done('overlay')
 
+            # (6) 状态文字
             fps = clock.fps()
-            img.draw_string_advanced(10, 10, 20, f"FPS: {fps:.1f}", color=(255, 255, 255))
+            if sched.should_run('telemetry'):
+                if target_x is not None and target_y is not None:
+                    img.draw_string_advanced(20, 40, 32, f"Tracking: {target_type}", color=(0, 255, 255))
+                else:
+                    img.draw_string_advanced(20, 40, 32, "Searching...", color=(255, 150, 150))
+                img.draw_string_advanced(10, 10, 20, f"FPS: {fps:.1f}", color=(255, 255, 255))
+                sched.done('telemetry')
 
             # 居中显示在 LCD 屏幕上
-            Display.show_image(img,
-                              x=round((lcd_width - sensor.width()) / 2),
-                              y=round((lcd_height - sensor.height()) / 2))
+            if sched.should_run('display'):
+                Display.show_image(img,
+                                  x=round((lcd_width - sensor.width()) / 2),
+                                  y=round((lcd_height - sensor.height()) / 2))
+                sched.done('display')
+
+            sched.end_frame()
+
+            frame_count += 1
+            if CASCADE_REPORT_PERIOD and frame_count % CASCADE_REPORT_PERIOD == 0:
+                print("级联检测统计 (命中率, 平均耗时ms, 调用次数):", cascade.hit_rates())
+                if motor_bus:
+                    print("电机总线统计:", motor_bus.stats())
+                elif tx_workers:
+                    print("串口发送统计 UART1:", uart_ud.stats())
+                    print("串口发送统计 UART2:", uart_lr.stats())
 
     except Exception as e:
         print(f"云台追踪线程中发生致命错误: {e}")
     finally:
-        print("正在安全卸载云台控制...")
\ No newline at end of file
+        print("正在安全卸载云台控制...")
+        for tx in tx_workers:
+            tx.stop()
+        if tx_workers:
+            uart_ud, uart_lr = tx_workers[0].uart, tx_workers[1].uart
\ No newline at end of file
@@ -0,0 +1,100 @@
+'''
+LAB 阈值自动校准
+在用户框选的 ROI 内连续采集 N 帧 LAB 直方图 (img.get_histogram)，各帧归一化直方图累加后
+按百分位取 L/A/B 上下界，再外扩少量余量，得到 find_blobs 阈值:
+- 百分位而不是最小/最大值：少量高光、边缘混色像素不会把阈值撑大
+- 多帧累加：抵消自动曝光/白平衡的帧间波动
+固件不支持直方图时退化为 get_statistics 的四分位数 (按四分位距外扩)
+校准结果由调用方写入 config_store (RED_THRESHOLD 键)
+'''
+
+FRAMES = 30
+LOW_PERCENTILE = 0.05
+HIGH_PERCENTILE = 0.95
+MARGIN = (3, 4, 4)         # L/A/B 外扩余量
+IQR_SCALE = 1.5            # 四分位退化模式的外扩倍数
+
+L_RANGE = (0, 100)
+AB_RANGE = (-128, 127)
+
+
+def _percentile(bins, p, lo, hi):
+    """累计直方图达到 p 的通道值"""
+    total = sum(bins)
+    if total <= 0:
+        return None
+    step = (hi - lo + 1) / len(bins)
+    acc = 0.0
+    for i, v in enumerate(bins):
+        acc += v
+        if acc >= p * total:
+            return int(lo + i * step)
+    return hi
+
+
+def _clamp(v, rng):
+    return max(rng[0], min(rng[1], int(v)))
+
+
+class LabAutoCalibrator:
+    def __init__(self, low=LOW_PERCENTILE, high=HIGH_PERCENTILE, margin=MARGIN):
+        self.low = low
+        self.high = high
+        self.margin = margin
+        self.bins = None            # [L, A, B] 累加直方图
+        self.quartiles = []         # 退化模式: 每帧 (lq, uq) × 3
+        self.frames = 0
+
+    def add_frame(self, img, roi):
+        """累加一帧 ROI 的 LAB 直方图"""
+        try:
+            hist = img.get_histogram(roi=roi)
+            bins = (hist.l_bins(), hist.a_bins(), hist.b_bins())
+        except (AttributeError, TypeError):
+            s = img.get_statistics(roi=roi)
+            self.quartiles.append(((s.l_lq(), s.l_uq()), (s.a_lq(), s.a_uq()), (s.b_lq(), s.b_uq())))
+            self.frames += 1
+            return
+        if self.bins is None:
+            self.bins = [list(b) for b in bins]
+        else:
+            for acc, b in zip(self.bins, bins):
+                for i in range(min(len(acc), len(b))):
+                    acc[i] += b[i]
+        self.frames += 1
+
+    def threshold(self):
+        """(L_MIN, L_MAX, A_MIN, A_MAX, B_MIN, B_MAX)；没有数据返回 None"""
+        if not self.frames:
+            return None
+        ranges = (L_RANGE, AB_RANGE, AB_RANGE)
+        out = []
+        if self.bins is not None:
+            for bins, rng, m in zip(self.bins, ranges, self.margin):
+                lo = _percentile(bins, self.low, rng[0], rng[1])
+                hi = _percentile(bins, self.high, rng[0], rng[1])
+                if lo is None:
+                    return None
+                out += [_clamp(lo - m, rng), _clamp(hi + m, rng)]
+        else:
+            for ch, rng, m in zip(range(3), ranges, self.margin):
+                lq = sum(q[ch][0] for q in self.quartiles) / len(self.quartiles)
+                uq = sum(q[ch][1] for q in self.quartiles) / len(self.quartiles)
+                pad = (uq - lq) * IQR_SCALE + m
+                out += [_clamp(lq - pad, rng), _clamp(uq + pad, rng)]
+        return tuple(out)
+
+
+def calibrate(snapshot, roi, frames=FRAMES, on_frame=None, **kw):
+    """
+    snapshot: 返回一帧图像的函数；on_frame(img, i) 用于绘制进度
+    返回 LAB 阈值元组
+    """
+    cal = LabAutoCalibrator(**kw)
+    for i in range(frames):
+        img = snapshot()
+        cal.add_frame(img, roi)
+        if on_frame:
+            on_frame(img, i)
+    return cal.threshold()
+
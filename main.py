@@ -2,11 +2,12 @@ import gc
 import socket
 import time
 
-import network
 from media.sensor import *
 from media.display import *
 from media.media import *
 
+from fast_boot import BootTimeline, WifiLink, init_sensor
+
 
 # ===================== 最简配置 =====================
 WIFI_SSID = "嵌入式实验室406"
@@ -21,54 +22,21 @@ HTTP_PORT = 8080
 SHOW_LCD = False
 
 
-def ensure_wifi():
-    wlan = network.WLAN(network.STA_IF)
-    if not wlan.active():
-        wlan.active(True)
-
-    if wlan.isconnected():
-        return wlan.ifconfig()[0]
-
-    try:
-        wlan.connect(WIFI_SSID, WIFI_PASSWORD)
-    except Exception as err:
-        print("Wi-Fi 连接失败:", err)
-
-    for _ in range(60):
-        if wlan.isconnected():
-            return wlan.ifconfig()[0]
-        time.sleep(1)
-
-    return "0.0.0.0"
-
-
-def init_camera():
-    sensor = Sensor(width=W, height=H)
-    sensor.reset()
-    sensor.set_hmirror(True)
-    sensor.set_vflip(True)
-    sensor.set_framesize(width=W, height=H)
-    sensor.set_pixformat(Sensor.RGB565)
-
-    if SHOW_LCD:
-        Display.init(Display.ST7701, width=W, height=H)
-
-    MediaManager.init()
-    time.sleep_ms(300)
-
-    last_err = None
-    for _ in range(3):
-        try:
-            sensor.run()
-            return sensor
-        except Exception as err:
-            last_err = err
-            print("sensor.run 重试:", err)
-            time.sleep_ms(300)
+def init_camera(timeline=None):
+    # 镜像/分辨率/格式只配置一次，run 失败时短间隔重试
+    return init_sensor(
+        W, H,
+        hmirror=True,
+        vflip=True,
+        display=Display.ST7701 if SHOW_LCD else None,
+        timeline=timeline,
+    )
 
-    raise last_err
 
-    return sensor
+def print_urls(ip):
+    print("K230 IP:", ip)
+    print("浏览器打开: http://{}:{}/".format(ip, HTTP_PORT))
+    print("或者直接打开: http://{}:{}/stream".format(ip, HTTP_PORT))
 
 
 def draw_ui(img, blob, fps, found):
@@ -111,10 +79,15 @@ def main():
     print("K230 红色物体最简版本")
     print("=" * 40)
 
-    ip = ensure_wifi()
-    print("K230 IP:", ip)
+    # Wi-Fi 只发起关联，与摄像头初始化并行；IP 在主循环中取得
+    boot = BootTimeline()
+    wifi = WifiLink(WIFI_SSID, WIFI_PASSWORD, timeline=boot)
+    ip = wifi.start()
 
-    sensor = init_camera()
+    sensor = init_camera(boot)
+    # 启动后立即取一帧，first_frame 反映摄像头就绪时间而不是客户端连接时间
+    sensor.snapshot()
+    boot.mark('first_frame')
 
     addr = socket.getaddrinfo("0.0.0.0", HTTP_PORT)[0][-1]
     server = socket.socket()
@@ -125,9 +98,10 @@ def main():
         server.settimeout(1)
     except Exception:
         pass
+    boot.mark('server_listen')
 
-    print("浏览器打开: http://{}:{}/".format(ip, HTTP_PORT))
-    print("或者直接打开: http://{}:{}/stream".format(ip, HTTP_PORT))
+    if ip is not None:
+        print_urls(ip)
 
     frame_count = 0
     last_fps_time = time.ticks_ms()
@@ -135,6 +109,12 @@ def main():
 
     try:
         while True:
+            if ip is None and not wifi.failed:
+                ip = wifi.poll()
+                if ip is not None:
+                    print_urls(ip)
+                    boot.report()
+
             try:
                 cl, client_addr = server.accept()
             except Exception:
@@ -175,6 +155,8 @@ def main():
                         if blobs:
                             blob = max(blobs, key=lambda x: x.pixels())
                             found = True
+                            if boot.once('first_track'):
+                                boot.report()
 
                         draw_ui(img, blob, fps, found)
 
@@ -205,7 +187,7 @@ def main():
                             time.sleep_ms(15 - frame_cost)
 
                 else:
-                    send_html(cl, ip)
+                    send_html(cl, ip or "0.0.0.0")
 
             except Exception as e:
                 print("客户端断开:", e)
@@ -0,0 +1,194 @@
+'''
+步进电机运动规划 - 脉冲空间的梯形 / S 曲线速度规划
+目标位置变化时从当前设定点与速度平滑重规划，按调用间隔 (实机为视觉帧间隔) 采样设定点:
+设定点取前瞻若干间隔后的规划位置，附带恰好在该时刻走到的段速度 (seg_speed)，
+驱动器按段速度匀速跟随，相邻设定点首尾相接，不再每步全速冲到位后停住；
+预测的驱动器位置与规划一致 (匀速段) 时不下发，减少串口流量
+
+S 曲线采用升余弦速度过渡 (加速度连续、加加速度有限)，峰值加速度等于 a_max
+'''
+
+import math
+import time
+
+try:
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_diff(a, b):
+        return a - b
+
+TRAPEZOID = 'trapezoid'
+SCURVE = 'scurve'
+
+# 速度过渡时间系数: 梯形 T = dv / a；升余弦 T = π/2 * dv / a
+_SHAPE_K = {TRAPEZOID: 1.0, SCURVE: math.pi / 2}
+
+LOOKAHEAD = 3          # ProfiledAxis 设定点前瞻的调用间隔数
+
+
+class MotionProfile:
+    """单轴一维运动规划 (单位: 脉冲, 秒)"""
+    __slots__ = ('kind', 'k', 'v_max', 'a_max', 'pos_min', 'pos_max',
+                 'segs', 'goal', 'duration')
+
+    def __init__(self, v_max, a_max, pos_min=-2147483647, pos_max=2147483647, kind=TRAPEZOID):
+        self.kind = kind
+        self.k = _SHAPE_K[kind]
+        self.v_max = float(v_max)
+        self.a_max = float(a_max)
+        self.pos_min = pos_min
+        self.pos_max = pos_max
+        self.segs = []          # [(时长, 起点位置, 起始速度, 终止速度), ...]
+        self.goal = 0.0
+        self.duration = 0.0
+
+    def _ramp(self, p, v0, v1):
+        """追加一段速度过渡，返回结束位置"""
+        t = self.k * abs(v1 - v0) / self.a_max
+        if t > 0:
+            self.segs.append((t, p, v0, v1))
+        return p + (v0 + v1) * 0.5 * t
+
+    def plan(self, start, goal, v0=0.0):
+        """从 (start, v0) 规划到 goal 静止"""
+        goal = max(self.pos_min, min(self.pos_max, goal))
+        self.goal = float(goal)
+        self.segs = []
+        a2 = 2.0 * self.a_max / self.k
+        p = float(start)
+        v = float(v0)
+        if v > self.v_max:
+            p = self._ramp(p, v, self.v_max)
+            v = self.v_max
+        elif v < -self.v_max:
+            p = self._ramp(p, v, -self.v_max)
+            v = -self.v_max
+
+        d = self.goal - p
+        # 反向运动或来不及刹停：先减速到 0 再重新规划
+        if v != 0 and (v * d < 0 or v * v / a2 > abs(d)):
+            p = self._ramp(p, v, 0.0)
+            v = 0.0
+            d = self.goal - p
+
+        dist = abs(d)
+        if dist > 0:
+            s = 1.0 if d > 0 else -1.0
+            u0 = abs(v)
+            # 加速段 + 减速段距离 = (2 vp² - u0²) / a2 <= dist
+            vp = math.sqrt((a2 * dist + u0 * u0) * 0.5)
+            if vp > self.v_max:
+                vp = self.v_max
+            p = self._ramp(p, s * u0, s * vp)
+            cruise = dist - (2 * vp * vp - u0 * u0) / a2
+            if cruise > 0 and vp > 0:
+                t = cruise / vp
+                self.segs.append((t, p, s * vp, s * vp))
+                p += s * cruise
+            self._ramp(p, s * vp, 0.0)
+
+        self.duration = 0.0
+        for seg in self.segs:
+            self.duration += seg[0]
+
+    def sample(self, t):
+        """返回 t 秒时的 (位置, 速度)"""
+        for dur, p0, v0, v1 in self.segs:
+            if t < dur:
+                if v0 == v1:
+                    return p0 + v0 * t, v0
+                if self.kind == SCURVE:
+                    w = math.pi / dur
+                    dv = v1 - v0
+                    return (p0 + v0 * t + dv * 0.5 * (t - math.sin(w * t) / w),
+                            v0 + dv * 0.5 * (1 - math.cos(w * t)))
+                a = (v1 - v0) / dur
+                return p0 + v0 * t + 0.5 * a * t * t, v0 + a * t
+            t -= dur
+        return self.goal, 0.0
+
+
+class ProfiledAxis:
+    """
+    带运动规划的轴: set_goal 设定新目标 (随时可改)，update 按周期取设定点
+    时间单位 ms (time.ticks_ms)
+    """
+
+    def __init__(self, v_max, a_max, pos_min, pos_max, start=0, kind=TRAPEZOID, period_ms=20,
+                 min_step=1, lookahead=LOOKAHEAD):
+        self.profile = MotionProfile(v_max, a_max, pos_min, pos_max, kind)
+        self.period_ms = period_ms
+        self.min_step = min_step     # 驱动器预测位置与规划偏差不足该脉冲数时不下发
+        self.lookahead = lookahead   # 设定点取几个调用间隔之后的规划位置
+        self.t0 = 0
+        self.pos = float(start)
+        self.vel = 0.0
+        self.last_sent = int(start)
+        self.last_emit = 0
+        self.last_check = 0
+        self.emit_pos = float(start)  # 最近一次下发时的规划位置 (驱动器从此处匀速走向 last_sent)
+        self.seg_speed = 0.0        # 最近一个设定点的段速度 (脉冲/秒)
+        self.profile.plan(start, start)
+
+    def set_speed_limit(self, v_max):
+        """修改最高速度 (下次 set_goal 生效)"""
+        self.profile.v_max = float(v_max)
+
+    def set_goal(self, goal, now_ms):
+        if goal == self.profile.goal:
+            return
+        self._advance(now_ms)
+        self.profile.plan(self.pos, goal, self.vel)
+        self.t0 = now_ms
+
+    def _advance(self, now_ms):
+        t = _ticks_diff(now_ms, self.t0) / 1000.0
+        self.pos, self.vel = self.profile.sample(t)
+
+    def drive_pos(self, now_ms):
+        """按最近一条 0xFD (匀速 seg_speed 走向 last_sent) 预测驱动器在 now_ms 的位置"""
+        d = self.seg_speed * _ticks_diff(now_ms, self.last_emit) / 1000.0
+        if self.last_sent >= self.emit_pos:
+            return min(self.last_sent, self.emit_pos + d)
+        return max(self.last_sent, self.emit_pos - d)
+
+    def update(self, now_ms):
+        """
+        到达检查周期且需要新设定点时返回整数位置，否则返回 None
+        调用间隔按实际间隔估计 (每帧调用时即为帧间隔，而不是 period_ms)，空闲后按一个周期估计；
+        预测驱动器到下一次调用时的位置，与规划位置偏差不足 min_step 就不下发 (匀速段可连续多帧不发)
+        需要下发时，设定点取 lookahead 个间隔之后的规划位置，seg_speed 为恰好在该时刻走到的速度，
+        驱动器匀速跟随，中途不会提前到位停住
+        """
+        gap = _ticks_diff(now_ms, self.last_check)
+        if gap < self.period_ms:
+            return None
+        self.last_check = now_ms
+        if gap > 3 * self.period_ms:
+            gap = self.period_ms
+        self._advance(now_ms)
+        t = _ticks_diff(now_ms, self.t0) / 1000.0
+        nxt, _ = self.profile.sample(t + gap / 1000.0)
+        if abs(nxt - self.drive_pos(now_ms + gap)) < self.min_step:
+            return None
+        # 规划在前瞻时间内结束时，按剩余时间走到终点
+        horizon = min(gap * self.lookahead / 1000.0, self.profile.duration - t)
+        horizon = max(horizon, gap / 1000.0)
+        ahead, _ = self.profile.sample(t + horizon)
+        target = int(round(ahead))
+        if target == self.last_sent:
+            return None
+        self.seg_speed = max(1.0, abs(target - self.pos)) / horizon
+        self.emit_pos = self.pos
+        self.last_emit = now_ms
+        self.last_sent = target
+        return target
+
+    def reset(self, pos):
+        """外部强制定位后同步规划状态 (如回零)"""
+        self.pos = float(pos)
+        self.vel = 0.0
+        self.last_sent = int(pos)
+        self.emit_pos = float(pos)
+        self.seg_speed = 0.0
+        self.profile.plan(pos, pos)
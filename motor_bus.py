@@ -0,0 +1,163 @@
+'''
+Emm/X42S 单串口多地址总线驱动
+多台驱动器的 RX 并联在同一 TX 上，按地址区分；本模块在串口之上提供:
+- 发送队列: 按 FIFO 顺序下发，队满丢弃最旧的非广播帧
+- 合并: 同一 (地址, 功能码) 的帧尚在队列中时，新帧原位替换旧帧 (只发最新设定点)
+- 帧间隔: 上一帧线上传输时间 + gap_us 后才发下一帧，避免驱动器收帧粘连
+- 按地址限速: 同一地址两帧之间至少间隔 min_interval_ms，其他地址的帧可先行
+  (广播帧与同步触发不参与越序，保证暂存指令先于触发到达)
+
+MotorBus 提供 write / any / read，可直接替换原来的 UART 对象传给 move_motor、
+StatusPoller、SyncMotion 等；主循环每帧调用 pump()，阻塞初始化阶段调用 flush()
+'''
+
+import time
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+    _ticks_add = time.ticks_add
+    _sleep_us = time.sleep_us
+except AttributeError:
+    def _ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+    def _ticks_add(a, b):
+        return a + b
+
+    def _sleep_us(us):
+        time.sleep(us / 1000000)
+
+BROADCAST = 0x00
+
+
+class MotorBus:
+    def __init__(self, uart, baudrate=115200, gap_us=500, min_interval_ms=0, depth=16,
+                 max_block_us=3000):
+        self.uart = uart
+        self.us_per_byte = 10 * 1000000 // baudrate      # 8N1 每字节 10 bit
+        self.gap_us = gap_us
+        self.default_interval_us = min_interval_ms * 1000
+        self.interval_us = {}
+        self.depth = depth
+        self.max_block_us = max_block_us
+        self.queue = []             # [(地址, 功能码, 帧), ...]
+        self.last_tx = {}           # 地址 → 上次发送时刻 us
+        self.busy_until = None      # 总线空闲时刻 us
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def set_rate(self, addr, min_interval_ms):
+        """单独设置某地址的最小发送间隔"""
+        self.interval_us[addr] = min_interval_ms * 1000
+
+    # ---------------- UART 兼容接口 ----------------
+    def write(self, data):
+        frame = bytes(data)
+        if len(frame) < 2:
+            return 0
+        addr = frame[0]
+        code = frame[1]
+        if addr != BROADCAST:
+            # 只与最后一个广播帧之后的帧合并，不把新帧提前到触发帧之前
+            for i in range(len(self.queue) - 1, -1, -1):
+                q = self.queue[i]
+                if q[0] == BROADCAST:
+                    break
+                if q[0] == addr and q[1] == code:
+                    self.queue[i] = (addr, code, frame)
+                    self.coalesced += 1
+                    self.pump()
+                    return len(frame)
+        if len(self.queue) >= self.depth:
+            self._drop_oldest()
+        self.queue.append((addr, code, frame))
+        if len(self.queue) > self.max_depth:
+            self.max_depth = len(self.queue)
+        self.pump()
+        return len(frame)
+
+    def any(self):
+        return self.uart.any()
+
+    def read(self, *args):
+        return self.uart.read(*args)
+
+    # ---------------- 调度 ----------------
+    def _drop_oldest(self):
+        for i in range(len(self.queue)):
+            if self.queue[i][0] != BROADCAST:
+                del self.queue[i]
+                self.dropped += 1
+                return
+        del self.queue[0]
+        self.dropped += 1
+
+    def _ready(self, addr, now):
+        last = self.last_tx.get(addr)
+        if last is None:
+            return True
+        return _ticks_diff(now, last) >= self.interval_us.get(addr, self.default_interval_us)
+
+    def _pick(self, now):
+        """选出下一帧的队列下标；没有可发的帧返回 -1"""
+        for i in range(len(self.queue)):
+            addr = self.queue[i][0]
+            if addr == BROADCAST:
+                # 广播帧不越序，也不让后面的帧越过它
+                return i if i == 0 else -1
+            if self._ready(addr, now):
+                return i
+        return -1
+
+    def pump(self, max_block_us=None):
+        """
+        发送可发的帧；总线忙时最多等待 max_block_us (默认构造参数) 再返回
+        返回本次发送的帧数
+        """
+        if max_block_us is None:
+            max_block_us = self.max_block_us
+        start = _ticks_us()
+        sent = 0
+        while self.queue:
+            now = _ticks_us()
+            if self.busy_until is not None:
+                wait = _ticks_diff(self.busy_until, now)
+                if wait > 0:
+                    if _ticks_diff(now, start) + wait > max_block_us:
+                        break
+                    _sleep_us(wait)
+                    now = _ticks_us()
+            i = self._pick(now)
+            if i < 0:
+                break
+            addr, code, frame = self.queue.pop(i)
+            self.uart.write(frame)
+            self.last_tx[addr] = now
+            self.busy_until = _ticks_add(now, len(frame) * self.us_per_byte + self.gap_us)
+            self.sent += 1
+            sent += 1
+        return sent
+
+    def flush(self, timeout_ms=500):
+        """阻塞直到队列发完 (初始化/退出等非实时阶段使用)"""
+        start = _ticks_us()
+        while self.queue:
+            if not self.pump(timeout_ms * 1000):
+                if _ticks_diff(_ticks_us(), start) > timeout_ms * 1000:
+                    break
+                _sleep_us(200)
+
+    def stats(self):
+        return {
+            'queued': len(self.queue),
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+        }
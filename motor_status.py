@@ -0,0 +1,197 @@
+'''
+Emm/X42S 电机状态异步回读
+- 每个串口同一时刻只挂起一条查询，按 (地址, 功能码) 匹配应答，超时计数后放弃
+- poll() 不阻塞：只读取串口已到达的字节，到周期才发下一条查询 (低占空比)
+- 解析时跳过位置/速度指令的 4 字节应答 (addr code 02/E2/EE 6B)，与运动指令共用串口
+
+读取指令 (校验字节 0x6B):
+    0x36 实时位置  应答 addr 36 符号 位置(4B) 6B    位置单位: 65536 = 一圈
+    0x35 实时转速  应答 addr 35 符号 转速(2B) 6B    单位 RPM
+    0x3A 状态标志  应答 addr 3A 标志 6B             bit0 使能 bit1 到位 bit2 堵转 bit3 堵转保护
+'''
+
+import time
+
+try:
+    _ticks_ms = time.ticks_ms
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+READ_SPEED = 0x35
+READ_POS = 0x36
+READ_STATUS = 0x3A
+
+CHECKSUM = 0x6B
+POS_PER_REV = 65536
+
+# 读取应答帧长
+REPLY_LEN = {READ_SPEED: 6, READ_POS: 8, READ_STATUS: 4}
+
+FLAG_ENABLED = 0x01
+FLAG_IN_POSITION = 0x02
+FLAG_STALL = 0x04
+FLAG_STALL_PROTECT = 0x08
+
+
+class MotorStatus:
+    """单个电机最近一次回读的状态，stamp 为 0 表示尚未收到"""
+    __slots__ = ('position', 'speed', 'flags', 'pos_stamp', 'speed_stamp', 'flags_stamp')
+
+    def __init__(self):
+        self.position = 0       # 脉冲
+        self.speed = 0          # RPM，带符号
+        self.flags = 0
+        self.pos_stamp = 0
+        self.speed_stamp = 0
+        self.flags_stamp = 0
+
+    def stalled(self):
+        return bool(self.flags & (FLAG_STALL | FLAG_STALL_PROTECT))
+
+
+class StatusPoller:
+    """
+    单串口状态轮询器
+    addrs: 该串口上的电机地址；items: 轮询的读取指令 (按顺序轮转)
+    """
+
+    def __init__(self, uart, addrs, items=(READ_POS,), period_ms=100, timeout_ms=30,
+                 pulse_per_rev=3200):
+        self.uart = uart
+        self.queries = [(a, code) for a in addrs for code in items]
+        self.status = {}
+        for a in addrs:
+            self.status[a] = MotorStatus()
+        self.period_ms = period_ms
+        self.timeout_ms = timeout_ms
+        self.pulse_per_rev = pulse_per_rev
+        self.buf = bytearray()
+        self.pending = None     # (地址, 功能码, 发出时间)
+        self.next_index = 0
+        self.last_send = None
+        self.replies = 0
+        self.timeouts = 0
+
+    def poll(self, now=None):
+        """主循环每帧调用一次；返回本次解析到的应答数"""
+        if now is None:
+            now = _ticks_ms()
+        got = 0
+        if self.uart.any():
+            data = self.uart.read()
+            if data:
+                self.buf.extend(data)
+                got = self._parse(now)
+
+        if self.pending is not None:
+            if _ticks_diff(now, self.pending[2]) < self.timeout_ms:
+                return got
+            self.pending = None
+            self.timeouts += 1
+
+        # 一轮查询的间隔平摊到每条查询上，保持总占空比固定
+        if self.queries and (self.last_send is None or
+                             _ticks_diff(now, self.last_send) >= self.period_ms // len(self.queries)):
+            addr, code = self.queries[self.next_index]
+            self.next_index = (self.next_index + 1) % len(self.queries)
+            self.uart.write(bytes((addr, code, CHECKSUM)))
+            self.pending = (addr, code, now)
+            self.last_send = now
+        return got
+
+    def _parse(self, now):
+        buf = self.buf
+        got = 0
+        while len(buf) >= 4:
+            addr = buf[0]
+            code = buf[1]
+            n = REPLY_LEN.get(code)
+            if n and addr in self.status:
+                if len(buf) < n:
+                    break
+                if buf[n - 1] == CHECKSUM:
+                    self._apply(addr, code, buf, now)
+                    if self.pending is not None and self.pending[0] == addr and self.pending[1] == code:
+                        self.pending = None
+                    self.replies += 1
+                    got += 1
+                    del buf[:n]
+                    continue
+            if buf[3] == CHECKSUM:
+                # 运动指令应答 / 错误应答
+                del buf[:4]
+                continue
+            del buf[:1]
+        return got
+
+    def _apply(self, addr, code, buf, now):
+        st = self.status[addr]
+        sign = -1 if buf[2] else 1
+        if code == READ_POS:
+            raw = (buf[3] << 24) | (buf[4] << 16) | (buf[5] << 8) | buf[6]
+            st.position = sign * (raw * self.pulse_per_rev // POS_PER_REV)
+            st.pos_stamp = now or 1
+        elif code == READ_SPEED:
+            st.speed = sign * ((buf[3] << 8) | buf[4])
+            st.speed_stamp = now or 1
+        else:
+            st.flags = buf[2]
+            st.flags_stamp = now or 1
+
+    def position(self, addr, max_age_ms=None, now=None):
+        """最近一次回读的位置 (脉冲)；没有或过期时返回 None"""
+        st = self.status[addr]
+        if not st.pos_stamp:
+            return None
+        if max_age_ms is not None:
+            if now is None:
+                now = _ticks_ms()
+            if _ticks_diff(now, st.pos_stamp) > max_age_ms:
+                return None
+        return st.position
+
+
+class PositionTracker:
+    """
+    指令位置与实际位置对账：最后一次指令下发后超过 settle_ms，
+    连续 confirm 次回读都偏离超过 tolerance 脉冲 (丢步/堵转/指令丢失)，
+    则认为实际位置为准，返回需要回写的位置
+    """
+    __slots__ = ('tolerance', 'settle_ms', 'confirm', 'commanded', 'cmd_stamp', 'count', 'last_stamp')
+
+    def __init__(self, tolerance=40, settle_ms=300, confirm=3):
+        self.tolerance = tolerance
+        self.settle_ms = settle_ms
+        self.confirm = confirm
+        self.commanded = 0
+        self.cmd_stamp = 0
+        self.count = 0
+        self.last_stamp = 0
+
+    def commanded_to(self, target, now):
+        self.commanded = target
+        self.cmd_stamp = now
+        self.count = 0
+
+    def check(self, status, now):
+        """有新回读时比较；需要对账时返回实际位置，否则返回 None"""
+        if status.pos_stamp == self.last_stamp:
+            return None
+        self.last_stamp = status.pos_stamp
+        # 回读的采样时刻必须晚于指令到位时间
+        if _ticks_diff(status.pos_stamp, self.cmd_stamp) < self.settle_ms:
+            return None
+        if abs(status.position - self.commanded) <= self.tolerance and not status.stalled():
+            self.count = 0
+            return None
+        self.count += 1
+        if self.count < self.confirm:
+            return None
+        self.count = 0
+        self.commanded = status.position
+        return status.position
@@ -0,0 +1,184 @@
+'''
+Emm/X42S 多轴同步运动
+各轴指令带同步标志 (snF=1) 先下发缓存，驱动器收到后不立即执行，
+再由广播地址 0x00 的同步触发帧 (00 FF 66 6B) 让所有轴同一时刻启动，
+消除两轴分别下发带来的启动时差，斜线运动保持直线
+
+    sync = SyncMotion()
+    sync.move_linear([(uart_lr, 0x02, pan_from, 0), (uart_ud, 0x01, tilt_from, 800)], 350, 5)
+    sync.trigger()
+'''
+
+import math
+
+CHECKSUM = 0x6B
+BROADCAST = 0x00
+SYNC_TRIGGER = bytes((BROADCAST, 0xFF, 0x66, CHECKSUM))
+
+
+def pos_cmd(addr, pulses, rpm, acc, absolute=True, sync=False):
+    """0xFD 位置模式: addr FD 方向 速度(2B) 加速度 脉冲(4B) 相对/绝对 同步 6B"""
+    direction = 0x00
+    if pulses < 0:
+        direction = 0x01
+        pulses = -pulses
+    rpm = int(rpm)
+    return bytes((
+        addr, 0xFD, direction,
+        (rpm >> 8) & 0xFF, rpm & 0xFF,
+        acc & 0xFF,
+        (pulses >> 24) & 0xFF, (pulses >> 16) & 0xFF, (pulses >> 8) & 0xFF, pulses & 0xFF,
+        0x01 if absolute else 0x00,
+        0x01 if sync else 0x00,
+        CHECKSUM
+    ))
+
+
+def vel_cmd(addr, rpm, acc, sync=False):
+    """0xF6 速度模式: addr F6 方向 速度(2B) 加速度 同步 6B"""
+    direction = 0x00
+    if rpm < 0:
+        direction = 0x01
+        rpm = -rpm
+    rpm = int(rpm)
+    return bytes((addr, 0xF6, direction, (rpm >> 8) & 0xFF, rpm & 0xFF, acc & 0xFF,
+                  0x01 if sync else 0x00, CHECKSUM))
+
+
+def stop_cmd(addr, sync=False):
+    """0xFE 立即停止: addr FE 98 同步 6B"""
+    return bytes((addr, 0xFE, 0x98, 0x01 if sync else 0x00, CHECKSUM))
+
+
+def acc_rpm_per_s(acc):
+    """Emm 加速度档位 → RPM/s (0 表示不加减速)"""
+    if acc <= 0:
+        return 0.0
+    return 1.0 / ((256 - acc) * 50e-6)
+
+
+def move_time(rev, rpm, acc):
+    """梯形速度曲线走完 rev 圈所需秒数"""
+    v = rpm / 60.0
+    a = acc_rpm_per_s(acc) / 60.0
+    if v <= 0:
+        return 0.0
+    if a <= 0:
+        return rev / v
+    if rev >= v * v / a:
+        return rev / v + v / a
+    return 2 * math.sqrt(rev / a)
+
+
+def rpm_for_time(rev, t, acc):
+    """
+    给定加速度，求 t 秒内恰好走完 rev 圈 (梯形) 的转速
+    T = d / v + v / a  →  v = (aT - sqrt(a²T² - 4ad)) / 2；无解时返回 None
+    """
+    if t <= 0:
+        return None
+    a = acc_rpm_per_s(acc) / 60.0
+    if a <= 0:
+        return rev / t * 60.0
+    disc = a * a * t * t - 4 * a * rev
+    if disc < 0:
+        return None
+    return (a * t - math.sqrt(disc)) / 2 * 60.0
+
+
+def scale_acc(acc, ratio):
+    """
+    Emm 加速度档位按比例缩放 (ratio <= 1)
+    档位 acc 表示每 (256 - acc) * 50us 增加 1 RPM，加速度与 (256 - acc) 成反比
+    """
+    if acc <= 0 or ratio >= 1:
+        return acc
+    if ratio <= 0:
+        return 1
+    a = int(256 - (256 - acc) / ratio + 0.5)
+    return max(1, a)
+
+
+class SyncMotion:
+    """
+    同步运动暂存区：stage 暂存带同步标志的指令，trigger 写出并广播触发
+    两轴分布在不同串口时，各口的指令先写完，再背靠背写各口的触发帧；
+    逐帧写出，便于 MotorBus 等按帧排队的发送层识别地址
+    """
+
+    def __init__(self, pulse_per_rev=3200):
+        self.pulse_per_rev = pulse_per_rev
+        self.staged = []        # [(uart, 帧), ...]，保持暂存顺序
+        self.triggers = 0
+
+    def stage(self, uart, frame):
+        self.staged.append((uart, frame))
+
+    def move_abs(self, uart, addr, pulses, rpm, acc):
+        self.stage(uart, pos_cmd(addr, pulses, rpm, acc, True, True))
+
+    def velocity(self, uart, addr, rpm, acc):
+        if rpm == 0:
+            self.stage(uart, stop_cmd(addr, True))
+        else:
+            self.stage(uart, vel_cmd(addr, rpm, acc, True))
+
+    def move_linear(self, moves, rpm, acc):
+        """
+        moves: [(uart, addr, 起点脉冲, 终点脉冲), ...]
+        行程最长的轴用 rpm/acc，其余轴按行程比例降低速度与加速度 (速度曲线同形，轨迹为直线)；
+        加速度档位已到下限无法再按比例降低时，改为解出同时到达所需的转速
+        行程为 0 的轴按原 rpm/acc 照常暂存 (原地保持，随触发一起生效)
+        """
+        longest = 0
+        for m in moves:
+            longest = max(longest, abs(m[3] - m[2]))
+        total = move_time(longest / self.pulse_per_rev, rpm, acc)
+        for uart, addr, start, end in moves:
+            dist = abs(end - start)
+            if dist == 0:
+                self.move_abs(uart, addr, end, rpm, acc)
+                continue
+            ratio = dist / longest
+            a = scale_acc(acc, ratio)
+            v = rpm * ratio
+            if ratio < 1 and acc > 0 and 256 - (256 - acc) / ratio < 1:
+                v = rpm_for_time(dist / self.pulse_per_rev, total, a) or v
+            self.move_abs(uart, addr, end, max(1, int(v + 0.5)), a)
+
+    def trigger(self):
+        """写出全部暂存指令并发送同步触发，返回涉及的串口数"""
+        if not self.staged:
+            return 0
+        uarts = []
+        for uart, frame in self.staged:
+            if uart not in uarts:
+                uarts.append(uart)
+            uart.write(frame)
+        self.staged = []
+        for uart in uarts:
+            uart.write(SYNC_TRIGGER)
+        self.triggers += 1
+        return len(uarts)
+
+    def clear(self):
+        self.staged = []
+
+
+if __name__ == '__main__':
+    # 自检: 含零行程轴的直线插补 (退出复位时某轴已在目标位置)
+    class _Uart:
+        def __init__(self):
+            self.frames = []
+
+        def write(self, data):
+            self.frames.append(bytes(data))
+
+    u1, u2 = _Uart(), _Uart()
+    sync = SyncMotion()
+    sync.move_linear([(u1, 1, 0, 1600), (u2, 2, 500, 500)], 300, 200)
+    assert sync.trigger() == 2
+    assert len(u1.frames) == 2 and len(u2.frames) == 2
+    sync.move_linear([(u1, 1, 800, 800), (u2, 2, 500, 500)], 300, 200)
+    assert len(sync.staged) == 2
+    print("motor_sync 自检通过")
@@ -12,6 +12,10 @@ import os
 import sys
 import glob
 
+from zp25s_bus import (ascii_group, ascii_cmd, reply_window, discover_ids, FrameParser,
+                       SCAN_CHUNK, BUS_MAP_FILE)
+from zp25s_trajectory import Trajectory, TrajectoryPlayer
+
 class ZP25SController:
     """ZP25S总线舵机控制器 - 基于ASCII指令协议"""
     
@@ -77,9 +81,9 @@ class ZP25SController:
                 self.ser.write(full_cmd.encode('ascii'))
                 
                 if read_response:
-                    time.sleep(0.1)
-                    if self.ser.in_waiting > 0:
-                        response = self.ser.read(self.ser.in_waiting)
+                    # 只等指令与应答在线上传输所需的时间，收到 '!' 立即返回
+                    response = self._read_reply(len(full_cmd))
+                    if response:
                         try:
                             resp_str = response.decode('ascii').strip()
                             if self.debug:
@@ -90,7 +94,6 @@ class ZP25SController:
                                 print(f"[响应] {response}")
                             return response
                 else:
-                    time.sleep(0.05)
                     return True
             else:
                 print("串口未打开")
@@ -100,6 +103,20 @@ class ZP25SController:
             print(f"发送命令失败: {e}")
             return False
     
+    def _read_reply(self, sent_bytes):
+        """读取一帧 '#...!' 应答，超时按线上传输时间计算"""
+        deadline = time.monotonic() + reply_window(sent_bytes, 1, self.baudrate)
+        data = b''
+        while time.monotonic() < deadline:
+            n = self.ser.in_waiting
+            if n:
+                data += self.ser.read(n)
+                if data.rstrip().endswith(b'!'):
+                    break
+            else:
+                time.sleep(0.0005)
+        return data
+    
     def set_servo_angle(self, servo_id, angle, time_ms=1000):
         """
         设置舵机到指定角度
@@ -201,48 +218,99 @@ class ZP25SController:
     def batch_set_angles(self, angles_dict, time_ms=1000):
         """
         批量设置多个舵机的角度
+        使用组指令 {#000P...!#001P...!} 一次下发，所有舵机同时启动
         
         Args:
             angles_dict: 字典 {舵机ID: 角度}
             time_ms: 运动时间 (毫秒)
         """
-        for servo_id, angle in angles_dict.items():
-            self.set_servo_angle(servo_id, angle, time_ms)
-            time.sleep(0.05)
+        if not self.ser or not self.ser.is_open:
+            print("串口未打开")
+            return False
+        cmd = ascii_group(angles_dict, time_ms)
+        if self.debug:
+            print(f"[组指令] {cmd.decode('ascii')}")
+        self.ser.write(cmd)
+        return True
+    
+    def set_angles(self, angles_dict, time_ms):
+        """组指令下发，不打印 (轨迹播放等高频调用)，返回写入字节数"""
+        return self.ser.write(ascii_group(angles_dict, time_ms))
     
-    def scan_servos(self, id_range=range(0, 10)):
+    def play_trajectory(self, keyframes, rate_hz=50, smooth=True):
+        """
+        播放多舵机关键帧轨迹
+        按 rate_hz 重采样，每周期一条组指令，按单调时钟定时下发
+        
+        Args:
+            keyframes: {舵机ID: [(时间ms, 角度), ...]}
+            rate_hz: 总线更新率
+            smooth: 关键帧间余弦缓动
+            
+        Returns:
+            播放统计 (帧数、迟到帧、跳过帧、最大迟到 ms)
+        """
+        stats = TrajectoryPlayer(self, rate_hz).play(Trajectory(keyframes, smooth))
+        if self.debug:
+            print(f"[轨迹] {stats}")
+        return stats
+    
+    def _probe_ids(self, ids):
+        """
+        一组 PID 查询背靠背发出，在应答时间窗内统一收包
+        返回 (应答的 ID 集合, 是否出现乱码帧)
+        """
+        self.ser.reset_input_buffer()
+        cmd = b''.join(ascii_cmd(sid, "PID") for sid in ids)
+        self.ser.write(cmd)
+        deadline = time.monotonic() + reply_window(len(cmd), len(ids), self.baudrate)
+        parser = FrameParser()
+        pending = set(ids)
+        answered = set()
+        while pending and time.monotonic() < deadline:
+            n = self.ser.in_waiting
+            if not n:
+                time.sleep(0.0005)
+                continue
+            for frame in parser.feed(self.ser.read(n)):
+                if frame[1] in pending:
+                    pending.discard(frame[1])
+                    answered.add(frame[1])
+        return answered, parser.bad > 0
+
+    def scan_servos(self, id_range=range(0, 255), chunk=SCAN_CHUNK, cache_path=BUS_MAP_FILE,
+                    rescan=False):
         """
         扫描舵机ID
+        查询按组背靠背发出，只等应答时间窗；结果缓存到 cache_path，
+        下次启动先批量确认缓存中的 ID，全部在线则跳过全量扫描
         
         Args:
             id_range: 要扫描的ID范围
+            chunk: 每组同时在途的查询数
+            cache_path: 舵机表缓存文件 (None 不缓存)
+            rescan: 忽略缓存强制扫描
             
         Returns:
             找到的舵机ID列表
         """
         print("\n[扫描] 正在扫描舵机ID...")
-        found_ids = []
-        
-        for servo_id in id_range:
-            try:
-                # 先清空缓冲区
-                self.ser.reset_input_buffer()
-                time.sleep(0.02)
-                
-                # 发送读取ID命令: #IDPID!
-                response = self.get_servo_id(servo_id)
-                
-                if response:
-                    found_ids.append(servo_id)
-                    print(f"  ✓ 找到舵机 ID: {servo_id:03d}")
-                
-            except Exception as e:
-                pass
+        t0 = time.monotonic()
+        try:
+            # 分组探测、碰撞重查、缓存确认与 ZP25SBus 共用同一实现，这里只提供串口收发
+            found_ids = discover_ids(self._probe_ids, self.port, self.baudrate, ids=id_range,
+                                     cache_path=cache_path, chunk=chunk, rescan=rescan)
+        except Exception as e:
+            print(f"  ✗ 扫描失败: {e}")
+            found_ids = []
+        for servo_id in found_ids:
+            print(f"  ✓ 找到舵机 ID: {servo_id:03d}")
         
+        elapsed = (time.monotonic() - t0) * 1000
         if found_ids:
-            print(f"[完成] 共找到 {len(found_ids)} 个舵机: {found_ids}\n")
+            print(f"[完成] 共找到 {len(found_ids)} 个舵机: {found_ids} ({elapsed:.0f} ms)\n")
         else:
-            print("[警告] 未找到任何舵机\n")
+            print(f"[警告] 未找到任何舵机 ({elapsed:.0f} ms)\n")
         
         return found_ids
 
@@ -301,8 +369,8 @@ def main(port=None):
         print("="*50 + "\n")
         
         # 扫描舵机
-        print("阶段1: 扫描舵机ID (0-15)...")
-        found_ids = controller.scan_servos(id_range=range(0, 16))
+        print("阶段1: 扫描舵机ID (0-254)...")
+        found_ids = controller.scan_servos(id_range=range(0, 255))
         
         if not found_ids:
             print("\n警告：未找到舵机！")
@@ -70,3 +70,363 @@ class PID:
     @property
     def components(self):
         return (self._proportional, self._integral, self._derivative)
+
+
+# ==================== 统一PID引擎 ====================
+# gimbal_track / redtest 共用的单轴PID，浮点与定点(Q格式)两种实现，算法完全一致
+# (change1/2/3 等独立演示脚本仍用各自的控制器: 对误差微分、积分限幅、死区、
+#  按实际时间差计算，语义不同，未迁移):
+#   P: 设定值加权   P = Kp * (b * setpoint - measurement)
+#   I: 条件积分抗饱和 (输出饱和且误差继续推向饱和方向时冻结积分)
+#   D: 对测量值微分 + 一阶低通滤波，避免设定值阶跃引起微分冲击
+#   FF: 外部前馈量直接叠加到输出
+# 控制周期 dt 固定，增益在 set_gains/set_dt 时预先折算，
+# update 每次只做少量乘加，不创建列表/元组等临时对象
+#
+# 图像跟踪时误差本身就是测量量，用 update_error(err)，等价于设定值 0、测量值 -err
+
+class PIDAxis:
+    """单轴PID (浮点实现)"""
+    __slots__ = ('kp', 'ki', 'kd', 'dt', 'b', 'd_alpha', 'out_min', 'out_max',
+                 '_ki_dt', '_kd_dt', 'integral', 'd_term', 'last_meas', 'output')
+
+    def __init__(self, kp, ki=0.0, kd=0.0, dt=1.0, out_min=-1e9, out_max=1e9,
+                 setpoint_weight=1.0, d_filter=0.0):
+        """
+        dt: 控制周期 (秒)；传 1 时 ki/kd 按"每次调用"计
+        setpoint_weight: 设定值加权系数 b (0~1)，越小设定值阶跃时超调越小
+        d_filter: 微分低通系数 (0 = 不滤波，越接近 1 越平滑)
+        """
+        self.b = setpoint_weight
+        self.d_alpha = d_filter
+        self.out_min = out_min
+        self.out_max = out_max
+        self.dt = dt
+        self.set_gains(kp, ki, kd)
+        self.reset()
+
+    def set_gains(self, kp, ki, kd):
+        """修改增益 (可在运行中热更新)"""
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.set_dt(self.dt)
+
+    def set_dt(self, dt):
+        """修改控制周期，重新折算积分/微分系数"""
+        self.dt = dt
+        self._ki_dt = self.ki * dt
+        self._kd_dt = (1.0 - self.d_alpha) * self.kd / dt
+
+    def reset(self, measurement=0.0):
+        self.integral = 0.0
+        self.d_term = 0.0
+        self.last_meas = measurement
+        self.output = 0.0
+
+    def update(self, setpoint, measurement, ff=0.0):
+        error = setpoint - measurement
+        p = self.kp * (self.b * setpoint - measurement)
+        d = self.d_alpha * self.d_term - self._kd_dt * (measurement - self.last_meas)
+        self.d_term = d
+        self.last_meas = measurement
+
+        i = self.integral + self._ki_dt * error
+        out = p + i + d + ff
+        if out > self.out_max:
+            out = self.out_max
+            if error < 0:
+                self.integral = i
+        elif out < self.out_min:
+            out = self.out_min
+            if error > 0:
+                self.integral = i
+        else:
+            self.integral = i
+
+        self.output = out
+        return out
+
+    def update_error(self, error, ff=0.0):
+        return self.update(0.0, -error, ff)
+
+
+# 定点小数位数。MicroPython 小整数上限 2^30，超出时自动升级为大整数
+# (结果仍然精确，只是每次运算要堆分配)。12 位小数下:
+# - P/I/输出: 增益*误差 在 ±2^17 内时 Q12 值 < 2^29，不会升级
+# - D 低通: _alpha(Q12) * d_term(Q12) 是两个 Q12 相乘，|D 项| 超过 64 / d_filter
+#   (输出单位，d_filter=0.5 时为 128) 时该乘积会升级为大整数；d_filter=0 时恒为 0
+Q_BITS = 12
+Q_ONE = 1 << Q_BITS
+Q_HALF = 1 << (Q_BITS - 1)
+# 积分增量额外保留的小数位: ki*dt 常远小于 1 LSB(Q12)，按 Q(12+8) 计算增量，
+# 不足 Q12 的部分留在余数里逐步累加，而不是每步舍入掉
+I_BITS = 8
+I_MASK = (1 << I_BITS) - 1
+
+
+def to_q(x):
+    """浮点数转为 Q 格式整数"""
+    return int(round(x * Q_ONE))
+
+
+class PIDAxisQ:
+    """单轴PID (Q格式定点实现)，输入输出均为整数 (像素/脉冲)"""
+    __slots__ = ('kp', 'ki', 'kd', 'dt', 'b', 'd_alpha', 'out_min', 'out_max',
+                 '_kp', '_b', '_alpha', '_ki_dt', '_kd_dt', '_out_min', '_out_max',
+                 'integral', '_i_rem', 'd_term', 'last_meas', 'output')
+
+    def __init__(self, kp, ki=0.0, kd=0.0, dt=1.0, out_min=-100000, out_max=100000,
+                 setpoint_weight=1.0, d_filter=0.0):
+        """参数含义同 PIDAxis，增益用浮点给出，内部转为 Q 格式"""
+        self.b = setpoint_weight
+        self.d_alpha = d_filter
+        self._b = to_q(setpoint_weight)
+        self._alpha = to_q(d_filter)
+        self.out_min = out_min
+        self.out_max = out_max
+        self._out_min = out_min << Q_BITS
+        self._out_max = out_max << Q_BITS
+        self.dt = dt
+        self.set_gains(kp, ki, kd)
+        self.reset()
+
+    def set_gains(self, kp, ki, kd):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self._kp = to_q(kp)
+        self.set_dt(self.dt)
+
+    def set_dt(self, dt):
+        self.dt = dt
+        self._ki_dt = int(round(self.ki * dt * (Q_ONE << I_BITS)))    # Q(12+I_BITS)
+        self._kd_dt = to_q((1.0 - self.d_alpha) * self.kd / dt)
+
+    def reset(self, measurement=0):
+        self.integral = 0          # Q 格式
+        self._i_rem = 0            # 积分不足 1 LSB 的余量 (I_BITS 位小数)
+        self.d_term = 0            # Q 格式
+        self.last_meas = measurement
+        self.output = 0
+
+    def update(self, setpoint, measurement, ff=0):
+        error = setpoint - measurement
+        p = self._kp * (((self._b * setpoint) >> Q_BITS) - measurement)
+        d = ((self._alpha * self.d_term) >> Q_BITS) - self._kd_dt * (measurement - self.last_meas)
+        self.d_term = d
+        self.last_meas = measurement
+
+        acc = self._i_rem + self._ki_dt * error
+        i = self.integral + (acc >> I_BITS)
+        out = p + i + d + (ff << Q_BITS)
+        if out > self._out_max:
+            out = self._out_max
+            if error < 0:
+                self.integral = i
+                self._i_rem = acc & I_MASK
+        elif out < self._out_min:
+            out = self._out_min
+            if error > 0:
+                self.integral = i
+                self._i_rem = acc & I_MASK
+        else:
+            self.integral = i
+            self._i_rem = acc & I_MASK
+
+        out = (out + Q_HALF) >> Q_BITS
+        self.output = out
+        return out
+
+    def update_error(self, error, ff=0):
+        return self.update(0, -error, ff)
+
+
+# ==================== 多轴PID ====================
+# N 个轴的增益与状态放在连续数组中，一次调用推进全部轴
+# 有 ulab (K230) / numpy (主机) 时整体向量运算，否则退回 array('f') 逐轴循环
+# 算法与 PIDAxis 完全相同
+
+from array import array
+
+try:
+    import ulab.numpy as _np
+except ImportError:
+    try:
+        import numpy as _np
+    except ImportError:
+        _np = None
+
+if _np is not None:
+    # ulab 只有 float；numpy 2.x 已移除 np.float 别名
+    _FLOAT = _np.float if hasattr(_np, 'float') else _np.float64
+
+
+def _per_axis(v, n):
+    """标量广播为 n 个轴的列表"""
+    if isinstance(v, (int, float)):
+        return [float(v)] * n
+    v = [float(x) for x in v]
+    if len(v) != n:
+        raise ValueError("参数个数 {} 与轴数 {} 不符".format(len(v), n))
+    return v
+
+
+class PIDBank:
+    """多轴PID (向量化)"""
+
+    def __init__(self, n, kp, ki=0.0, kd=0.0, dt=1.0, out_min=-1e9, out_max=1e9,
+                 setpoint_weight=1.0, d_filter=0.0, use_np=True):
+        """
+        n: 轴数
+        其余参数可为标量 (所有轴相同) 或长度为 n 的序列，含义同 PIDAxis
+        use_np: 有 ulab/numpy 时是否走向量运算
+        """
+        self.n = n
+        self.dt = dt
+        self.use_np = use_np and _np is not None
+        mk = self._vec
+
+        self.kp = mk(_per_axis(kp, n))
+        self.ki = mk(_per_axis(ki, n))
+        self.kd = mk(_per_axis(kd, n))
+        self.b = mk(_per_axis(setpoint_weight, n))
+        self.d_alpha = mk(_per_axis(d_filter, n))
+        self.out_min = mk(_per_axis(out_min, n))
+        self.out_max = mk(_per_axis(out_max, n))
+        self._ki_dt = mk([0.0] * n)
+        self._kd_dt = mk([0.0] * n)
+
+        self.integral = mk([0.0] * n)
+        self.d_term = mk([0.0] * n)
+        self.last_meas = mk([0.0] * n)
+        self.output = mk([0.0] * n)
+
+        # 输入缓冲区：传入普通列表/元组时拷贝到这里，避免每次新建数组
+        self._sp = mk([0.0] * n)
+        self._meas = mk([0.0] * n)
+        self._ff = mk([0.0] * n)
+
+        self.set_dt(dt)
+
+    def _vec(self, values):
+        if self.use_np:
+            return _np.array(values, dtype=_FLOAT)
+        return array('f', values)
+
+    def set_axis_gains(self, i, kp, ki, kd):
+        """修改第 i 轴增益"""
+        self.kp[i] = kp
+        self.ki[i] = ki
+        self.kd[i] = kd
+        self._ki_dt[i] = ki * self.dt
+        self._kd_dt[i] = (1.0 - self.d_alpha[i]) * kd / self.dt
+
+    def set_dt(self, dt):
+        self.dt = dt
+        for i in range(self.n):
+            self._ki_dt[i] = self.ki[i] * dt
+            self._kd_dt[i] = (1.0 - self.d_alpha[i]) * self.kd[i] / dt
+
+    def reset(self, i=None, measurement=0.0):
+        """重置全部轴 (i=None) 或第 i 轴"""
+        axes = range(self.n) if i is None else (i,)
+        for k in axes:
+            self.integral[k] = 0.0
+            self.d_term[k] = 0.0
+            self.last_meas[k] = measurement
+            self.output[k] = 0.0
+
+    def _load(self, buf, values):
+        if values is None:
+            for i in range(self.n):
+                buf[i] = 0.0
+            return buf
+        if self.use_np and isinstance(values, type(buf)):
+            return values
+        for i in range(self.n):
+            buf[i] = values[i]
+        return buf
+
+    def update(self, setpoints, measurements, ff=None):
+        """推进全部轴一步，返回输出数组 (内部缓冲区，下次调用会被覆盖)"""
+        sp = self._load(self._sp, setpoints)
+        meas = self._load(self._meas, measurements)
+        ffv = self._load(self._ff, ff)
+        if self.use_np:
+            return self._update_np(sp, meas, ffv)
+        return self._update_arr(sp, meas, ffv)
+
+    def update_error(self, errors, ff=None):
+        """误差即测量量的跟踪场景，等价于设定值 0、测量值 -err"""
+        meas = self._meas
+        for i in range(self.n):
+            meas[i] = -errors[i]
+        return self.update(None, meas, ff)
+
+    def _update_np(self, sp, meas, ff):
+        err = sp - meas
+        p = self.kp * (self.b * sp - meas)
+        d = self.d_alpha * self.d_term - self._kd_dt * (meas - self.last_meas)
+        i = self.integral + self._ki_dt * err
+        out = p + i + d + ff
+
+        hi = out > self.out_max
+        lo = out < self.out_min
+        # 条件积分：饱和且误差继续推向饱和方向时保持原积分
+        self.integral = _np.where(hi, _np.where(err < 0, i, self.integral),
+                                  _np.where(lo, _np.where(err > 0, i, self.integral), i))
+        self.d_term = d
+        self.last_meas[:] = meas
+        self.output = _np.clip(out, self.out_min, self.out_max)
+        return self.output
+
+    def _update_arr(self, sp, meas, ff):
+        kp = self.kp
+        b = self.b
+        alpha = self.d_alpha
+        kd_dt = self._kd_dt
+        ki_dt = self._ki_dt
+        integ = self.integral
+        d_term = self.d_term
+        last = self.last_meas
+        out_min = self.out_min
+        out_max = self.out_max
+        output = self.output
+        for k in range(self.n):
+            m = meas[k]
+            s = sp[k]
+            error = s - m
+            d = alpha[k] * d_term[k] - kd_dt[k] * (m - last[k])
+            d_term[k] = d
+            last[k] = m
+            i = integ[k] + ki_dt[k] * error
+            u = kp[k] * (b[k] * s - m) + i + d + ff[k]
+            if u > out_max[k]:
+                u = out_max[k]
+                if error < 0:
+                    integ[k] = i
+            elif u < out_min[k]:
+                u = out_min[k]
+                if error > 0:
+                    integ[k] = i
+            else:
+                integ[k] = i
+            output[k] = u
+        return output
+
+
+if __name__ == '__main__':
+    # 自检: 典型增益下定点实现与浮点实现的输出一致 (含小 ki*dt 的积分累加)
+    import math
+    for kp, ki, kd, dt in ((0.5, 0.02, 0.1, 0.02), (1.2, 0.5, 0.05, 0.033),
+                           (0.3, 0.005, 0.0, 1.0), (0.8, 0.1, 0.2, 0.01)):
+        f = PIDAxis(kp, ki, kd, dt, out_min=-800, out_max=800, d_filter=0.3)
+        q = PIDAxisQ(kp, ki, kd, dt, out_min=-800, out_max=800, d_filter=0.3)
+        worst = 0.0
+        for k in range(2000):
+            err = int(round(120 * math.sin(k * 0.01) + 15))
+            worst = max(worst, abs(q.update_error(err) - f.update_error(err)))
+        assert worst <= 1.0, (kp, ki, kd, dt, worst)
+        assert abs(q.integral / Q_ONE - f.integral) <= 1.0, (kp, ki, kd, dt)
+    print("pid 自检通过")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+云台 PID 离线自动整定 (主机端)
+在 gimbal_sim 单轴模型上并行搜索 KP/KD，以调节时间 + 超调量为代价函数，
+输出可直接 git apply 的 gimbal_track.py 参数补丁，或写入参数存储
+- gimbal_track 在 CONFIG_STORE=True 时用存储中的 GIMBAL_PID_PAN/TILT 覆盖 KP_*/KD_* 常量，
+  存储里已有该轴的键时，以存储中的增益作为当前值，并提示补丁会被覆盖
+- --store 把结果写入存储键 (版本号 +1)，运行中的云台热更新；保留键中已有的 ki
+
+用法:
+    python3 pid_tuner.py pan
+    python3 pid_tuner.py tilt --kp 0.2 1.2 11 --kd 0 0.6 7 --delay 60 -o tilt.patch
+    python3 pid_tuner.py pan --store                      # 写入默认存储文件
+    python3 pid_tuner.py pan --store k230_config.json     # 写入拷贝到主机的存储文件
+"""
+
+import argparse
+import difflib
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import config_store
+import gimbal_sim
+
+# 阶跃测试集 (像素)，正反向/大小步都要稳定
+STEPS_PX = (60, 150, -100, -220)
+DURATION_MS = 4000
+OVERSHOOT_WEIGHT = 2.0     # 超调量(相对阶跃幅度)在代价中的权重
+UNSETTLED_PENALTY = 1.0    # 未稳定时额外惩罚
+
+GAIN_NAMES = {
+    'pan': ('KP_PAN', 'KD_PAN'),
+    'tilt': ('KP_TILT', 'KD_TILT'),
+}
+# 参数存储中覆盖上述常量的键 (与 gimbal_track / debug_tool 一致)
+STORE_KEYS = {
+    'pan': 'GIMBAL_PID_PAN',
+    'tilt': 'GIMBAL_PID_TILT',
+}
+
+
+def linspace(lo, hi, n):
+    if n <= 1:
+        return [lo]
+    return [lo + (hi - lo) * i / (n - 1) for i in range(n)]
+
+
+def evaluate(job):
+    """单组增益的代价 (在子进程中运行)"""
+    params, kp, kd, sim_kw = job
+    p = dict(params)
+    p['kp'] = kp
+    p['kd'] = kd
+    cost = 0.0
+    worst = {'settling_ms': 0, 'overshoot_px': 0.0}
+    for step in STEPS_PX:
+        r = gimbal_sim.simulate_step(p, step_px=step, duration_ms=DURATION_MS, **sim_kw)
+        cost += r['settling_ms'] / DURATION_MS
+        cost += OVERSHOOT_WEIGHT * r['overshoot_px'] / abs(step)
+        if r['settling_ms'] >= DURATION_MS:
+            cost += UNSETTLED_PENALTY
+        worst['settling_ms'] = max(worst['settling_ms'], r['settling_ms'])
+        worst['overshoot_px'] = max(worst['overshoot_px'], r['overshoot_px'])
+    return cost / len(STEPS_PX), kp, kd, worst
+
+
+def make_patch(path, values):
+    """生成把 values 中常量写回源码的 unified diff，保留行尾注释"""
+    with open(path, encoding='utf-8') as f:
+        old = f.readlines()
+    new = []
+    for line in old:
+        for name, value in values.items():
+            m = re.match(r'^(%s\s*=\s*)([-+0-9.eE]+)(.*)$' % name, line.rstrip('\n'))
+            if m:
+                text = str(value)
+                rest = m.group(3)
+                # 保持行尾注释对齐
+                pad = len(rest) - len(rest.lstrip(' '))
+                if pad:
+                    rest = ' ' * max(1, pad + len(m.group(2)) - len(text)) + rest.lstrip(' ')
+                line = '{}{}{}\n'.format(m.group(1), text, rest)
+                break
+        new.append(line)
+    rel = os.path.basename(path)
+    return ''.join(difflib.unified_diff(old, new, 'a/' + rel, 'b/' + rel))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='云台 PID 离线整定')
+    ap.add_argument('axis', choices=sorted(GAIN_NAMES))
+    ap.add_argument('--kp', nargs=3, type=float, metavar=('MIN', 'MAX', 'N'), default=(0.05, 1.0, 20))
+    ap.add_argument('--kd', nargs=3, type=float, metavar=('MIN', 'MAX', 'N'), default=(0.0, 0.6, 13))
+    ap.add_argument('--delay', type=float, default=gimbal_sim.CAMERA_DELAY_MS, help='相机延迟 ms')
+    ap.add_argument('--frame', type=float, default=gimbal_sim.FRAME_MS, help='帧间隔 ms')
+    ap.add_argument('--ppp', type=float, default=gimbal_sim.PIXELS_PER_PULSE, help='像素/脉冲')
+    ap.add_argument('--servo', action='store_true', help='按舵机模型整定 (默认步进电机)')
+    ap.add_argument('--source', default=gimbal_sim.TRACK_SOURCE, help='读取常量并生成补丁的源文件')
+    ap.add_argument('-j', '--jobs', type=int, default=None, help='进程数 (默认 CPU 核数)')
+    ap.add_argument('-o', '--output', help='补丁输出文件 (默认打印到终端)')
+    ap.add_argument('--store', nargs='?', const=config_store.CONFIG_FILE, metavar='PATH',
+                    help='结果写入参数存储 (默认 %s) 而不是生成补丁' % config_store.CONFIG_FILE)
+    args = ap.parse_args(argv)
+
+    params = gimbal_sim.axis_params(args.axis, gimbal_sim.load_track_constants(args.source))
+    key = STORE_KEYS[args.axis]
+    store = config_store.ConfigStore(args.store or config_store.CONFIG_FILE)
+    stored = store.get(key)
+    if stored:
+        # 云台运行时存储值优先，按它评估当前参数
+        params['kp'], params['kd'] = stored['kp'], stored['kd']
+        if not args.store:
+            print("警告: {} 中已有 {}={}，CONFIG_STORE=True 时会覆盖补丁写入的常量；"
+                  "用 --store 写入存储".format(store.path, key, stored))
+    if args.servo:
+        params['plant'] = 'servo'
+    sim_kw = {'frame_ms': int(args.frame), 'delay_ms': int(args.delay), 'px_per_pulse': args.ppp}
+
+    kps = linspace(args.kp[0], args.kp[1], int(args.kp[2]))
+    kds = linspace(args.kd[0], args.kd[1], int(args.kd[2]))
+    jobs = [(params, round(kp, 3), round(kd, 3), sim_kw) for kp in kps for kd in kds]
+
+    current = evaluate((params, params['kp'], params['kd'], sim_kw))
+    print("[{}] 当前 KP={} KD={} 代价={:.3f} 最长调节 {}ms 最大超调 {:.1f}px".format(
+        args.axis, params['kp'], params['kd'], current[0],
+        current[3]['settling_ms'], current[3]['overshoot_px']))
+    print("搜索 {} 组增益...".format(len(jobs)))
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = sorted(pool.map(evaluate, jobs, chunksize=8), key=lambda r: r[0])
+
+    for cost, kp, kd, worst in results[:5]:
+        print("  KP={:<6} KD={:<6} 代价={:.3f} 最长调节 {}ms 最大超调 {:.1f}px".format(
+            kp, kd, cost, worst['settling_ms'], worst['overshoot_px']))
+
+    best = results[0]
+    if best[0] >= current[0]:
+        print("未找到优于当前参数的增益")
+        return 1
+
+    if args.store:
+        gains = dict(stored or {})
+        gains.update({'kp': best[1], 'kd': best[2]})
+        store.set({key: gains})
+        print("已写入 {} {}={} (版本 {})".format(store.path, key, gains, store.version))
+        return 0
+
+    kp_name, kd_name = GAIN_NAMES[args.axis]
+    patch = make_patch(args.source, {kp_name: best[1], kd_name: best[2]})
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(patch)
+        print("补丁已写入 {} (git apply {})".format(args.output, args.output))
+    else:
+        sys.stdout.write(patch)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
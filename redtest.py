@@ -13,6 +13,7 @@ import gc
 import os
 
 import cv_lite
+import image
 import ulab.numpy as np
 
 from media.sensor import *
@@ -22,6 +23,12 @@ from media.media import *
 from machine import UART
 from machine import FPIOA
 
+from pid import PIDBank
+from target_motion import TargetRateEstimator
+from fast_boot import BootTimeline, init_sensor
+
+boot = BootTimeline()       # 启动时间线起点
+
 # ==========================================================
 # 图像参数
 # ==========================================================
@@ -61,6 +68,17 @@ RECT_RATIO_MAX = 1.80
 
 ROI_MARGIN = 20
 
+# ==========================================================
+# 多分辨率矩形检测
+# 粗检测在降采样灰度图上做，只对胜出矩形的ROI在全分辨率上精修角点
+# ==========================================================
+
+RECT_SCALE = 2              # 降采样倍数 1(关闭) / 2 / 4
+
+RECT_THRESHOLD_COARSE = RECT_THRESHOLD // RECT_SCALE
+
+REFINE_MARGIN = 16          # 精修ROI外扩像素(全分辨率)
+
 # ==========================================================
 # 霍夫圆参数(cv_lite)
 # ==========================================================
@@ -77,6 +95,14 @@ MIN_RADIUS = 10
 
 MAX_RADIUS = 60
 
+# 霍夫圆ROI尺寸上限，超出时以ROI中心截取
+# 裁剪缓冲区按上限一次性分配，逐帧复用；宽高按 CIRCLE_ROI_ALIGN 取整，尺寸视图按尺寸缓存
+CIRCLE_ROI_MAX_W = 400
+
+CIRCLE_ROI_MAX_H = 400
+
+CIRCLE_ROI_ALIGN = 32
+
 # ==========================================================
 # PID参数
 # ==========================================================
@@ -91,6 +117,22 @@ KD_Y = 0.08
 
 MAX_SPEED = 500
 
+# ==========================================================
+# 速度前馈
+# 由连续检测的画面误差 + 云台当前转速估计目标角速度，
+# 换算成转速直接叠加到 PID 输出，运动目标不再依赖加大增益来减小滞后
+# ==========================================================
+
+FF_ENABLE = True
+
+FF_PX_PER_REV = 2400        # 电机转一圈画面移动的像素 (按镜头视场标定)
+
+FF_GAIN = 0.9               # 前馈比例 (<1 给 PID 留修正余量)
+
+FF_ALPHA = 0.5              # α-β 滤波位置增益
+
+FF_BETA = 0.08              # α-β 滤波速度增益
+
 # ==========================================================
 # 滤波
 # ==========================================================
@@ -124,39 +166,16 @@ uart_lr = UART(2, 115200)
 # ==========================================================
 # 摄像头
 # ==========================================================
-sensor = Sensor(width=W, height=H)
-
-sensor.reset()
-
-sensor.set_framesize(width=W, height=H)
-
-sensor.set_pixformat(Sensor.RGB888)
-
-sensor.run()
-
-sensor.reset()
-
-sensor.set_framesize(width=W, height=H)
-
-sensor.set_pixformat(Sensor.RGB888)
-
-sensor.reset()
-
-sensor.set_framesize(width=W, height=H)
-
-sensor.set_pixformat(Sensor.RGB888)
-
-Display.init(
-    Display.ST7701,
-    width=W,
-    height=H,
-    to_ide=True
+# 一次性配置 (reset/分辨率/格式各一次)，记录启动时间线
+sensor = init_sensor(
+    W,
+    H,
+    pixformat=Sensor.RGB888,
+    display=Display.ST7701,
+    to_ide=True,
+    timeline=boot
 )
 
-MediaManager.init()
-
-sensor.run()
-
 clock = time.clock()
 
 IMAGE_SHAPE = [H, W]
@@ -305,9 +324,7 @@ def score_rect(r):
 
 # ==========================================================
 
-def find_target_rect(img):
-
-    rects = img.find_rects(threshold=RECT_THRESHOLD)
+def pick_best_rect(rects):
 
     best = None
     best_score = -999999
@@ -327,6 +344,108 @@ def find_target_rect(img):
     return best
 
 
+# ==========================================================
+
+class ScaledRect:
+    """
+    粗检测矩形映射回全分辨率坐标
+    提供与 find_rects 结果相同的 rect()/corners() 接口
+    """
+
+    def __init__(self, r, scale):
+
+        x, y, w, h = r.rect()
+
+        self._rect = (x * scale, y * scale, w * scale, h * scale)
+
+        self._corners = [(p[0] * scale, p[1] * scale) for p in r.corners()]
+
+    def rect(self):
+
+        return self._rect
+
+    def corners(self):
+
+        return self._corners
+
+
+# 降采样灰度图缓冲区，只分配一次
+small_img = None
+
+if RECT_SCALE > 1:
+
+    small_img = image.Image(W // RECT_SCALE, H // RECT_SCALE, image.GRAYSCALE)
+
+
+def refine_rect(img, coarse):
+
+    x, y, w, h = coarse.rect()
+
+    m = REFINE_MARGIN + RECT_SCALE
+
+    x0 = clamp(x - m, 0, W - 1)
+    y0 = clamp(y - m, 0, H - 1)
+
+    x1 = clamp(x + w + m, 0, W)
+    y1 = clamp(y + h + m, 0, H)
+
+    rects = img.find_rects(
+        roi=(x0, y0, x1 - x0, y1 - y0),
+        threshold=RECT_THRESHOLD
+    )
+
+    # 取与粗检测中心最接近的全分辨率矩形
+    ccx = x + w / 2
+    ccy = y + h / 2
+
+    best = None
+    best_d = w + h
+
+    for r in rects:
+
+        if not valid_rect(r):
+            continue
+
+        rx, ry, rw, rh = r.rect()
+
+        d = distance(rx + rw / 2, ry + rh / 2, ccx, ccy)
+
+        if d < best_d:
+
+            best_d = d
+            best = r
+
+    return best
+
+
+def find_target_rect(img):
+
+    if RECT_SCALE <= 1:
+
+        return pick_best_rect(img.find_rects(threshold=RECT_THRESHOLD))
+
+    s = 1.0 / RECT_SCALE
+
+    small_img.draw_image(img, 0, 0, x_scale=s, y_scale=s)
+
+    coarse = [
+        ScaledRect(r, RECT_SCALE)
+        for r in small_img.find_rects(threshold=RECT_THRESHOLD_COARSE)
+    ]
+
+    best = pick_best_rect(coarse)
+
+    if best is None:
+        return None
+
+    fine = refine_rect(img, best)
+
+    if fine is None:
+        return best
+
+    return fine
+
+
 # ==========================================================
 
 def draw_rect(img, r):
@@ -350,19 +469,68 @@ def draw_rect(img, r):
 
 # ==========================================================
 
+circle_buf = np.zeros(
+    (CIRCLE_ROI_MAX_W * CIRCLE_ROI_MAX_H * 3,),
+    dtype=np.uint8
+)
+
+circle_views = {}
+
+
+def bound_roi(roi):
+    """
+    超出上限时以ROI中心截取；宽高再按 CIRCLE_ROI_ALIGN 向上取整并平移回画面内，
+    ROI尺寸只有少数几种，缓冲区视图可以按尺寸复用
+    """
+
+    x, y, w, h = roi
+
+    if w > CIRCLE_ROI_MAX_W:
+        x += (w - CIRCLE_ROI_MAX_W) // 2
+        w = CIRCLE_ROI_MAX_W
+
+    if h > CIRCLE_ROI_MAX_H:
+        y += (h - CIRCLE_ROI_MAX_H) // 2
+        h = CIRCLE_ROI_MAX_H
+
+    w = min(CIRCLE_ROI_MAX_W, -(-w // CIRCLE_ROI_ALIGN) * CIRCLE_ROI_ALIGN)
+    h = min(CIRCLE_ROI_MAX_H, -(-h // CIRCLE_ROI_ALIGN) * CIRCLE_ROI_ALIGN)
+
+    x = max(0, min(x, W - w))
+    y = max(0, min(y, H - h))
+
+    return (x, y, w, h)
+
+
 def roi_to_numpy(img, roi):
+    """
+    把ROI像素拷入按上限一次性分配的 circle_buf 开头 (连续存放，供 cv_lite 使用)
+    每种尺寸的 (h, w, 3) 视图只在首次出现时创建并缓存，视图不占像素内存；
+    逐帧只有像素拷贝和源图切片视图，不再分配图像缓冲
+    roi 需先经 bound_roi 限制并对齐尺寸
+    """
 
     x, y, w, h = roi
 
-    crop = img.copy(roi=roi)
+    entry = circle_views.get((w, h))
+
+    if entry is None:
+        entry = (circle_buf[:w * h * 3].reshape((h, w, 3)), [h, w])
+        circle_views[(w, h)] = entry
 
-    return crop.to_numpy_ref(), [h, w]
+    frame = img.to_numpy_ref()
+
+    entry[0][:, :, :] = frame[y:y + h, x:x + w, :]
+
+    return entry[0], entry[1]
 
 
 # ==========================================================
 
 def find_circle_roi(img, roi):
 
+    roi = bound_roi(roi)
+
     x0, y0, w, h = roi
 
     crop_np, shape = roi_to_numpy(img, roi)
@@ -503,23 +671,35 @@ def get_error():
 # PID控制 + X42S速度控制
 # ==========================================================
 
-last_err_x = 0
-last_err_y = 0
+# X/Y 两轴共用一个多轴PID，一次调用同时推进
+# 积分抗饱和由条件积分完成(输出饱和时冻结积分)
 
-sum_err_x = 0
-sum_err_y = 0
+pid_xy = PIDBank(
+    2,
+    kp=(KP_X, KP_Y),
+    ki=(KI_X, KI_Y),
+    kd=(KD_X, KD_Y),
+    dt=0.01,
+    out_min=-MAX_SPEED,
+    out_max=MAX_SPEED
+)
 
-last_pid_time = time.ticks_ms()
+err_xy = [0.0, 0.0]
 
-# ==========================================================
+ff_xy = [0.0, 0.0]
+
+rate_x = TargetRateEstimator(FF_PX_PER_REV, FF_ALPHA, FF_BETA, MAX_SPEED)
+rate_y = TargetRateEstimator(FF_PX_PER_REV, FF_ALPHA, FF_BETA, MAX_SPEED)
 
-def pid_update(err_x, err_y):
+# 上一次下发的转速，即本帧曝光期间云台的实际转速
+last_vx = 0
+last_vy = 0
+
+last_pid_time = time.ticks_ms()
 
-    global last_err_x
-    global last_err_y
+# ==========================================================
 
-    global sum_err_x
-    global sum_err_y
+def pid_update(err_x, err_y, ff_x=0.0, ff_y=0.0):
 
     global last_pid_time
 
@@ -532,25 +712,19 @@ def pid_update(err_x, err_y):
 
     last_pid_time = now
 
-    sum_err_x += err_x * dt
-    sum_err_y += err_y * dt
-
-    sum_err_x = clamp(sum_err_x, -300, 300)
-    sum_err_y = clamp(sum_err_y, -300, 300)
-
-    der_x = (err_x - last_err_x) / dt
-    der_y = (err_y - last_err_y) / dt
+    # 帧间隔波动时按实测周期折算积分/微分系数
+    if dt != pid_xy.dt:
+        pid_xy.set_dt(dt)
 
-    last_err_x = err_x
-    last_err_y = err_y
+    err_xy[0] = err_x
+    err_xy[1] = err_y
 
-    vx = KP_X * err_x + KI_X * sum_err_x + KD_X * der_x
-    vy = KP_Y * err_y + KI_Y * sum_err_y + KD_Y * der_y
+    ff_xy[0] = ff_x
+    ff_xy[1] = ff_y
 
-    vx = int(clamp(vx, -MAX_SPEED, MAX_SPEED))
-    vy = int(clamp(vy, -MAX_SPEED, MAX_SPEED))
+    out = pid_xy.update_error(err_xy, ff_xy)
 
-    return vx, vy
+    return int(out[0]), int(out[1])
 
 # ==========================================================
 # CRC16(Modbus)
@@ -624,6 +798,15 @@ def motor_speed(uart, addr, rpm):
 
 def stop_motor():
 
+    global last_vx
+    global last_vy
+
+    last_vx = 0
+    last_vy = 0
+
+    rate_x.reset()
+    rate_y.reset()
+
     motor_speed(
         uart_ud,
         VERTICAL_ADDR,
@@ -640,6 +823,9 @@ def stop_motor():
 
 def track_target():
 
+    global last_vx
+    global last_vy
+
     if not target_found:
 
         stop_motor()
@@ -647,18 +833,35 @@ def track_target():
 
     err_x, err_y = get_error()
 
+    ff_x = 0.0
+    ff_y = 0.0
+
+    if FF_ENABLE:
+
+        # 用未滤波的检测位置估速，避免低通滤波的相位滞后
+        now = time.ticks_ms()
+
+        ff_x = FF_GAIN * rate_x.update(target_x - CX, last_vx, now)
+        ff_y = FF_GAIN * rate_y.update(target_y - CY, last_vy, now)
+
     vx, vy = pid_update(
         err_x,
-        err_y
+        err_y,
+        ff_x,
+        ff_y
     )
 
     dead = 3
 
+    # 死区内只关闭 PID 修正，保留前馈跟随目标运动
     if abs(err_x) < dead:
-        vx = 0
+        vx = int(ff_x)
 
     if abs(err_y) < dead:
-        vy = 0
+        vy = int(ff_y)
+
+    last_vx = vx
+    last_vy = vy
 
     motor_speed(
         uart_lr,
@@ -712,43 +915,50 @@ def draw_debug(img):
     )
 
     draw_cross(img, CX, CY)
-    # ==========================================================
-    # Part4
-    # Main Loop
-    # ==========================================================
 
-    while True:
 
-        clock.tick()
+# ==========================================================
+# Part4
+# Main Loop
+# ==========================================================
 
-        os.exitpoint()
+while True:
 
-        img = sensor.snapshot()
+    clock.tick()
 
-        target_found = False
+    os.exitpoint()
 
-        detect_target(img)
+    img = sensor.snapshot()
 
-        if target_found:
+    boot.once('first_frame')
 
-            update_target()
+    target_found = False
 
-            track_target()
+    detect_target(img)
 
-        else:
+    if target_found:
 
-            stop_motor()
+        if boot.once('first_track'):
+            boot.report()
 
-        draw_debug(img)
+        update_target()
 
-        img.draw_string(
-            5,
-            H - 30,
-            "FPS: %.1f" % clock.fps(),
-            color=(255,255,255),
-            scale=2
-        )
+        track_target()
+
+    else:
+
+        stop_motor()
+
+    draw_debug(img)
+
+    img.draw_string(
+        5,
+        H - 30,
+        "FPS: %.1f" % clock.fps(),
+        color=(255,255,255),
+        scale=2
+    )
 
-        Display.show_image(img)
+    Display.show_image(img)
 
-        gc.collect()
+    gc.collect()
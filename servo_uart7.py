@@ -10,6 +10,8 @@ import serial
 import time
 import sys
 
+from zp25s_bus import binary_move, wire_time, BINARY_REPLY_LEN, TURNAROUND_MS, LATENCY_MS
+
 class ZP25SServo:
     """ZP25S舵机控制器 - UART7版本"""
     
@@ -68,41 +70,23 @@ class ZP25SServo:
             angle = max(0, min(240, angle))
             time_ms = max(0, min(32767, time_ms))
             
-            # 构建命令
-            cmd = 0x03  # 移动到指定角度命令
-            
-            # 角度转换 (0-240° -> 0-1023)
-            angle_pos = int(angle * 1024 / 240)
-            angle_h = (angle_pos >> 8) & 0xFF
-            angle_l = angle_pos & 0xFF
-            
-            # 时间数据
-            time_h = (time_ms >> 8) & 0xFF
-            time_l = time_ms & 0xFF
-            
-            # 数据部分
-            data = [servo_id, 0x05, cmd, angle_h, angle_l, time_h, time_l]
-            
-            # 计算校验和
-            checksum = self.calculate_checksum(data)
-            
-            # 构建完整帧
-            frame = [0xFF, 0xFF] + data + [checksum, 0xFE]
+            # 构建完整帧: FF FF ID 05 03 角度(2B, 0-240° -> 0-1023) 时间(2B) 异或校验 FE
+            frame = binary_move(servo_id, angle, time_ms)
             
             # 发送
-            self.ser.write(bytes(frame))
+            self.ser.write(frame)
             
             # 显示信息
             hex_str = ' '.join([f'{b:02X}' for b in frame])
             print(f"[发送] ID:{servo_id} 角度:{angle}° 时间:{time_ms}ms")
             print(f"       {hex_str}")
             
-            # 读取响应
-            time.sleep(0.1)
-            if self.ser.in_waiting > 0 and show_response:
-                response = self.ser.read(self.ser.in_waiting)
-                hex_response = ' '.join([f'{b:02X}' for b in response])
-                print(f"[响应] {hex_response}")
+            # 读取响应：只等指令与应答在线上传输所需的时间
+            if show_response:
+                response = self._read_reply(len(frame))
+                if response:
+                    hex_response = ' '.join([f'{b:02X}' for b in response])
+                    print(f"[响应] {hex_response}")
             
             return True
             
@@ -110,6 +94,22 @@ class ZP25SServo:
             print(f"✗ 命令发送失败: {e}")
             return False
     
+    def _read_reply(self, sent_bytes):
+        """读取一帧 FF FF ... FE 应答，超时按线上传输时间计算"""
+        timeout = (wire_time(sent_bytes + BINARY_REPLY_LEN, self.baudrate) +
+                   (TURNAROUND_MS + LATENCY_MS) / 1000.0)
+        deadline = time.monotonic() + timeout
+        data = b''
+        while time.monotonic() < deadline:
+            n = self.ser.in_waiting
+            if n:
+                data += self.ser.read(n)
+                if len(data) >= 4 and data[-1] == 0xFE and len(data) >= 6 + data[3]:
+                    break
+            else:
+                time.sleep(0.0005)
+        return data
+    
     def set_angle(self, servo_id, angle, time_ms=1000):
         """设置舵机角度"""
         return self.send_command(servo_id, angle, time_ms)
@@ -117,14 +117,19 @@ class ZP25SServo:
     def batch_set(self, angles_dict, time_ms=1000):
         """
         批量设置多个舵机
+        二进制协议没有组指令，各舵机帧拼成一次 write 背靠背发送，不逐个等待
         
         Args:
             angles_dict: {舵机ID: 角度, ...}
             time_ms: 运动时间
         """
-        for servo_id, angle in angles_dict.items():
-            self.set_angle(servo_id, angle, time_ms)
-            time.sleep(0.1)
+        if not self.ser or not self.ser.is_open:
+            print("✗ 串口未打开")
+            return False
+        frames = b''.join(binary_move(sid, angle, time_ms) for sid, angle in angles_dict.items())
+        self.ser.write(frames)
+        print(f"[批量] {len(angles_dict)} 个舵机, {len(frames)} 字节")
+        return True
 
 
 def test_basic():
@@ -0,0 +1,79 @@
+'''
+目标运动估计 - 速度模式跟踪的前馈
+画面误差只反映目标相对云台的位置，目标自身的角速度 = 误差变化率 + 云台当前转速；
+用 α-β 滤波在"世界坐标"(云台累计转角 + 画面误差，单位像素) 上估计目标速度，
+换算成电机转速作为前馈，PID 只负责修正剩余误差，不必为跟上运动目标而提高增益
+'''
+
+import time
+
+try:
+    _ticks_ms = time.ticks_ms
+    _ticks_diff = time.ticks_diff
+except AttributeError:
+    def _ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+
+class TargetRateEstimator:
+    """
+    单轴目标角速度估计
+    px_per_rev: 电机转一圈画面移动的像素数 (由镜头视场与减速比标定)
+    约定: 电机正转使画面误差减小 (与 PID 输出极性一致)
+    """
+    __slots__ = ('px_per_rev', 'alpha', 'beta', 'max_rpm', 'gimbal_px',
+                 'x', 'v', 'last_ms', 'valid')
+
+    def __init__(self, px_per_rev, alpha=0.5, beta=0.08, max_rpm=500):
+        self.px_per_rev = float(px_per_rev)
+        self.alpha = alpha
+        self.beta = beta
+        self.max_rpm = max_rpm
+        self.reset()
+
+    def reset(self):
+        self.gimbal_px = 0.0    # 云台累计转角 (像素)
+        self.x = 0.0            # 目标世界位置估计
+        self.v = 0.0            # 目标世界速度估计 (像素/秒)
+        self.last_ms = 0
+        self.valid = False
+
+    def update(self, err_px, gimbal_rpm, now_ms=None):
+        """
+        err_px: 本帧画面误差；gimbal_rpm: 上一次下发 (本帧曝光期间生效) 的转速
+        返回前馈转速 (RPM)
+        """
+        if now_ms is None:
+            now_ms = _ticks_ms()
+        if not self.valid:
+            self.x = err_px
+            self.v = 0.0
+            self.last_ms = now_ms
+            self.valid = True
+            return 0.0
+
+        dt = _ticks_diff(now_ms, self.last_ms) / 1000.0
+        if dt <= 0:
+            return self.rpm()
+        self.last_ms = now_ms
+
+        self.gimbal_px += gimbal_rpm * self.px_per_rev / 60.0 * dt
+        world = self.gimbal_px + err_px
+
+        pred = self.x + self.v * dt
+        r = world - pred
+        self.x = pred + self.alpha * r
+        self.v += self.beta * r / dt
+        return self.rpm()
+
+    def rpm(self):
+        """当前速度估计换算为电机转速并限幅"""
+        out = self.v * 60.0 / self.px_per_rev
+        if out > self.max_rpm:
+            return self.max_rpm
+        if out < -self.max_rpm:
+            return -self.max_rpm
+        return out
@@ -0,0 +1,153 @@
+'''
+运行中 LAB 阈值自适应
+目标连续锁定后，定期统计跟踪色块中心区域的 LAB 均值/标准差 (img.get_statistics)，
+做指数滑动平均，把阈值每次至多移动 step 向 "均值 ± k·标准差" 靠拢:
+- 安全边界: 阈值始终在 bounds 之内，且每个通道不窄于 min_width
+- 回滚: 色块数量暴涨 (阈值吃进背景) 时恢复到最近一次干净锁定时的阈值，并暂停自适应
+- 丢失目标较久时逐步回到初始阈值，避免停留在偏离的光照状态
+阈值跟随光照收窄而不是一味放宽，find_blobs 分割的像素与合并工作量更少
+'''
+
+# ==================== 默认参数 ====================
+ALPHA = 0.1            # 统计量滑动平均系数
+K_SIGMA = 2.5          # 目标阈值 = 均值 ± K_SIGMA * 标准差
+STEP = 1               # 每次更新阈值边界最多移动的量
+SAFE_MARGIN = (15, 20, 20)   # 未给 bounds 时在初始阈值外扩的安全范围 (L/A/B)
+MIN_WIDTH = (10, 12, 12)     # 每通道最小宽度
+LOCK_FRAMES = 5        # 连续命中多少帧才开始自适应
+UPDATE_PERIOD = 3      # 锁定后每隔几帧统计一次
+MAX_BLOBS = 4          # 色块数超过该值视为阈值失控，回滚
+CLEAN_BLOBS = 1        # 色块数不超过该值时记为 "干净" 阈值
+FREEZE_FRAMES = 30     # 回滚后暂停自适应的帧数
+RELAX_FRAMES = 60      # 丢失目标超过该帧数开始回归初始阈值
+
+L_RANGE = (0, 100)
+AB_RANGE = (-128, 127)
+_RANGES = (L_RANGE, AB_RANGE, AB_RANGE)
+
+
+def _inner_rect(rect, ratio=0.5):
+    """外接框中心 ratio 比例的区域 (避开边缘混色像素)"""
+    x, y, w, h = rect
+    iw = max(1, int(w * ratio))
+    ih = max(1, int(h * ratio))
+    return (x + (w - iw) // 2, y + (h - ih) // 2, iw, ih)
+
+
+class AdaptiveThreshold:
+    def __init__(self, base, bounds=None, alpha=ALPHA, k=K_SIGMA, step=STEP, min_width=MIN_WIDTH,
+                 lock_frames=LOCK_FRAMES, update_period=UPDATE_PERIOD, max_blobs=MAX_BLOBS):
+        self.base = tuple(base)
+        if bounds is None:
+            bounds = []
+            for ch in range(3):
+                rng = _RANGES[ch]
+                bounds += [max(rng[0], base[2 * ch] - SAFE_MARGIN[ch]),
+                           min(rng[1], base[2 * ch + 1] + SAFE_MARGIN[ch])]
+        self.bounds = tuple(bounds)
+        self.alpha = alpha
+        self.k = k
+        self.step = step
+        self.min_width = min_width
+        self.lock_frames = lock_frames
+        self.update_period = update_period
+        self.max_blobs = max_blobs
+
+        self.current = list(self.base)
+        self.last_good = tuple(self.base)
+        self.mean = None            # [L, A, B] 滑动均值
+        self.std = None
+        self.hits = 0               # 连续命中帧数
+        self.lost = 0               # 连续丢失帧数
+        self.freeze = 0
+        self.updates = 0
+        self.rollbacks = 0
+
+    def threshold(self):
+        return tuple(self.current)
+
+    def reset(self):
+        self.current = list(self.base)
+        self.last_good = tuple(self.base)
+        self.mean = None
+        self.std = None
+        self.hits = 0
+        self.lost = 0
+        self.freeze = 0
+
+    def update(self, img, blob, n_blobs):
+        """
+        每帧调用: blob 为本帧跟踪的色块 (丢失为 None)，n_blobs 为本帧色块总数
+        返回下一帧使用的阈值
+        """
+        if n_blobs > self.max_blobs:
+            # 阈值吃进背景：回到最近的干净阈值并暂停
+            self.current = list(self.last_good)
+            self.mean = None
+            self.std = None
+            self.hits = 0
+            self.freeze = FREEZE_FRAMES
+            self.rollbacks += 1
+            return self.threshold()
+
+        if self.freeze > 0:
+            self.freeze -= 1
+
+        if blob is None:
+            self.hits = 0
+            self.lost += 1
+            if self.lost > RELAX_FRAMES:
+                self._approach(self.base)
+            return self.threshold()
+
+        self.lost = 0
+        self.hits += 1
+        if self.hits >= self.lock_frames and n_blobs <= CLEAN_BLOBS:
+            self.last_good = self.threshold()
+        if self.freeze or self.hits < self.lock_frames or self.hits % self.update_period:
+            return self.threshold()
+
+        s = img.get_statistics(roi=_inner_rect(blob.rect()))
+        mean = (s.l_mean(), s.a_mean(), s.b_mean())
+        std = (s.l_stdev(), s.a_stdev(), s.b_stdev())
+        if self.mean is None:
+            self.mean = list(mean)
+            self.std = list(std)
+        else:
+            a = self.alpha
+            for ch in range(3):
+                self.mean[ch] += a * (mean[ch] - self.mean[ch])
+                self.std[ch] += a * (std[ch] - self.std[ch])
+
+        desired = []
+        for ch in range(3):
+            desired += [self.mean[ch] - self.k * self.std[ch], self.mean[ch] + self.k * self.std[ch]]
+        self._approach(desired)
+        self.updates += 1
+        return self.threshold()
+
+    def _approach(self, desired):
+        """每个边界向 desired 至多移动 step，再施加安全边界与最小宽度"""
+        cur = self.current
+        for i in range(6):
+            d = desired[i] - cur[i]
+            if d > self.step:
+                d = self.step
+            elif d < -self.step:
+                d = -self.step
+            cur[i] = int(round(cur[i] + d))
+        for ch in range(3):
+            lo_i, hi_i = 2 * ch, 2 * ch + 1
+            lo = max(self.bounds[lo_i], min(cur[lo_i], self.bounds[hi_i]))
+            hi = max(self.bounds[lo_i], min(cur[hi_i], self.bounds[hi_i]))
+            if hi - lo < self.min_width[ch]:
+                c = (lo + hi) // 2
+                lo = max(self.bounds[lo_i], c - self.min_width[ch] // 2)
+                hi = min(self.bounds[hi_i], lo + self.min_width[ch])
+                lo = max(self.bounds[lo_i], hi - self.min_width[ch])
+            cur[lo_i] = lo
+            cur[hi_i] = hi
+
+    def stats(self):
+        return {'threshold': self.threshold(), 'updates': self.updates,
+                'rollbacks': self.rollbacks, 'locked': self.hits >= self.lock_frames}
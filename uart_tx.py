@@ -0,0 +1,228 @@
+'''
+串口异步发送层
+视觉主循环只把指令帧放进有界队列，由 _thread 后台线程取出、合批后写串口:
+- 合批: 连续的小帧拼成一次 write，单批不超过 batch 字节 (驱动 FIFO/DMA 块大小)，帧不拆分
+- 合并: 只有可被取代的位置设定点 (0xFC、不带同步标志的 0xFD) 会被同一地址的新设定点替换，计入 coalesced；
+  同步暂存指令、同步触发、0xF1 配置、0x35/0x36/0x3A 读取等帧一律不丢
+- 有界: 队满且无可合并帧时最多等待 block_ms 让后台线程腾出空间，仍满则丢弃该帧 (计入 overflows)，
+  不向视觉循环抛异常；设定点下一控制周期会重新下发
+- 生命周期: 由使用方在需要时创建，用完调用 stop() 结束后台线程
+- 统计: 队列深度、入队到写出的延迟、单次 write 耗时，stats() 读取
+
+固件没有 _thread 或无法创建线程时退化为同步写 (write 内直接发送)，接口不变；
+提供 write / any / read，可直接替换 UART 对象
+'''
+
+import time
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+try:
+    _ticks_us = time.ticks_us
+    _ticks_diff = time.ticks_diff
+    _sleep_ms = time.sleep_ms
+except AttributeError:
+    def _ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def _ticks_diff(a, b):
+        return a - b
+
+    def _sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+
+CODE_POS_FAST = 0xFC       # addr FC 位置(4B) 6B
+CODE_POS = 0xFD            # addr FD 方向 速度 加速度 脉冲 绝对 同步 6B
+BROADCAST = 0x00
+
+
+def setpoint_key(frame):
+    """可被同地址新设定点取代的帧返回 (地址, 功能码)，其余帧返回 None"""
+    if len(frame) < 2 or frame[0] == BROADCAST:
+        return None
+    if frame[1] == CODE_POS_FAST and len(frame) == 7:
+        return (frame[0], CODE_POS_FAST)
+    if frame[1] == CODE_POS and len(frame) == 13 and frame[11] == 0:
+        return (frame[0], CODE_POS)
+    return None
+
+
+class _NoLock:
+    def acquire(self, *args):
+        return True
+
+    def release(self):
+        pass
+
+
+class AsyncUartTx:
+    def __init__(self, uart, depth=32, batch=64, idle_ms=1, threaded=True, block_ms=5):
+        self.uart = uart
+        self.depth = depth
+        self.block_ms = block_ms
+        self.batch = batch
+        self.idle_ms = idle_ms
+        self.queue = []             # [(入队时刻 us, 帧), ...]
+        self.lock = _NoLock()
+        self.running = False
+        self.threaded = False
+
+        self.max_depth = 0
+        self.frames = 0
+        self.batches = 0
+        self.bytes = 0
+        self.coalesced = 0
+        self.overflows = 0
+        self.write_us_max = 0
+        self.write_us_sum = 0
+        self.latency_us_max = 0
+        self.latency_us_sum = 0
+
+        if threaded:
+            self.start()
+
+    def start(self):
+        if self.running or _thread is None:
+            return self.threaded
+        try:
+            self.lock = _thread.allocate_lock()
+            self.running = True
+            _thread.start_new_thread(self._worker, ())
+            self.threaded = True
+        except Exception as e:
+            print("串口发送线程启动失败，改为同步发送:", e)
+            self.running = False
+            self.lock = _NoLock()
+            self.threaded = False
+        return self.threaded
+
+    def stop(self, timeout_ms=200):
+        """停止后台线程 (先尽量发完队列)"""
+        if not self.threaded:
+            self.drain()
+            return
+        start = _ticks_us()
+        while self.queue and _ticks_diff(_ticks_us(), start) < timeout_ms * 1000:
+            _sleep_ms(self.idle_ms)
+        self.running = False
+        self.threaded = False
+        self.drain()
+
+    # ---------------- UART 兼容接口 ----------------
+    def write(self, data):
+        frame = bytes(data)
+        now = _ticks_us()
+        key = setpoint_key(frame)
+        self.lock.acquire()
+        if key is not None:
+            # 同一地址尚未发出的旧设定点作废，新设定点排到队尾 (不越过其后入队的配置/查询帧)
+            for i in range(len(self.queue) - 1, -1, -1):
+                if setpoint_key(self.queue[i][1]) == key:
+                    now = self.queue[i][0]      # 保留原入队时刻，延迟统计不被合并掩盖
+                    del self.queue[i]
+                    self.coalesced += 1
+                    break
+        while len(self.queue) >= self.depth:
+            self.lock.release()
+            if not self._wait_space():
+                self.overflows += 1
+                return 0
+            self.lock.acquire()
+        self.queue.append((now, frame))
+        if len(self.queue) > self.max_depth:
+            self.max_depth = len(self.queue)
+        self.lock.release()
+        if not self.threaded:
+            self.drain()
+        return len(frame)
+
+    def _wait_space(self):
+        """队满时等待后台线程发送，block_ms 内腾出空间返回 True"""
+        if not self.threaded:
+            self.drain()
+            return True
+        start = _ticks_us()
+        while len(self.queue) >= self.depth:
+            if _ticks_diff(_ticks_us(), start) >= self.block_ms * 1000:
+                return False
+            _sleep_ms(self.idle_ms)
+        return True
+
+    def any(self):
+        return self.uart.any()
+
+    def read(self, *args):
+        return self.uart.read(*args)
+
+    # ---------------- 发送 ----------------
+    def _take(self):
+        """取出一批帧：返回 (合并后的字节, 帧数, 最早入队时刻)，队空返回 None"""
+        self.lock.acquire()
+        if not self.queue:
+            self.lock.release()
+            return None
+        first = self.queue[0][0]
+        buf = bytearray()
+        n = 0
+        while self.queue:
+            frame = self.queue[0][1]
+            if n and len(buf) + len(frame) > self.batch:
+                break
+            buf.extend(frame)
+            self.queue.pop(0)
+            n += 1
+        self.lock.release()
+        return buf, n, first
+
+    def _send(self, item):
+        buf, n, first = item
+        t0 = _ticks_us()
+        self.uart.write(buf)
+        t1 = _ticks_us()
+        cost = _ticks_diff(t1, t0)
+        latency = _ticks_diff(t1, first)
+        self.batches += 1
+        self.frames += n
+        self.bytes += len(buf)
+        self.write_us_sum += cost
+        if cost > self.write_us_max:
+            self.write_us_max = cost
+        self.latency_us_sum += latency
+        if latency > self.latency_us_max:
+            self.latency_us_max = latency
+
+    def drain(self):
+        """在调用线程内发完队列"""
+        while True:
+            item = self._take()
+            if item is None:
+                return
+            self._send(item)
+
+    def _worker(self):
+        while self.running:
+            item = self._take()
+            if item is None:
+                _sleep_ms(self.idle_ms)
+                continue
+            self._send(item)
+
+    def stats(self):
+        batches = self.batches or 1
+        return {
+            'queued': len(self.queue),
+            'max_depth': self.max_depth,
+            'frames': self.frames,
+            'batches': self.batches,
+            'bytes': self.bytes,
+            'coalesced': self.coalesced,
+            'overflows': self.overflows,
+            'write_us_avg': self.write_us_sum // batches,
+            'write_us_max': self.write_us_max,
+            'latency_us_avg': self.latency_us_sum // batches,
+            'latency_us_max': self.latency_us_max,
+        }
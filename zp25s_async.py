@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ZP25S 总线舵机 asyncio 控制器 (主机端，Linux)
+- 串口 fd 注册到事件循环 (loop.add_reader)，收包不占线程，不阻塞其他协程
+  (网络服务、视觉结果接收等可与舵机控制跑在同一进程)
+- set_angle / read_angle 等均为协程；读请求按舵机 ID 建立 Future，
+  单个读回调按 '#...!' / 0xFF 0xFF ... 0xFE 分帧后按 ID 交付 (同 ID 先到先得)
+- 不同舵机的请求可用 asyncio.gather 并发，查询背靠背发出
+- 超时按线上传输时间 + 舵机转向时间 + 在途请求的应答排队时间计算，与 zp25s_bus 相同
+
+用法:
+    async def main():
+        bus = AsyncZP25S('/dev/ttyS7')
+        await bus.open()
+        await bus.set_angles({1: 60, 2: 120}, 800)
+        print(await bus.read_angles([1, 2]))
+        bus.close()
+    asyncio.run(main())
+
+自检 (fake_bus_device 提供的 pty 虚拟舵机，延迟/吞吐超限时退出码为 1):
+    python3 zp25s_async.py --selftest
+"""
+
+import asyncio
+import sys
+from collections import deque
+
+import serial
+
+from zp25s_bus import (ASCII, FrameParser, ascii_cmd, ascii_move, ascii_group, binary_move,
+                       pwm_to_angle, wire_time, ASCII_REPLY_LEN, BINARY_REPLY_LEN,
+                       TURNAROUND_MS, LATENCY_MS)
+
+
+class AsyncZP25S:
+    """asyncio 版 ZP25S 驱动：写入立即返回，读请求以 Future 按舵机 ID 匹配"""
+
+    def __init__(self, port='/dev/ttyS7', baudrate=115200, protocol=ASCII, ser=None,
+                 turnaround_ms=TURNAROUND_MS, latency_ms=LATENCY_MS, debug=False):
+        self.port = port
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.ser = ser
+        self.turnaround = turnaround_ms / 1000.0
+        self.latency = latency_ms / 1000.0
+        self.debug = debug
+        self.parser = FrameParser()
+        self.waiters = {}               # 舵机 ID → deque[Future]
+        self.unsolicited = deque(maxlen=64)
+        self.tx_free_at = 0.0           # 发送排空的预计时刻 (loop.time())
+        self.loop = None
+        self.timeouts = 0
+
+    # ---------------- 串口 ----------------
+    async def open(self):
+        self.loop = asyncio.get_running_loop()
+        if self.ser is None:
+            self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=0,
+                                     parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                                     bytesize=serial.EIGHTBITS)
+        self.loop.add_reader(self.ser.fileno(), self._on_readable)
+        return True
+
+    def close(self):
+        if self.loop and self.ser:
+            self.loop.remove_reader(self.ser.fileno())
+        for queue in self.waiters.values():
+            for fut in queue:
+                if not fut.done():
+                    fut.cancel()
+        self.waiters.clear()
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def _on_readable(self):
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            print("[串口] 读取失败:", e)
+            return
+        if not data:
+            return
+        for frame in self.parser.feed(data):
+            self._dispatch(frame)
+
+    def _dispatch(self, frame):
+        if self.debug:
+            print("[响应]", frame)
+        queue = self.waiters.get(frame[1])
+        while queue:
+            fut = queue.popleft()
+            if not fut.done():          # 已超时/取消的跳过
+                fut.set_result(frame)
+                break
+        else:
+            self.unsolicited.append(frame)
+        if queue is not None and not queue:
+            del self.waiters[frame[1]]
+
+    # ---------------- 发送 ----------------
+    def write(self, data):
+        """写入并记录线上传输结束时间，不等待"""
+        if self.debug:
+            print("[发送]", data)
+        self.ser.write(data)
+        now = self.loop.time()
+        self.tx_free_at = max(now, self.tx_free_at) + wire_time(len(data), self.baudrate)
+        return len(data)
+
+    async def drain(self):
+        """等待已写入的字节发完 (按线上时间估算)"""
+        delay = self.tx_free_at - self.loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _reply_timeout(self, reply_bytes, count=1):
+        """在途请求发完后，再收 count 个应答所需的时间 (同 ZP25SBus.reply_deadline)"""
+        # 应答在总线上依次排队，转向时间只计一次
+        return (self.tx_free_at - self.loop.time() + self.latency + self.turnaround +
+                wire_time(count * reply_bytes, self.baudrate))
+
+    def outstanding(self):
+        """尚未收到应答的请求数"""
+        return sum(len(queue) for queue in self.waiters.values())
+
+    async def set_angle(self, servo_id, angle, time_ms=1000, wait=False):
+        """下发运动指令；wait=True 时等到运动时间结束再返回"""
+        if self.protocol == ASCII:
+            self.write(ascii_move(servo_id, angle, time_ms))
+        else:
+            self.write(binary_move(servo_id, angle, time_ms))
+        await self.drain()
+        if wait:
+            await asyncio.sleep(time_ms / 1000.0)
+
+    async def set_angles(self, angles, time_ms=1000, wait=False):
+        """多舵机同时运动：ASCII 组指令，二进制多帧一次写出"""
+        if not angles:
+            return
+        if self.protocol == ASCII:
+            self.write(ascii_group(angles, time_ms))
+        else:
+            self.write(b''.join(binary_move(sid, a, time_ms) for sid, a in angles.items()))
+        await self.drain()
+        if wait:
+            await asyncio.sleep(time_ms / 1000.0)
+
+    async def command(self, servo_id, command_str):
+        """发送 ASCII 指令 (如 DST / ULK)，不等应答"""
+        self.write(ascii_cmd(servo_id, command_str))
+        await self.drain()
+
+    # ---------------- 请求 / 应答 ----------------
+    async def request(self, servo_id, data, reply_bytes=None):
+        """发送一条请求并等待该 ID 的应答帧，超时返回 None"""
+        if reply_bytes is None:
+            reply_bytes = ASCII_REPLY_LEN if self.protocol == ASCII else BINARY_REPLY_LEN
+        fut = self.loop.create_future()
+        self.waiters.setdefault(servo_id, deque()).append(fut)
+        self.write(data)
+        # 并发请求的应答排在前面的应答之后，超时按在途请求数放宽
+        timeout = self._reply_timeout(reply_bytes, self.outstanding())
+        try:
+            return await asyncio.wait_for(fut, max(0.0, timeout))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            queue = self.waiters.get(servo_id)
+            if queue and fut in queue:
+                queue.remove(fut)
+                if not queue:
+                    del self.waiters[servo_id]
+            return None
+
+    async def read_angle(self, servo_id):
+        """ASCII RAD 读角度，无应答返回 None"""
+        frame = await self.request(servo_id, ascii_cmd(servo_id, "RAD"))
+        if frame and frame[0] == ASCII and frame[2].startswith('P'):
+            try:
+                return pwm_to_angle(int(frame[2][1:5]))
+            except ValueError:
+                pass
+        return None
+
+    async def read_angles(self, ids):
+        """并发读取多个舵机，返回 {ID: 角度或 None}"""
+        ids = list(ids)
+        angles = await asyncio.gather(*(self.read_angle(sid) for sid in ids))
+        return dict(zip(ids, angles))
+
+    async def ping(self, servo_id):
+        return await self.request(servo_id, ascii_cmd(servo_id, "PID")) is not None
+
+
+# ---------------- 自检 ----------------
+def _check(name, value, limit, upper=True):
+    ok = value <= limit if upper else value >= limit
+    print("  %s: %.2f (%s %.2f) %s" % (name, value, '≤' if upper else '≥', limit,
+                                      'OK' if ok else '超限'))
+    return ok
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def _selftest(rounds=50, slack_ms=5.0, max_miss=0.05):
+    """功能检查 + 延迟/吞吐界限 (按线上时间推出，同 fake_bus_device.bench)，任一不满足返回 False"""
+    from fake_bus_device import FakeBusDevice
+
+    device = FakeBusDevice(servo_ids=(1, 2, 3), motor_addrs=())
+    bus = AsyncZP25S(device.start())
+    await bus.open()
+    ok = True
+
+    await bus.set_angles({1: 60, 2: 120, 3: 180}, 50, wait=True)
+    t0 = bus.loop.time()
+    angles = await bus.read_angles([1, 2, 3, 9])
+    dt = (bus.loop.time() - t0) * 1000
+    print("并发读角度:", angles, "%.1f ms" % dt)
+    ok &= angles == {1: 60.0, 2: 120.0, 3: 180.0, 9: None}
+    # 缺席 ID 的超时上限：4 条请求 + 网关延迟 + 转向 + 4 条应答的线上时间，
+    # 超时由定时器触发，再多留一份调度抖动
+    req, rep = len(ascii_cmd(1, "RAD")), ASCII_REPLY_LEN
+    deadline = (wire_time(4 * req, bus.baudrate) + bus.latency + bus.turnaround +
+                wire_time(4 * rep, bus.baudrate)) * 1000
+    ok &= _check("含缺席 ID 读取 ms", dt, deadline + 2 * slack_ms)
+
+    # 在线舵机并发读：延迟与吞吐
+    ids = [1, 2, 3]
+    lat = []
+    miss = 0
+    t_all = bus.loop.time()
+    for _ in range(rounds):
+        t0 = bus.loop.time()
+        angles = await bus.read_angles(ids)
+        lat.append((bus.loop.time() - t0) * 1000)
+        miss += None in angles.values()
+    total = bus.loop.time() - t_all
+    ideal = (wire_time(req, bus.baudrate) + device.turnaround +
+             wire_time(len(ids) * rep, bus.baudrate)) * 1000
+    print("并发读 %d 舵机 x%d: 平均 %.2f ms, 理想 %.2f ms" % (len(ids), rounds, sum(lat) / len(lat), ideal))
+    ok &= _check("p95 延迟 ms", _percentile(lat, 0.95), ideal * 1.5 + slack_ms)
+    ok &= _check("读取/秒", rounds * len(ids) / total, len(ids) / ideal * 1000 * 0.5, upper=False)
+    # 主机偶发卡顿超过超时余量时一轮读取缺失，只限制占比
+    ok &= _check("缺失轮次 %", 100.0 * miss / rounds, 100.0 * max_miss)
+
+    # 读请求与其他协程并行：心跳协程不应被串口读阻塞
+    timeouts = bus.timeouts
+    beats = []
+
+    async def heartbeat():
+        for _ in range(5):
+            beats.append(bus.loop.time())
+            await asyncio.sleep(0.002)
+
+    await asyncio.gather(heartbeat(), bus.set_angle(2, 30, 20, wait=True),
+                         bus.read_angle(1))
+    ok &= len(beats) == 5
+    ok &= _check("心跳最大间隔 ms", max(b - a for a, b in zip(beats, beats[1:])) * 1000, 2 + slack_ms)
+    ok &= await bus.read_angle(2) == 30.0
+    ok &= await bus.ping(3) and not await bus.ping(4)
+    ok &= bus.timeouts - timeouts == 1      # 只有 ID 4 超时
+    bus.close()
+    device.stop()
+    print("自检", "通过" if ok else "失败")
+    return ok
+
+
+if __name__ == '__main__':
+    if '--selftest' in sys.argv:
+        sys.exit(0 if asyncio.run(_selftest()) else 1)
+    print(__doc__)
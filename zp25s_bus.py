@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ZP25S 总线舵机流水线驱动 (主机端 pyserial)
+- 不做固定 sleep：写入后只按线上字节传输时间 + 舵机应答时间计算超时
+- 多舵机运动用 ASCII 组指令 {#000P1500T1000!#001P1500T1000!} 一帧下发，同时启动
+  (二进制协议没有组指令，多帧拼成一次 write 背靠背发送)
+- 单个读线程持续收包，按 '#...!' (ASCII) 或 0xFF 0xFF ... 0xFE (二进制) 分帧，
+  按舵机 ID 交给等待中的请求；多条查询可同时在途
+- 扫描: PID 查询按组背靠背发出，在应答时间窗内统一收集；结果缓存到 JSON，
+  下次启动只批量确认缓存中的 ID，全部在线则跳过全量扫描
+
+用法:
+    bus = ZP25SBus('/dev/ttyS7')
+    bus.open()
+    bus.set_angles({1: 60, 2: 120, 3: 180}, 1000)
+    print(bus.read_angles([1, 2, 3]))
+    print(bus.discover(cache_path=BUS_MAP_FILE))
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import serial
+
+ASCII = 'ascii'
+BINARY = 'binary'
+
+BINARY_HEAD = b'\xff\xff'
+BINARY_END = 0xFE
+BINARY_MOVE = 0x03
+
+ASCII_REPLY_LEN = 10           # '#000P1500!'
+BINARY_REPLY_LEN = 10
+TURNAROUND_MS = 2.0            # 舵机收到指令到开始应答的时间
+LATENCY_MS = 5.0               # 主机侧串口驱动/USB 转串口延迟余量
+
+SCAN_IDS = range(0, 255)
+SCAN_CHUNK = 16                # 每组背靠背发出的查询数
+BUS_MAP_FILE = 'servo_map.json'
+
+
+def wire_time(nbytes, baudrate):
+    """nbytes 字节在 8N1 线上传输所需秒数"""
+    return nbytes * 10.0 / baudrate
+
+
+def angle_to_pwm(angle):
+    angle = max(0, min(240, angle))
+    return int(500 + (angle / 240.0) * 2000)
+
+
+def pwm_to_angle(pwm):
+    return (pwm - 500) * 240.0 / 2000
+
+
+def ascii_cmd(servo_id, command_str):
+    return ("#%03d%s!" % (servo_id, command_str)).encode('ascii')
+
+
+def ascii_move(servo_id, angle, time_ms):
+    time_ms = max(1, min(9999, int(time_ms)))
+    return ascii_cmd(servo_id, "P%04dT%04d" % (angle_to_pwm(angle), time_ms))
+
+
+def ascii_group(angles, time_ms):
+    """组指令：花括号包住多条运动指令，所有舵机同时执行"""
+    body = b''.join(ascii_move(sid, angle, time_ms) for sid, angle in angles.items())
+    return b'{' + body + b'}'
+
+
+def xor_checksum(data):
+    c = 0
+    for b in data:
+        c ^= b
+    return c
+
+
+def binary_frame(servo_id, cmd, params=b''):
+    """FF FF ID 长度 指令 参数... 异或校验 FE，长度 = 指令 + 参数字节数"""
+    data = bytes((servo_id, len(params) + 1, cmd)) + bytes(params)
+    return BINARY_HEAD + data + bytes((xor_checksum(data), BINARY_END))
+
+
+def binary_move(servo_id, angle, time_ms):
+    angle = max(0, min(240, angle))
+    time_ms = max(0, min(32767, int(time_ms)))
+    pos = int(angle * 1024 / 240)
+    return binary_frame(servo_id, BINARY_MOVE,
+                        bytes(((pos >> 8) & 0xFF, pos & 0xFF, (time_ms >> 8) & 0xFF, time_ms & 0xFF)))
+
+
+def load_bus_map(path, port, baudrate, protocol=ASCII):
+    """读取缓存的舵机 ID 表；文件缺失/损坏或端口、波特率、协议不一致时返回 None"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (data.get('port') != port or data.get('baudrate') != baudrate or
+            data.get('protocol', ASCII) != protocol):
+        return None
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids:
+        return None
+    return [int(i) for i in ids]
+
+
+def save_bus_map(path, port, baudrate, ids, protocol=ASCII):
+    """写入舵机 ID 表 (先写临时文件再替换，掉电不留半个文件)"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'port': port, 'baudrate': baudrate, 'protocol': protocol,
+                   'ids': sorted(ids), 'time': int(time.time())}, f)
+    os.replace(tmp, path)
+
+
+class FrameParser:
+    """
+    增量分帧，feed 返回完整帧列表:
+      ('ascii', id, payload_str)          '#001P1500!' → (ascii, 1, 'P1500')
+      ('binary', id, cmd, params_bytes)   校验失败的帧丢弃
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.bad = 0
+
+    def feed(self, data):
+        self.buf.extend(data)
+        frames = []
+        buf = self.buf
+        while buf:
+            b = buf[0]
+            if b == 0x23:                               # '#'
+                end = buf.find(b'!')
+                if end < 0:
+                    if len(buf) > 64:                   # 丢失结束符
+                        del buf[:1]
+                        self.bad += 1
+                        continue
+                    break
+                text = bytes(buf[1:end])
+                del buf[:end + 1]
+                if len(text) >= 3 and text[:3].isdigit():
+                    frames.append((ASCII, int(text[:3]), text[3:].decode('ascii', 'replace')))
+                else:
+                    self.bad += 1
+                continue
+            if b == 0xFF:
+                if len(buf) < 2:
+                    break
+                if buf[1] != 0xFF:
+                    del buf[:1]
+                    continue
+                if len(buf) < 4:
+                    break
+                n = buf[3]                               # 长度 = 指令 + 参数
+                total = 6 + n
+                if len(buf) < total:
+                    break
+                data = bytes(buf[2:total - 2])
+                if buf[total - 1] == BINARY_END and xor_checksum(data) == buf[total - 2]:
+                    frames.append((BINARY, data[0], data[2], data[3:]))
+                    del buf[:total]
+                else:
+                    self.bad += 1
+                    del buf[:1]
+                continue
+            # 组指令括号、回显换行等
+            del buf[:1]
+        return frames
+
+
+def reply_window(cmd_bytes, count, baudrate, reply_bytes=ASCII_REPLY_LEN,
+                 turnaround_ms=TURNAROUND_MS, latency_ms=LATENCY_MS):
+    """发出 cmd_bytes 字节指令后收齐 count 个应答所需的秒数 (转向时间只计一次)"""
+    return (wire_time(cmd_bytes + count * reply_bytes, baudrate) +
+            (turnaround_ms + latency_ms) / 1000.0)
+
+
+def scan_ids(probe, ids=SCAN_IDS, chunk=SCAN_CHUNK):
+    """
+    PID 查询每 chunk 个一组背靠背发出，应答时间窗内按 ID 收集
+    probe(ids) 由调用方的串口实现，返回 (应答的 ID 集合, 是否出现乱码帧)
+    组内出现乱码帧 (应答碰撞) 时，该组逐个重查
+    返回在线的舵机 ID 列表
+    """
+    ids = list(ids)
+    found = []
+    for i in range(0, len(ids), chunk):
+        part = ids[i:i + chunk]
+        answered, garbled = probe(part)
+        if garbled and len(part) > 1:
+            answered = set()
+            for sid in part:
+                answered |= probe([sid])[0]
+        found.extend(sid for sid in part if sid in answered)
+    return found
+
+
+def discover_ids(probe, port, baudrate, protocol=ASCII, ids=SCAN_IDS, cache_path=BUS_MAP_FILE,
+                 chunk=SCAN_CHUNK, rescan=False):
+    """
+    优先使用缓存的 ID 表：一次批量确认，全部应答则直接返回；
+    否则全量扫描并更新缓存
+    """
+    if cache_path and not rescan:
+        cached = load_bus_map(cache_path, port, baudrate, protocol)
+        if cached and len(scan_ids(probe, cached, chunk)) == len(cached):
+            return cached
+    found = scan_ids(probe, ids, chunk)
+    if cache_path and found:
+        save_bus_map(cache_path, port, baudrate, found, protocol)
+    return found
+
+
+class _Waiter:
+    __slots__ = ('event', 'frame')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.frame = None
+
+
+class ZP25SBus:
+    """ZP25S 总线舵机驱动：写不阻塞，读按 ID 异步匹配"""
+
+    def __init__(self, port='/dev/ttyS7', baudrate=115200, protocol=ASCII, ser=None,
+                 turnaround_ms=TURNAROUND_MS, latency_ms=LATENCY_MS, debug=False):
+        self.port = port
+        self.baudrate = baudrate
+        self.protocol = protocol
+        self.ser = ser
+        self.turnaround = turnaround_ms / 1000.0
+        self.latency = latency_ms / 1000.0
+        self.debug = debug
+        self.parser = FrameParser()
+        self.lock = threading.Lock()
+        self.waiters = {}               # 舵机 ID → [_Waiter, ...] (先到先得)
+        self.unsolicited = deque(maxlen=64)
+        self.tx_free_at = 0.0           # 本机发送缓冲排空的预计时刻
+        self.reader = None
+        self.running = False
+
+    # ---------------- 串口 ----------------
+    def open(self):
+        if self.ser is None:
+            self.ser = serial.Serial(port=self.port, baudrate=self.baudrate, timeout=0.01,
+                                     parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                                     bytesize=serial.EIGHTBITS)
+        self.running = True
+        self.reader = threading.Thread(target=self._read_loop, name='zp25s-reader', daemon=True)
+        self.reader.start()
+        return True
+
+    def close(self):
+        self.running = False
+        if self.reader:
+            self.reader.join(0.5)
+            self.reader = None
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError):
+                if not self.running:
+                    break
+                raise
+            if not data:
+                continue
+            for frame in self.parser.feed(data):
+                self._dispatch(frame)
+
+    def _dispatch(self, frame):
+        if self.debug:
+            print("[响应]", frame)
+        with self.lock:
+            queue = self.waiters.get(frame[1])
+            if queue:
+                w = queue.pop(0)
+                if not queue:
+                    del self.waiters[frame[1]]
+            else:
+                w = None
+        if w is None:
+            self.unsolicited.append(frame)
+            return
+        w.frame = frame
+        w.event.set()
+
+    # ---------------- 发送 ----------------
+    def write(self, data):
+        """写入并记录线上传输结束时间，不等待"""
+        if self.debug:
+            print("[发送]", data)
+        self.ser.write(data)
+        now = time.monotonic()
+        self.tx_free_at = max(now, self.tx_free_at) + wire_time(len(data), self.baudrate)
+        return len(data)
+
+    def drain(self):
+        """等待已写入的字节全部发完 (按线上时间估算)"""
+        delay = self.tx_free_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def reply_deadline(self, reply_bytes, count=1):
+        """在途请求发完后，再收 count 个应答所需的截止时刻"""
+        # 应答在总线上依次排队，转向时间只计一次
+        return (self.tx_free_at + self.latency + self.turnaround +
+                wire_time(count * reply_bytes, self.baudrate))
+
+    def set_angle(self, servo_id, angle, time_ms=1000):
+        if self.protocol == ASCII:
+            return self.write(ascii_move(servo_id, angle, time_ms))
+        return self.write(binary_move(servo_id, angle, time_ms))
+
+    def set_angles(self, angles, time_ms=1000):
+        """多舵机一次下发：ASCII 用组指令，二进制多帧合并为一次 write"""
+        if not angles:
+            return 0
+        if self.protocol == ASCII:
+            return self.write(ascii_group(angles, time_ms))
+        return self.write(b''.join(binary_move(sid, a, time_ms) for sid, a in angles.items()))
+
+    def command(self, servo_id, command_str):
+        """发送 ASCII 指令 (如 DST / ULK)，不等应答"""
+        return self.write(ascii_cmd(servo_id, command_str))
+
+    # ---------------- 请求 / 应答 ----------------
+    def request_many(self, requests, reply_bytes=None):
+        """
+        requests: [(舵机 ID, 指令字节), ...]；全部指令一次写出，按 ID 收集应答
+        返回 {ID: 应答帧或 None}
+        """
+        if reply_bytes is None:
+            reply_bytes = ASCII_REPLY_LEN if self.protocol == ASCII else BINARY_REPLY_LEN
+        waiters = []
+        with self.lock:
+            for sid, _ in requests:
+                w = _Waiter()
+                self.waiters.setdefault(sid, []).append(w)
+                waiters.append((sid, w))
+        self.write(b''.join(data for _, data in requests))
+        deadline = self.reply_deadline(reply_bytes, len(requests))
+        result = {}
+        for sid, w in waiters:
+            w.event.wait(max(0.0, deadline - time.monotonic()))
+            result[sid] = w.frame
+        # 超时的等待者撤销，迟到的应答进 unsolicited
+        with self.lock:
+            for sid, w in waiters:
+                if w.frame is None:
+                    queue = self.waiters.get(sid)
+                    if queue and w in queue:
+                        queue.remove(w)
+                        if not queue:
+                            del self.waiters[sid]
+        return result
+
+    def request(self, servo_id, data, reply_bytes=None):
+        return self.request_many([(servo_id, data)], reply_bytes)[servo_id]
+
+    def read_angles(self, ids):
+        """ASCII RAD 批量读角度，返回 {ID: 角度或 None}"""
+        frames = self.request_many([(sid, ascii_cmd(sid, "RAD")) for sid in ids])
+        out = {}
+        for sid, frame in frames.items():
+            out[sid] = None
+            if frame and frame[0] == ASCII and frame[2].startswith('P'):
+                try:
+                    out[sid] = pwm_to_angle(int(frame[2][1:5]))
+                except ValueError:
+                    pass
+        return out
+
+    def read_angle(self, servo_id):
+        return self.read_angles([servo_id])[servo_id]
+
+    def ping(self, servo_id):
+        """ASCII PID 查询，有应答返回 True"""
+        return self.request(servo_id, ascii_cmd(servo_id, "PID")) is not None
+
+    # ---------------- 扫描 ----------------
+    def probe(self, ids):
+        """一组 PID 查询背靠背发出，返回 (应答的 ID 集合, 是否出现乱码帧)"""
+        bad = self.parser.bad
+        frames = self.request_many([(sid, ascii_cmd(sid, "PID")) for sid in ids])
+        return {sid for sid, frame in frames.items() if frame is not None}, self.parser.bad != bad
+
+    def scan(self, ids=SCAN_IDS, chunk=SCAN_CHUNK):
+        """按组探测，返回在线的舵机 ID 列表 (见 scan_ids)"""
+        return scan_ids(self.probe, ids, chunk)
+
+    def discover(self, ids=SCAN_IDS, cache_path=BUS_MAP_FILE, chunk=SCAN_CHUNK, rescan=False):
+        """缓存优先的扫描 (见 discover_ids)"""
+        return discover_ids(self.probe, self.port, self.baudrate, self.protocol,
+                            ids, cache_path, chunk, rescan)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ZP25S 多舵机轨迹播放 (主机端)
+- 关键帧: 每个舵机一组 (时间 ms, 角度)，各舵机的关键帧时刻可以不同
+- 重采样: 按总线更新周期对所有舵机插值 (线性 / 余弦缓动)，
+  每个周期下发一条组指令 {#..P..T周期!...}，舵机在一个周期内走到下一采样点
+- 调度: 第 k 帧的发送时刻固定为 t0 + k * 周期 (time.monotonic)，不累积漂移；
+  落后超过一个周期时跳过过期帧直接追到当前时刻，统计迟到/跳过帧
+- 角度未变化的舵机不写入组指令，减少每帧字节数
+
+用法:
+    traj = Trajectory({1: [(0, 60), (1000, 180), (2000, 60)],
+                       2: [(0, 120), (2000, 30)]}, smooth=True)
+    player = TrajectoryPlayer(ZP25SBus('/dev/ttyS7'), rate_hz=50)
+    print(player.play(traj))
+
+演示 (pty 虚拟舵机):
+    python3 zp25s_trajectory.py --fake
+"""
+
+import math
+import sys
+import time
+
+from zp25s_bus import angle_to_pwm, wire_time
+
+RATE_HZ = 50
+LATE_MS = 2.0              # 晚于计划时刻超过该值计为迟到帧
+SPIN_MS = 1.0              # 最后 SPIN_MS 忙等，弥补 sleep 的调度误差
+
+
+class Trajectory:
+    def __init__(self, keyframes, smooth=False):
+        """
+        keyframes: {舵机 ID: [(时间 ms, 角度), ...]}
+        smooth: 段内用余弦缓动 (关键帧处速度为 0)，否则线性插值
+        """
+        self.keys = {}
+        for sid, frames in keyframes.items():
+            frames = sorted(frames)
+            if not frames:
+                continue
+            self.keys[sid] = ([float(t) for t, _ in frames], [float(a) for _, a in frames])
+        self.smooth = smooth
+        self.duration = max((ts[-1] for ts, _ in self.keys.values()), default=0.0)
+
+    @classmethod
+    def from_poses(cls, poses, smooth=False):
+        """poses: [(时间 ms, {舵机 ID: 角度}), ...] 整体姿态序列"""
+        keyframes = {}
+        for t, angles in poses:
+            for sid, angle in angles.items():
+                keyframes.setdefault(sid, []).append((t, angle))
+        return cls(keyframes, smooth)
+
+    def ids(self):
+        return list(self.keys)
+
+    def sample(self, t_ms):
+        """t_ms 时刻所有舵机的角度 (首尾关键帧之外保持端点值)"""
+        out = {}
+        for sid, (ts, angles) in self.keys.items():
+            if t_ms <= ts[0]:
+                out[sid] = angles[0]
+                continue
+            if t_ms >= ts[-1]:
+                out[sid] = angles[-1]
+                continue
+            i = 1
+            while ts[i] < t_ms:
+                i += 1
+            k = (t_ms - ts[i - 1]) / (ts[i] - ts[i - 1])
+            if self.smooth:
+                k = 0.5 - 0.5 * math.cos(math.pi * k)
+            out[sid] = angles[i - 1] + (angles[i] - angles[i - 1]) * k
+        return out
+
+
+def group_bytes(n_servos):
+    """n 个舵机一条组指令的字节数: '{' + n * '#000P1500T0020!' + '}'"""
+    return 2 + 15 * n_servos
+
+
+def max_rate_hz(n_servos, baudrate=115200, margin=0.7):
+    """总线带宽允许的最高更新率 (组指令占用不超过 margin 的线上时间)"""
+    return margin / wire_time(group_bytes(n_servos), baudrate)
+
+
+class TrajectoryPlayer:
+    def __init__(self, bus, rate_hz=RATE_HZ, late_ms=LATE_MS, skip_unchanged=True, debug=False):
+        """bus: 提供 set_angles({ID: 角度}, time_ms) 并返回写入字节数的对象 (ZP25SBus 等)"""
+        self.bus = bus
+        self.late_ms = late_ms
+        self.skip_unchanged = skip_unchanged
+        self.debug = debug
+        self.baudrate = getattr(bus, 'baudrate', None)
+        self.rate_hz = rate_hz
+        self.played_hz = rate_hz     # 实际播放更新率 (受总线带宽限制)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.late = 0
+        self.skipped = 0
+        self.max_late_ms = 0.0
+        self.late_sum_ms = 0.0
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'late': self.late,
+            'skipped': self.skipped,
+            'max_late_ms': round(self.max_late_ms, 3),
+            'avg_late_ms': round(self.late_sum_ms / self.frames, 3) if self.frames else 0.0,
+            'bytes': self.bytes,
+            'rate_hz': round(self.played_hz, 1),
+        }
+
+    @staticmethod
+    def _wait_until(deadline):
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if remaining > SPIN_MS / 1000.0:
+                time.sleep(remaining - SPIN_MS / 1000.0)
+
+    def play(self, traj, start_delay_ms=0):
+        """阻塞播放整条轨迹，返回统计"""
+        self.reset_stats()
+        rate = self.rate_hz
+        if self.baudrate:
+            limit = max_rate_hz(len(traj.ids()), self.baudrate)
+            if rate > limit:
+                print("[轨迹] 更新率 %.0f Hz 超出总线带宽，降为 %.0f Hz" % (rate, limit))
+                rate = limit
+        self.played_hz = rate
+        period = 1.0 / rate
+        period_ms = max(1, int(round(period * 1000)))
+        n_frames = int(math.ceil(traj.duration / 1000.0 / period))
+
+        sent = {}                   # 舵机 ID → 上次下发的 PWM
+        t0 = time.monotonic() + start_delay_ms / 1000.0
+        k = 0
+        while k <= n_frames:
+            deadline = t0 + k * period
+            self._wait_until(deadline)
+            late = (time.monotonic() - deadline) * 1000.0
+            if late > period * 1000.0 and k < n_frames:
+                # 落后一个周期以上：丢掉过期帧，从当前时刻对应的帧继续；
+                # 最多跳到末帧，末帧 (轨迹终点) 无论迟到多少都要发出
+                behind = min(int(late / 1000.0 / period), n_frames - k)
+                self.skipped += behind
+                k += behind
+                continue
+            if late > self.late_ms:
+                self.late += 1
+            self.max_late_ms = max(self.max_late_ms, late)
+            self.late_sum_ms += max(0.0, late)
+
+            # 下发下一采样点，舵机用一个周期走到位
+            target = traj.sample((k + 1) * period * 1000.0)
+            if self.skip_unchanged:
+                target = {sid: a for sid, a in target.items() if sent.get(sid) != angle_to_pwm(a)}
+            if target:
+                self.bytes += self.bus.set_angles(target, period_ms) or 0
+                for sid, a in target.items():
+                    sent[sid] = angle_to_pwm(a)
+            self.frames += 1
+            if self.debug:
+                print("[轨迹] 帧 %d 迟到 %.2f ms %s" % (k, late, target))
+            k += 1
+        return self.stats()
+
+
+def _demo():
+    from fake_bus_device import FakeBusDevice
+    from zp25s_bus import ZP25SBus
+
+    device = FakeBusDevice(servo_ids=(1, 2, 3), motor_addrs=())
+    bus = ZP25SBus(device.start())
+    bus.open()
+    traj = Trajectory({1: [(0, 60), (500, 180), (1000, 60)],
+                       2: [(0, 120), (1000, 30)],
+                       3: [(0, 200), (300, 200), (800, 40)]}, smooth=True)
+    player = TrajectoryPlayer(bus, rate_hz=RATE_HZ)
+    print("轨迹时长 %.0f ms, 总线上限 %.0f Hz" % (traj.duration, max_rate_hz(3, bus.baudrate)))
+    print("播放统计:", player.play(traj))
+    time.sleep(0.05)
+    print("终点角度:", bus.read_angles(traj.ids()), "期望:", traj.sample(traj.duration))
+    bus.close()
+    device.stop()
+
+
+if __name__ == '__main__':
+    if '--fake' in sys.argv:
+        _demo()
+    else:
+        print(__doc__)